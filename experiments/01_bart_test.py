@@ -11,7 +11,8 @@ from pathlib import Path
 # Add scripts directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
 
-from olmo_client import OLMoClient
+from completion_cache import cache_from_env
+from olmo_pool import client_from_env
 from datetime import datetime
 
 
@@ -24,8 +25,9 @@ def run_bart_test():
     print("\nTesting OLMo 3 32B Think on Gen-Alpha slang + emoji storytelling")
     print()
 
-    # Initialize client
-    client = OLMoClient()
+    # Initialize client (set OLMO_CACHE_DIR to reuse identical completions across re-runs,
+    # OLMO_ENDPOINTS to spread requests over several LM Studio servers)
+    client = client_from_env(cache=cache_from_env())
 
     # Verify connection
     if not client.verify_connection():
@@ -49,7 +51,8 @@ def run_bart_test():
     result = client.complete(
         prompt=prompt,
         temperature=0.7,
-        max_tokens=8192
+        max_tokens=8192,
+        stream=True  # Streamed so the result records TTFT and per-phase throughput
     )
 
     # Print summary
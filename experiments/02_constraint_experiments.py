@@ -9,6 +9,9 @@ Runs 5 variations:
 3. Higher temp (1.0) - test if more randomness helps
 4. Natural constraint - limit slang usage explicitly
 5. Style anchor - "texting a friend" framing
+
+Progress is logged to results/02_constraint_experiments.manifest.jsonl; re-running
+after a crash or Ctrl-C skips the experiments that already finished.
 """
 
 import sys
@@ -16,16 +19,23 @@ import os
 from pathlib import Path
 from datetime import datetime
 import time
+from typing import Optional
 
 # Add scripts directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
 
-from olmo_client import OLMoClient
+from olmo_client import OLMoClient, plan_prefix_order
+from completion_cache import cache_from_env
+from olmo_pool import client_from_env, residency_for
+from sweep_manifest import SweepManifest
 
 
 # Base prompt
 BASE_PROMPT = """Tell the story of a developer deploying code to production on a Friday afternoon (and something goes wrong) using Gen-Alpha slang and emojis. Make it realistic and funny."""
 
+# Completions per experiment (>1 for variance runs; drawn in one request where the server supports n)
+SAMPLES = 1
+
 # Experiment configurations
 EXPERIMENTS = [
     {
@@ -63,8 +73,15 @@ EXPERIMENTS = [
 ]
 
 
-def run_experiment(client: OLMoClient, experiment: dict, output_dir: Path):
-    """Run a single experiment configuration."""
+def run_experiment(client: OLMoClient, experiment: dict, output_dir: Path,
+                   residency: Optional[dict] = None, slot: Optional[int] = None):
+    """Run a single experiment configuration.
+
+    residency is the ModelResidency event from just before this cell; it is
+    saved with the result so load time stays out of duration_seconds.
+    slot pins the request to a llama.cpp server slot so it can reuse the KV
+    cache left by the previous experiment with the same prompt prefix.
+    """
 
     print("\n" + "=" * 70)
     print(f"EXPERIMENT: {experiment['name']}")
@@ -79,7 +96,10 @@ def run_experiment(client: OLMoClient, experiment: dict, output_dir: Path):
     result = client.complete(
         prompt=experiment['prompt'],
         temperature=experiment['temperature'],
-        max_tokens=8192
+        max_tokens=8192,
+        stream=True,  # Streamed so the result records TTFT and per-phase throughput
+        samples=SAMPLES,
+        **({"id_slot": slot} if slot is not None else {})
     )
 
     # Print summary
@@ -93,6 +113,8 @@ def run_experiment(client: OLMoClient, experiment: dict, output_dir: Path):
         print()
         print(result['answer'])
         print()
+        if result.get('samples'):
+            print(f"(+{len(result['samples']) - 1} more samples saved with the result)\n")
     else:
         print(f"\n✗ Error: {result['error']}")
         return None
@@ -107,7 +129,9 @@ def run_experiment(client: OLMoClient, experiment: dict, output_dir: Path):
         "description": experiment['description'],
         "hypothesis": experiment['hypothesis'],
         "temperature": experiment['temperature'],
-        "prompt": experiment['prompt']
+        "prompt": experiment['prompt'],
+        "samples": SAMPLES,
+        "residency": residency
     }
 
     client.save_result(result, str(output_file), metadata)
@@ -117,7 +141,8 @@ def run_experiment(client: OLMoClient, experiment: dict, output_dir: Path):
         "name": experiment['name'],
         "output_file": output_file,
         "tokens": result['tokens_completion'],
-        "duration": result['duration_seconds']
+        "duration": result['duration_seconds'],
+        "prompt_cache": result.get('prompt_cache')
     }
 
 
@@ -130,14 +155,19 @@ def main():
     print("\nTesting variations to reduce 'overthinking' effect")
     print(f"Running {len(EXPERIMENTS)} experiments on OLMo 3 32B Think\n")
 
-    # Initialize client
-    client = OLMoClient()
+    # Initialize client (set OLMO_CACHE_DIR to reuse identical completions across re-runs,
+    # OLMO_ENDPOINTS to spread requests over several LM Studio servers). cache_prompt keeps
+    # BASE_PROMPT's KV cache between variants on llama.cpp servers.
+    client = client_from_env(cache=cache_from_env(), cache_prompt=True)
 
     # Verify connection
     if not client.verify_connection():
         print("\n✗ Cannot connect to LM Studio. Make sure it's running.")
         return
 
+    # Load and warm the model up front, then keep it resident across cells
+    residency = residency_for(client)
+
     # Setup output directory
     output_dir = Path(__file__).parent.parent / "results"
     output_dir.mkdir(exist_ok=True)
@@ -145,20 +175,42 @@ def main():
     # Run all experiments
     results_summary = []
 
-    for i, experiment in enumerate(EXPERIMENTS, 1):
-        print(f"\n{'='*70}")
-        print(f"RUNNING EXPERIMENT {i}/{len(EXPERIMENTS)}")
-        print(f"{'='*70}")
-
-        result = run_experiment(client, experiment, output_dir)
-
-        if result:
-            results_summary.append(result)
-
-        # Brief pause between experiments
-        if i < len(EXPERIMENTS):
-            print("\n⏸️  Pausing 3 seconds before next experiment...")
-            time.sleep(3)
+    # Write-ahead log of which experiments are done, so a restart picks up where this run stopped
+    manifest = SweepManifest.resume_or_start(output_dir / "02_constraint_experiments.manifest.jsonl",
+                                             meta={"script": Path(__file__).name})
+    manifest.plan(e['id'] for e in EXPERIMENTS)
+    pending = set(manifest.pending(e['id'] for e in EXPERIMENTS))
+    if manifest.resumed:
+        print(f"↻ Resuming: {len(EXPERIMENTS) - len(pending)} of {len(EXPERIMENTS)} experiments already done")
+
+    # Variants sharing a prompt prefix run back-to-back on one slot so the prefix is evaluated once
+    plan = [(slot, e) for slot, e in plan_prefix_order(EXPERIMENTS, prompt_of=lambda e: e['prompt'])
+            if e['id'] in pending]
+
+    try:
+        for i, (slot, experiment) in enumerate(plan, 1):
+            print(f"\n{'='*70}")
+            print(f"RUNNING EXPERIMENT {i}/{len(plan)}")
+            print(f"{'='*70}")
+
+            manifest.start(experiment['id'])
+            result = run_experiment(client, experiment, output_dir, residency.ensure_resident(), slot)
+
+            if result:
+                manifest.done(experiment['id'], output_file=result['output_file'].name)
+                results_summary.append(result)
+            else:
+                manifest.failed(experiment['id'], "generation failed")
+
+            # Brief pause between experiments
+            if i < len(plan):
+                print("\n⏸️  Pausing 3 seconds before next experiment...")
+                time.sleep(3)
+    except KeyboardInterrupt:
+        print(f"\n⏹  Interrupted - re-run to resume ({manifest.path.name})")
+        return
+    finally:
+        manifest.close()
 
     # Print final summary
     print("\n" + "=" * 70)
@@ -171,6 +223,22 @@ def main():
         print(f"    Tokens: {result['tokens']:,} | Duration: {result['duration']:.1f}s")
         print(f"    File: {result['output_file'].name}\n")
 
+    cache_stats = [r['prompt_cache'] for r in results_summary if r['prompt_cache']]
+    if cache_stats:
+        reused = sum(c['reused_tokens'] for c in cache_stats)
+        total = sum(c['prompt_tokens'] for c in cache_stats)
+        print(f"Prompt cache: {reused:,} of {total:,} prompt tokens reused from the KV cache "
+              f"({reused / total * 100:.0f}% of prefill skipped)\n")
+
+    loads = residency.summary()
+    print(f"Model residency: {loads['loads']} load(s), {loads['cold_load_seconds']:.1f}s loading, "
+          f"{loads['warmup_seconds']:.1f}s warm-up (excluded from durations above)\n")
+
+    if client.cache:
+        stats = client.cache.stats()
+        print(f"Completion cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB)\n")
+
     print("\n" + "=" * 70)
     print("NEXT STEPS")
     print("=" * 70)
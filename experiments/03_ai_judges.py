@@ -4,14 +4,40 @@ AI Judges Experiment - Evaluate Bart Test outputs using frontier models
 
 This script runs GPT-4o, Claude Sonnet 4.5, and Gemini Pro as judges for
 Gen-Alpha slang outputs. Uses same 1-10 rubric as human teen judges.
+
+With --batch, the Claude and GPT-4o evaluations are submitted as one batch
+job per provider (see scripts/batch_runner.py) instead of one call each;
+Gemini is still called directly.
+
+Every output x judge evaluation runs at once, each judge on its own thread
+pool capped at its concurrency (--judge-concurrency overrides all caps), so
+the run takes about as long as the slowest judge's share rather than the sum
+of every call. Results keep file order and, within a file, judge order.
+
+With --queue PATH, the evaluations become jobs in a SQLite queue
+(scripts/job_queue.py) and are scored by whatever job_queue workers serve
+the "judge" pools.
 """
 
+import argparse
 import json
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from trace_parser import parse_trace
+from rate_limiter import limiter_for, rate_limited_call, estimate_tokens, limiter_stats
+from client_registry import openai_client, anthropic_client, configure_gemini, client_stats
+from batch_runner import DEFAULT_POLL_SECONDS, run_batch
+from job_queue import JobQueue, judge_job, DONE as JOB_DONE
+
 # API clients will be imported based on what's available
 try:
     from anthropic import Anthropic
@@ -81,9 +107,24 @@ Format your response as JSON:
 """
 
 
+def extract_json(content: str) -> Dict:
+    """Parse a judge's JSON scores; models sometimes wrap them in a markdown code block"""
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+    return json.loads(content)
+
+
 class AIJudge:
     """Base class for AI judges"""
 
+    # Provider whose batch API can run this judge (None: direct calls only)
+    batch_provider: Optional[str] = None
+
+    # Evaluations in flight at once; the provider's rate limiter still paces them
+    concurrency: int = 4
+
     def __init__(self, name: str):
         self.name = name
 
@@ -91,10 +132,20 @@ class AIJudge:
         """Evaluate an output and return scores"""
         raise NotImplementedError
 
+    def batch_item(self, custom_id: str, output: str) -> Dict:
+        """batch_runner request evaluating one output"""
+        raise NotImplementedError
+
+    def from_reply(self, content: str) -> Dict:
+        """Evaluation record from the judge's reply text"""
+        raise NotImplementedError
+
 
 class ClaudeJudge(AIJudge):
     """Claude Sonnet 4.5 as judge"""
 
+    batch_provider = "anthropic"
+
     def __init__(self):
         super().__init__("Claude Sonnet 4.5")
         if not CLAUDE_AVAILABLE:
@@ -104,44 +155,49 @@ class ClaudeJudge(AIJudge):
         if not api_key:
             raise RuntimeError("ANTHROPIC_API_KEY environment variable not set")
 
-        self.client = Anthropic(api_key=api_key)
+        self.client = anthropic_client(api_key, max_retries=0)
 
     def evaluate(self, output: str) -> Dict:
         """Evaluate using Claude"""
         prompt = JUDGE_PROMPT.format(output=output)
 
-        response = self.client.messages.create(
+        # Paced by the shared Anthropic budget; the raw response carries the rate-limit headers
+        limiter = limiter_for("anthropic", "claude-sonnet-4-5-20250929")
+        tokens = estimate_tokens(prompt, 2000)
+        response = rate_limited_call(limiter, lambda: self.client.messages.with_raw_response.create(
             model="claude-sonnet-4-5-20250929",
             max_tokens=2000,
             messages=[{
                 "role": "user",
                 "content": prompt
             }]
-        )
+        ), tokens).parse()
+        limiter.settle(tokens, response.usage.input_tokens + response.usage.output_tokens)
+        return self.from_reply(response.content[0].text)
 
-        # Extract JSON from response
-        content = response.content[0].text
-
-        # Try to parse JSON from the response
-        # Claude might wrap it in markdown code blocks
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0].strip()
-
-        scores = json.loads(content)
+    def batch_item(self, custom_id: str, output: str) -> Dict:
+        return {
+            "custom_id": custom_id,
+            "model": "claude-sonnet-4-5-20250929",
+            "prompt": JUDGE_PROMPT.format(output=output),
+            "max_tokens": 2000
+        }
 
+    def from_reply(self, content: str) -> Dict:
+        # Claude might wrap the JSON in markdown code blocks
         return {
             "judge": self.name,
             "model_id": "claude-sonnet-4-5-20250929",
-            "scores": scores,
-            "raw_response": response.content[0].text
+            "scores": extract_json(content),
+            "raw_response": content
         }
 
 
 class GPT4Judge(AIJudge):
     """GPT-4o as judge"""
 
+    batch_provider = "openai"
+
     def __init__(self):
         super().__init__("GPT-4o")
         if not OPENAI_AVAILABLE:
@@ -151,28 +207,38 @@ class GPT4Judge(AIJudge):
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY environment variable not set")
 
-        self.client = OpenAI(api_key=api_key)
+        self.client = openai_client(api_key, max_retries=0)
 
     def evaluate(self, output: str) -> Dict:
         """Evaluate using GPT-4o"""
         prompt = JUDGE_PROMPT.format(output=output)
 
-        response = self.client.chat.completions.create(
+        limiter = limiter_for("openai", "gpt-4o")
+        tokens = estimate_tokens(prompt, 1000)  # No max_tokens set; JSON scores run well under this
+        response = rate_limited_call(limiter, lambda: self.client.chat.completions.with_raw_response.create(
             model="gpt-4o",
             messages=[{
                 "role": "user",
                 "content": prompt
             }],
             response_format={"type": "json_object"}
-        )
+        ), tokens).parse()
+        limiter.settle(tokens, response.usage.total_tokens)
+        return self.from_reply(response.choices[0].message.content)
 
-        content = response.choices[0].message.content
-        scores = json.loads(content)
+    def batch_item(self, custom_id: str, output: str) -> Dict:
+        return {
+            "custom_id": custom_id,
+            "model": "gpt-4o",
+            "prompt": JUDGE_PROMPT.format(output=output),
+            "json": True
+        }
 
+    def from_reply(self, content: str) -> Dict:
         return {
             "judge": self.name,
             "model_id": "gpt-4o",
-            "scores": scores,
+            "scores": json.loads(content),
             "raw_response": content
         }
 
@@ -180,6 +246,8 @@ class GPT4Judge(AIJudge):
 class GeminiJudge(AIJudge):
     """Gemini Pro as judge"""
 
+    concurrency = 2
+
     def __init__(self):
         super().__init__("Gemini Pro")
         if not GEMINI_AVAILABLE:
@@ -189,23 +257,18 @@ class GeminiJudge(AIJudge):
         if not api_key:
             raise RuntimeError("GOOGLE_API_KEY environment variable not set")
 
-        genai.configure(api_key=api_key)
+        configure_gemini(api_key)
         self.model = genai.GenerativeModel('gemini-pro')
 
     def evaluate(self, output: str) -> Dict:
         """Evaluate using Gemini"""
         prompt = JUDGE_PROMPT.format(output=output)
 
-        response = self.model.generate_content(prompt)
-        content = response.text
-
-        # Extract JSON from response
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0].strip()
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0].strip()
-
-        scores = json.loads(content)
+        limiter = limiter_for("gemini", "gemini-pro")
+        tokens = estimate_tokens(prompt, 1000)
+        response = rate_limited_call(limiter, lambda: self.model.generate_content(prompt), tokens)
+        limiter.settle(tokens, getattr(getattr(response, "usage_metadata", None), "total_token_count", None))
+        scores = extract_json(response.text)
 
         return {
             "judge": self.name,
@@ -223,49 +286,130 @@ def load_experiment_output(result_file: Path) -> str:
     # Extract just the story (without thinking traces)
     response = data['result']['response']
 
-    # For OLMo Think models, remove the <think> tags if present
-    if '<think>' in response and '</think>' in response:
-        # Extract only the content after </think>
-        response = response.split('</think>')[-1].strip()
-
-    return response
-
+    # For OLMo Think models, drop the reasoning trace (the opening <think> may be implicit)
+    return parse_trace(response).answer
+
+
+def run_batch_judges(outputs: List[str], judges: List[AIJudge],
+                     poll_seconds: float = DEFAULT_POLL_SECONDS) -> Dict[str, Dict]:
+    """
+    Submit every evaluation of the batch-capable judges as one batch job per
+    provider (run side by side) and wait for them. Replies are keyed
+    "j<judge index>-o<output index>"; a failed job yields an error per request.
+    """
+    by_provider: Dict[str, List[Dict]] = {}
+    for j, judge in enumerate(judges):
+        if judge.batch_provider:
+            by_provider.setdefault(judge.batch_provider, []).extend(
+                judge.batch_item(f"j{j}-o{i}", output) for i, output in enumerate(outputs))
+    if not by_provider:
+        return {}
+
+    replies = {}
+    with ThreadPoolExecutor(max_workers=len(by_provider)) as pool:
+        jobs = {provider: pool.submit(run_batch, provider, items, poll_seconds=poll_seconds, description="03_ai_judges")
+                for provider, items in by_provider.items()}
+        for provider, job in jobs.items():
+            try:
+                replies.update(job.result())
+            except Exception as e:
+                replies.update({item["custom_id"]: {"error": f"Batch error: {e}"} for item in by_provider[provider]})
+    return replies
+
+
+def run_queued_judges(outputs: List[str], judges: List[AIJudge], queue: JobQueue, run_id: str,
+                      skip_batch: bool = False) -> Dict[str, Dict]:
+    """
+    Enqueue every evaluation (except the batch-capable judges' with
+    skip_batch) as a job_queue job in pool "judge:<judge class>" and wait for
+    the workers. Replies are evaluations keyed like run_batch_judges'; a job
+    that ran out of attempts yields {"error"}.
+    """
+    prefix = f"03_ai_judges/{run_id}/"
+    jobs = [judge_job(f"{prefix}j{j}-o{i}", type(judge).__name__, output)
+            for j, judge in enumerate(judges) if not (skip_batch and judge.batch_provider)
+            for i, output in enumerate(outputs)]
+    if not jobs:
+        return {}
+    queue.enqueue(jobs)
+    print(f"📋 {len(jobs)} evaluation(s) queued on {queue.path}; waiting for workers")
+
+    replies = {}
+
+    def on_finished(job: Dict):
+        replies[job["key"][len(prefix):]] = job["result"] if job["state"] == JOB_DONE else {"error": job["error"]}
+
+    queue.wait([job["key"] for job in jobs], on_finished, key_prefix=prefix)
+    return replies
+
+
+def run_ai_judges(result_files: List[Path], judges: List[AIJudge], batch: bool = False,
+                  poll_seconds: float = DEFAULT_POLL_SECONDS, queue: Optional[JobQueue] = None,
+                  concurrency: Optional[int] = None) -> Dict:
+    """
+    Run all judges on all experiment outputs (batch-capable judges via their
+    batch API if batch=True, the others through queue workers if a queue is given).
+    Direct evaluations run concurrently, up to each judge's concurrency (or
+    `concurrency` for every judge); the output is in file and judge order regardless.
+    """
+    outputs = [load_experiment_output(result_file) for result_file in result_files]
+    replies = run_batch_judges(outputs, judges, poll_seconds) if batch else {}
+    if queue:
+        replies.update(run_queued_judges(outputs, judges, queue, datetime.now().strftime("%Y%m%d_%H%M%S"),
+                                         skip_batch=batch))
+
+    evaluations: List[List[Optional[Dict]]] = [[None] * len(judges) for _ in outputs]
+    total = len(outputs) * len(judges)
+    progress = {"done": 0}
+    print_lock = threading.Lock()
+
+    def evaluate(i: int, j: int):
+        judge = judges[j]
+        try:
+            if batch and judge.batch_provider:
+                reply = replies[f"j{j}-o{i}"]
+                if "error" in reply:
+                    raise RuntimeError(reply["error"])
+                evaluation = judge.from_reply(reply["response"])
+            elif queue:
+                evaluation = replies[f"j{j}-o{i}"]
+                if "error" in evaluation:
+                    raise RuntimeError(evaluation["error"])
+            else:
+                evaluation = judge.evaluate(outputs[i])
+        except Exception as e:
+            evaluation = {
+                "judge": judge.name,
+                "error": str(e)
+            }
+        evaluations[i][j] = evaluation
+        with print_lock:
+            progress["done"] += 1
+            status = f"❌ Error: {evaluation['error']}" if "error" in evaluation else "✅"
+            print(f"  [{progress['done']}/{total}] 🤖 {judge.name:18s} | {result_files[i].name} {status}")
+
+    print(f"\n📊 Evaluating {len(outputs)} output(s) with {len(judges)} judge(s)")
+    # One pool per judge, so a slow or rate-limited judge never holds up the others
+    pools = [ThreadPoolExecutor(max_workers=concurrency or judge.concurrency, thread_name_prefix=type(judge).__name__)
+             for judge in judges]
+    try:
+        futures = [pools[j].submit(evaluate, i, j) for i in range(len(outputs)) for j in range(len(judges))]
+        wait(futures)
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
 
-def run_ai_judges(result_files: List[Path], judges: List[AIJudge]) -> Dict:
-    """Run all judges on all experiment outputs"""
     results = {
         "timestamp": datetime.now().isoformat(),
-        "experiments": []
+        "experiments": [
+            {
+                "experiment_file": result_file.name,
+                "experiment_id": result_file.stem,
+                "judge_evaluations": evaluations[i]
+            }
+            for i, result_file in enumerate(result_files)
+        ]
     }
-
-    for result_file in result_files:
-        print(f"\n📊 Evaluating: {result_file.name}")
-
-        # Load the output
-        output = load_experiment_output(result_file)
-
-        experiment_result = {
-            "experiment_file": result_file.name,
-            "experiment_id": result_file.stem,
-            "judge_evaluations": []
-        }
-
-        # Run each judge
-        for judge in judges:
-            print(f"  🤖 {judge.name}...", end=" ", flush=True)
-            try:
-                evaluation = judge.evaluate(output)
-                experiment_result["judge_evaluations"].append(evaluation)
-                print("✅")
-            except Exception as e:
-                print(f"❌ Error: {e}")
-                experiment_result["judge_evaluations"].append({
-                    "judge": judge.name,
-                    "error": str(e)
-                })
-
-        results["experiments"].append(experiment_result)
-
     return results
 
 
@@ -314,6 +458,15 @@ def calculate_aggregate_scores(results: Dict) -> Dict:
 
 def main():
     """Run the AI judges experiment"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", action="store_true", help="Submit Claude and GPT-4o evaluations as batch jobs")
+    parser.add_argument("--batch-poll", type=float, default=DEFAULT_POLL_SECONDS,
+                        help=f"Seconds between batch status checks (default {DEFAULT_POLL_SECONDS:.0f})")
+    parser.add_argument("--queue", type=Path, help="Hand evaluations to job_queue workers through this SQLite file")
+    parser.add_argument("--judge-concurrency", type=int,
+                        help="Evaluations in flight per judge (default: each judge's own cap)")
+    args = parser.parse_args()
+
     print("🧪 Bart Test - AI Judges Experiment")
     print("=" * 50)
 
@@ -362,12 +515,16 @@ def main():
     print(f"\n📁 Found {len(result_files)} experiment outputs to evaluate")
 
     # Run the judges
-    results = run_ai_judges(result_files, judges)
+    queue = JobQueue(args.queue) if args.queue else None
+    results = run_ai_judges(result_files, judges, batch=args.batch, poll_seconds=args.batch_poll, queue=queue,
+                            concurrency=args.judge_concurrency)
 
     # Calculate aggregates
     print("\n📈 Calculating aggregate scores...")
     analysis = calculate_aggregate_scores(results)
     results["analysis"] = analysis
+    results["rate_limits"] = limiter_stats()
+    results["connections"] = client_stats()
 
     # Save results
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -9,6 +9,7 @@ Decision point: If all 3 models struggle, consider modifying prompt. If 1-2 hand
 
 import json
 import os
+import sys
 import time
 from datetime import datetime
 from pathlib import Path
@@ -36,6 +37,10 @@ except ImportError:
     GEMINI_AVAILABLE = False
     print("⚠️  Google GenAI package not found. Install with: pip install google-generativeai")
 
+# Pooled API clients
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+from client_registry import openai_client, anthropic_client, configure_gemini
+
 
 # The exact baseline prompt from Experiment 01
 BASELINE_PROMPT = """Tell the story of a developer deploying code to production on a Friday afternoon (and something goes wrong) using Gen-Alpha slang and emojis. Make it realistic and funny."""
@@ -53,7 +58,7 @@ def test_gpt4o(prompt: str) -> Dict:
     print("\n🤖 Testing GPT-5.2...")
     start_time = time.time()
 
-    client = OpenAI(api_key=api_key)
+    client = openai_client(api_key)
 
     response = client.chat.completions.create(
         model="gpt-5.2",
@@ -96,7 +101,7 @@ def test_claude(prompt: str) -> Dict:
     print("\n🤖 Testing Claude Opus 4.5...")
     start_time = time.time()
 
-    client = Anthropic(api_key=api_key)
+    client = anthropic_client(api_key)
 
     response = client.messages.create(
         model="claude-opus-4-5-20251101",
@@ -139,7 +144,7 @@ def test_gemini(prompt: str) -> Dict:
     print("\n🤖 Testing Gemini 3 Pro...")
     start_time = time.time()
 
-    genai.configure(api_key=api_key)
+    configure_gemini(api_key)
 
     # Use gemini-3-pro-preview (most powerful Gemini 3 model)
     model = genai.GenerativeModel('gemini-3-pro-preview')
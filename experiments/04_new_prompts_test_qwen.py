@@ -18,6 +18,7 @@ Note: Run other local model scripts separately
 
 import json
 import os
+import sys
 import time
 from datetime import datetime
 from pathlib import Path
@@ -46,13 +47,22 @@ except ImportError:
     print("⚠️  Google GenAI package not found")
 
 # For local models via LM Studio
-import requests
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+from olmo_client import OLMoClient, ModelResidency
+from client_registry import openai_client, anthropic_client, configure_gemini
 
 # The new prompts
 SCENARIO_A = """Text your group chat about what happened at lunch today using Gen-Alpha slang and emojis. Keep it short (50-100 words max)."""
 
 SCENARIO_B = """Hype up your friend who just got a good grade using Gen-Alpha slang and emojis. Keep it short (50-100 words max)."""
 
+# Stop local generation once the answer passes this many words (e.g. 100). Off by default:
+# a cut answer no longer shows whether the model keeps to the word range.
+ANSWER_WORD_LIMIT = None
+
+# Completions per scenario (>1 for variance runs; drawn in one request where the server supports n)
+SAMPLES = 1
+
 
 def test_gpt52(prompt: str, scenario_name: str) -> Dict:
     """Test GPT-5.2 with new prompt"""
@@ -66,7 +76,7 @@ def test_gpt52(prompt: str, scenario_name: str) -> Dict:
     print(f"\n🤖 Testing GPT-5.2 - {scenario_name}...")
     start_time = time.time()
 
-    client = OpenAI(api_key=api_key)
+    client = openai_client(api_key)
     response = client.chat.completions.create(
         model="gpt-5.2",
         messages=[{"role": "user", "content": prompt}],
@@ -106,7 +116,7 @@ def test_claude(prompt: str, scenario_name: str) -> Dict:
     print(f"\n🤖 Testing Claude Opus 4.5 - {scenario_name}...")
     start_time = time.time()
 
-    client = Anthropic(api_key=api_key)
+    client = anthropic_client(api_key)
     response = client.messages.create(
         model="claude-opus-4-5-20251101",
         max_tokens=300,
@@ -146,7 +156,7 @@ def test_gemini(prompt: str, scenario_name: str) -> Dict:
     print(f"\n🤖 Testing Gemini 3 Pro - {scenario_name}...")
     start_time = time.time()
 
-    genai.configure(api_key=api_key)
+    configure_gemini(api_key)
 
     # Disable safety filters for slang/casual language
     safety_settings = {
@@ -190,47 +200,61 @@ def test_gemini(prompt: str, scenario_name: str) -> Dict:
     return result
 
 
-def test_local_model(prompt: str, scenario_name: str, model_name: str, model_id: str) -> Dict:
-    """Test local model via LM Studio"""
+def test_local_model(prompt: str, scenario_name: str, model_name: str, model_id: str,
+                     answer_word_limit: Optional[int] = None, samples: int = 1) -> Dict:
+    """Test local model via LM Studio
+
+    With answer_word_limit set, the reply is streamed and the request cancelled
+    once the answer (after </think>) passes that many words.
+
+    samples > 1 draws that many completions; the extra ones are stored under "samples".
+    """
     print(f"\n🤖 Testing {model_name} - {scenario_name}...")
-    start_time = time.time()
 
-    try:
-        response = requests.post(
-            "http://localhost:1234/v1/chat/completions",
-            json={
-                "model": model_id,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_tokens": 1000  # Increased to allow thinking + output
-            },
-            timeout=120
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        duration = time.time() - start_time
-        content = data['choices'][0]['message']['content']
-
-        result = {
-            "model": model_name,
-            "model_id": model_id,
-            "scenario": scenario_name,
-            "prompt": prompt,
-            "temperature": 0.7,
-            "max_tokens": 1000,  # Actual value used for thinking models
-            "response": content,
-            "tokens": data['usage']['completion_tokens'],
-            "word_count": len(content.split()),
-            "duration_seconds": round(duration, 2),
-            "timestamp": datetime.now().isoformat()
-        }
-
-        print(f"✅ {result['tokens']} tokens, {result['word_count']} words, {result['duration_seconds']}s")
-        return result
-
-    except Exception as e:
-        return {"error": f"Local model error: {str(e)}"}
+    client = OLMoClient(model=model_id, timeout=120)
+    # Load and warm the model first so duration_seconds only covers this generation
+    residency = ModelResidency(client).ensure_resident()
+    completion = client.complete(
+        prompt=prompt,
+        temperature=0.7,
+        max_tokens=1000,  # Increased to allow thinking + output
+        answer_word_limit=answer_word_limit,
+        samples=samples
+    )
+    if "error" in completion:
+        return {"error": f"Local model error: {completion['error']}"}
+
+    content = completion['response']
+
+    result = {
+        "model": model_name,
+        "model_id": model_id,
+        "scenario": scenario_name,
+        "prompt": prompt,
+        "temperature": 0.7,
+        "max_tokens": 1000,  # Actual value used for thinking models
+        "response": content,
+        "tokens": completion['tokens_completion'],
+        "word_count": len(content.split()),
+        "duration_seconds": round(completion['duration_seconds'], 2),
+        "timestamp": datetime.now().isoformat()
+    }
+
+    result["residency"] = residency
+
+    if "samples" in completion:
+        result["samples"] = [
+            {"response": sample["response"], "word_count": len(sample["response"].split()),
+             "tokens": sample["tokens_completion"]}
+            for sample in completion["samples"] if "error" not in sample
+        ]
+
+    if "early_exit" in completion:
+        result["early_exit"] = completion["early_exit"]
+        print(f"✂️  Stopped early ({completion['early_exit']['reason']})")
+
+    print(f"✅ {result['tokens']} tokens, {result['word_count']} words, {result['duration_seconds']}s")
+    return result
 
 
 def save_result(result: Dict, filename: str):
@@ -292,7 +316,8 @@ def main():
         # Only testing Qwen3 14B in this script
 
         # Qwen3 14B Instruct (local) - run this script with Qwen loaded
-        result = test_local_model(prompt, scenario_name, "Qwen3 14B Instruct", "qwen3-14b-instruct")
+        result = test_local_model(prompt, scenario_name, "Qwen3 14B Instruct", "qwen3-14b-instruct",
+                                  answer_word_limit=ANSWER_WORD_LIMIT, samples=SAMPLES)
         if "error" not in result:
             results.append(result)
             print_result(result)
@@ -307,7 +332,8 @@ def main():
 
     for result in results:
         wc = result['word_count']
-        status = "✅" if 50 <= wc <= 100 else "⚠️"
+        # Cut at ANSWER_WORD_LIMIT: the count says nothing about the model's length
+        status = "✂️" if "early_exit" in result else "✅" if 50 <= wc <= 100 else "⚠️"
         print(f"{status} {result['model']:20s} | {result['scenario']:30s} | {wc:3d} words")
 
     print("\n" + "=" * 70)
@@ -6,9 +6,15 @@ Takes AI judge rankings and generates lightweight comparison sheets for teen rev
 """
 
 import json
+import sys
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from trace_parser import parse_trace
+
 
 def load_ai_judge_results(results_file: Path) -> Dict:
     """Load AI judge results"""
@@ -38,10 +44,7 @@ def load_story_text(experiment_id: str, results_dir: Path) -> str:
     response = data['result']['response']
 
     # Remove thinking traces if present
-    if '<think>' in response and '</think>' in response:
-        response = response.split('</think>')[-1].strip()
-
-    return response
+    return parse_trace(response).answer
 
 
 def get_top_finalists(ai_results: Dict, top_n: int = 2) -> List[Tuple[str, float]]:
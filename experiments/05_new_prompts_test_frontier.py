@@ -27,7 +27,9 @@ Note: Run 05_new_prompts_test_llama.py, 05_new_prompts_test_qwen.py, or
 
 import json
 import os
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional
@@ -54,14 +56,26 @@ except ImportError:
     GEMINI_AVAILABLE = False
     print("⚠️  Google GenAI package not found")
 
+# Pooled API clients
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+from client_registry import openai_client, anthropic_client, configure_gemini
+
 # Experiment 05: Refined prompts
 SCENARIO_A = """Write a ~50-60 word story about something crazy that happened at lunch today. Use Gen-Alpha slang and emojis to make it funny and engaging. Make sure the story is clear and makes sense to the teenage reader."""
 
 SCENARIO_B = """Write a ~50-60 word message hyping up your friend who just got a really good grade. Use Gen-Alpha slang and emojis to make it funny and celebratory. Make sure it's genuinely supportive and makes sense to the teenage reader."""
 
+# Completions per scenario and model (>1 for variance runs). GPT-5.2 draws them in one
+# request via n; Claude has no n, so its samples are sent as parallel requests.
+SAMPLES = 1
+
+
+def test_gpt52(prompt: str, scenario_name: str, samples: int = 1) -> Dict:
+    """Test GPT-5.2 with refined prompt
 
-def test_gpt52(prompt: str, scenario_name: str) -> Dict:
-    """Test GPT-5.2 with refined prompt"""
+    samples > 1 asks for that many completions in one request (n); the prompt
+    is billed once and the extra outputs are stored under "samples".
+    """
     if not OPENAI_AVAILABLE:
         return {"error": "OpenAI package not available"}
 
@@ -72,15 +86,17 @@ def test_gpt52(prompt: str, scenario_name: str) -> Dict:
     print(f"\n🤖 Testing GPT-5.2 - {scenario_name}...")
     start_time = time.time()
 
-    client = OpenAI(api_key=api_key)
+    client = openai_client(api_key)
     response = client.chat.completions.create(
         model="gpt-5.2",
         messages=[{"role": "user", "content": prompt}],
         temperature=0.7,
+        n=samples,
         max_completion_tokens=200  # Tighter limit for ~50-60 words
     )
 
     duration = time.time() - start_time
+    outputs = [choice.message.content for choice in response.choices]
 
     result = {
         "model": "GPT-5.2",
@@ -89,19 +105,27 @@ def test_gpt52(prompt: str, scenario_name: str) -> Dict:
         "prompt": prompt,
         "temperature": 0.7,
         "max_tokens": 200,
-        "response": response.choices[0].message.content,
+        "response": outputs[0],
         "tokens": response.usage.completion_tokens,
-        "word_count": len(response.choices[0].message.content.split()),
+        "word_count": len(outputs[0].split()),
         "duration_seconds": round(duration, 2),
         "timestamp": datetime.now().isoformat()
     }
 
+    if samples > 1:
+        result["samples"] = [{"response": text, "word_count": len(text.split())} for text in outputs]
+        result["tokens_prompt"] = response.usage.prompt_tokens  # Shared by all samples
+
     print(f"✅ {result['tokens']} tokens, {result['word_count']} words, {result['duration_seconds']}s")
     return result
 
 
-def test_claude(prompt: str, scenario_name: str) -> Dict:
-    """Test Claude Opus 4.5 with refined prompt"""
+def test_claude(prompt: str, scenario_name: str, samples: int = 1) -> Dict:
+    """Test Claude Opus 4.5 with refined prompt
+
+    The Messages API has no n parameter, so samples > 1 sends that many
+    requests in parallel and stores the extra outputs under "samples".
+    """
     if not CLAUDE_AVAILABLE:
         return {"error": "Anthropic package not available"}
 
@@ -112,15 +136,21 @@ def test_claude(prompt: str, scenario_name: str) -> Dict:
     print(f"\n🤖 Testing Claude Opus 4.5 - {scenario_name}...")
     start_time = time.time()
 
-    client = Anthropic(api_key=api_key)
-    response = client.messages.create(
-        model="claude-opus-4-5-20251101",
-        max_tokens=200,  # Tighter limit for ~50-60 words
-        temperature=0.7,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    client = anthropic_client(api_key)
+
+    def create(_):
+        return client.messages.create(
+            model="claude-opus-4-5-20251101",
+            max_tokens=200,  # Tighter limit for ~50-60 words
+            temperature=0.7,
+            messages=[{"role": "user", "content": prompt}]
+        )
+
+    with ThreadPoolExecutor(max_workers=samples) as pool:
+        responses = list(pool.map(create, range(samples)))
 
     duration = time.time() - start_time
+    response = responses[0]
 
     result = {
         "model": "Claude Opus 4.5",
@@ -130,12 +160,18 @@ def test_claude(prompt: str, scenario_name: str) -> Dict:
         "temperature": 0.7,
         "max_tokens": 200,
         "response": response.content[0].text,
-        "tokens": response.usage.output_tokens,
+        "tokens": sum(r.usage.output_tokens for r in responses),
         "word_count": len(response.content[0].text.split()),
         "duration_seconds": round(duration, 2),
         "timestamp": datetime.now().isoformat()
     }
 
+    if samples > 1:
+        result["samples"] = [
+            {"response": r.content[0].text, "word_count": len(r.content[0].text.split()), "tokens": r.usage.output_tokens}
+            for r in responses
+        ]
+
     print(f"✅ {result['tokens']} tokens, {result['word_count']} words, {result['duration_seconds']}s")
     return result
 
@@ -152,7 +188,7 @@ def test_gemini(prompt: str, scenario_name: str) -> Dict:
     print(f"\n🤖 Testing Gemini 3 Pro - {scenario_name}...")
     start_time = time.time()
 
-    genai.configure(api_key=api_key)
+    configure_gemini(api_key)
 
     # Disable safety filters for slang/casual language
     from google.generativeai.types import HarmCategory, HarmBlockThreshold
@@ -268,7 +304,7 @@ def main():
         # GPT-5.2
         if OPENAI_AVAILABLE and os.environ.get("OPENAI_API_KEY"):
             try:
-                result = test_gpt52(prompt, scenario_name)
+                result = test_gpt52(prompt, scenario_name, samples=SAMPLES)
                 if "error" not in result:
                     results.append(result)
                     print_result(result)
@@ -279,7 +315,7 @@ def main():
         # Claude Opus 4.5
         if CLAUDE_AVAILABLE and os.environ.get("ANTHROPIC_API_KEY"):
             try:
-                result = test_claude(prompt, scenario_name)
+                result = test_claude(prompt, scenario_name, samples=SAMPLES)
                 if "error" not in result:
                     results.append(result)
                     print_result(result)
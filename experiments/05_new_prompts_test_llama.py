@@ -15,59 +15,70 @@ Note: For other local models, run 05_new_prompts_test_qwen.py or 05_new_prompts_
 """
 
 import json
-import requests
-import time
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from olmo_client import OLMoClient, ModelResidency
 
 # Experiment 05: Refined prompts
 SCENARIO_A = """Write a ~50-60 word story about something crazy that happened at lunch today. Use Gen-Alpha slang and emojis to make it funny and engaging. Make sure the story is clear and makes sense to the teenage reader."""
 
 SCENARIO_B = """Write a ~50-60 word message hyping up your friend who just got a really good grade. Use Gen-Alpha slang and emojis to make it funny and celebratory. Make sure it's genuinely supportive and makes sense to the teenage reader."""
 
+# Stop generation once the answer passes this many words (e.g. 65). Off by default:
+# a cut answer no longer shows whether the model keeps to the word range.
+ANSWER_WORD_LIMIT = None
+
 
-def test_llama(prompt: str, scenario_name: str) -> Dict:
-    """Test Llama 3.1 8B via LM Studio"""
+def test_llama(prompt: str, scenario_name: str, answer_word_limit: Optional[int] = None) -> Dict:
+    """Test Llama 3.1 8B via LM Studio
+
+    With answer_word_limit set, the reply is streamed and the request cancelled
+    once the reply passes that many words.
+    """
     print(f"\n🤖 Testing Llama 3.1 8B - {scenario_name}...")
-    start_time = time.time()
-
-    try:
-        response = requests.post(
-            "http://localhost:1234/v1/chat/completions",
-            json={
-                "model": "meta-llama-3.1-8b-instruct",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_tokens": 200  # Tighter limit for ~50-60 words
-            },
-            timeout=120
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        duration = time.time() - start_time
-        content = data['choices'][0]['message']['content']
-
-        result = {
-            "model": "Llama 3.1 8B Instruct",
-            "model_id": "meta-llama-3.1-8b-instruct",
-            "scenario": scenario_name,
-            "prompt": prompt,
-            "temperature": 0.7,
-            "max_tokens": 200,
-            "response": content,
-            "tokens": data['usage']['completion_tokens'],
-            "word_count": len(content.split()),
-            "duration_seconds": round(duration, 2),
-            "timestamp": datetime.now().isoformat()
-        }
-
-        print(f"✅ {result['tokens']} tokens, {result['word_count']} words, {result['duration_seconds']}s")
-        return result
-
-    except Exception as e:
-        return {"error": f"Local model error: {str(e)}"}
+
+    client = OLMoClient(model="meta-llama-3.1-8b-instruct", timeout=120)
+    # Load and warm the model first so duration_seconds only covers this generation
+    residency = ModelResidency(client).ensure_resident()
+    completion = client.complete(
+        prompt=prompt,
+        temperature=0.7,
+        max_tokens=200,  # Tighter limit for ~50-60 words
+        answer_word_limit=answer_word_limit
+    )
+    if "error" in completion:
+        return {"error": f"Local model error: {completion['error']}"}
+
+    content = completion['response']
+
+    result = {
+        "model": "Llama 3.1 8B Instruct",
+        "model_id": "meta-llama-3.1-8b-instruct",
+        "scenario": scenario_name,
+        "prompt": prompt,
+        "temperature": 0.7,
+        "max_tokens": 200,
+        "response": content,
+        "tokens": completion['tokens_completion'],
+        "word_count": len(content.split()),
+        "duration_seconds": round(completion['duration_seconds'], 2),
+        "timestamp": datetime.now().isoformat()
+    }
+
+    result["residency"] = residency
+
+    if "early_exit" in completion:
+        result["early_exit"] = completion["early_exit"]
+        print(f"✂️  Stopped early ({completion['early_exit']['reason']})")
+
+    print(f"✅ {result['tokens']} tokens, {result['word_count']} words, {result['duration_seconds']}s")
+    return result
 
 
 def save_result(result: Dict, filename: str):
@@ -125,7 +136,7 @@ def main():
         print("=" * 70)
         print(f"\nPrompt: {prompt}\n")
 
-        result = test_llama(prompt, scenario_name)
+        result = test_llama(prompt, scenario_name, answer_word_limit=ANSWER_WORD_LIMIT)
         if "error" in result:
             print(f"❌ Test failed: {result['error']}")
             print("\n⚠️  Make sure:")
@@ -147,7 +158,8 @@ def main():
 
         for result in results:
             wc = result['word_count']
-            status = "✅" if 45 <= wc <= 65 else "⚠️"
+            # Cut at ANSWER_WORD_LIMIT: the count says nothing about the model's length
+            status = "✂️" if "early_exit" in result else "✅" if 45 <= wc <= 65 else "⚠️"
             print(f"{status} {result['scenario']:30s} | {wc:3d} words")
 
 
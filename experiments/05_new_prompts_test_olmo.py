@@ -16,68 +16,78 @@ thinking traces. Actual output must be extracted after </think> tag.
 """
 
 import json
-import requests
-import time
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from olmo_client import OLMoClient, ModelResidency
 
 # Experiment 05: Refined prompts
 SCENARIO_A = """Write a ~50-60 word story about something crazy that happened at lunch today. Use Gen-Alpha slang and emojis to make it funny and engaging. Make sure the story is clear and makes sense to the teenage reader."""
 
 SCENARIO_B = """Write a ~50-60 word message hyping up your friend who just got a really good grade. Use Gen-Alpha slang and emojis to make it funny and celebratory. Make sure it's genuinely supportive and makes sense to the teenage reader."""
 
+# Stop generation once the answer passes this many words (e.g. 65). Off by default:
+# a cut answer no longer shows whether the model keeps to the word range.
+ANSWER_WORD_LIMIT = None
+
 
-def test_olmo(prompt: str, scenario_name: str) -> Dict:
-    """Test OLMo 3 32B Think via LM Studio"""
+def test_olmo(prompt: str, scenario_name: str, answer_word_limit: Optional[int] = None) -> Dict:
+    """Test OLMo 3 32B Think via LM Studio
+
+    With answer_word_limit set, the reply is streamed and the request cancelled
+    once the answer (after </think>) passes that many words.
+    """
     print(f"\n🤖 Testing OLMo 3 32B Think - {scenario_name}...")
     print("⚠️  This may take 30-60 seconds...")
-    start_time = time.time()
-
-    try:
-        response = requests.post(
-            "http://localhost:1234/v1/chat/completions",
-            json={
-                "model": "allenai/olmo-3-32b-think",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_tokens": 1500  # Reasoning model needs lots of tokens (thinking + output)
-            },
-            timeout=180  # Longer timeout for slow model
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        duration = time.time() - start_time
-        content = data['choices'][0]['message']['content']
-
-        # Extract actual output after </think> tag
-        actual_output = content
-        if '</think>' in content:
-            actual_output = content.split('</think>')[-1].strip()
-
-        result = {
-            "model": "OLMo 3 32B Think",
-            "model_id": "allenai/olmo-3-32b-think",
-            "scenario": scenario_name,
-            "prompt": prompt,
-            "temperature": 0.7,
-            "max_tokens": 1500,
-            "response": content,  # Full response with thinking
-            "actual_output": actual_output,  # Extracted message
-            "tokens": data['usage']['completion_tokens'],
-            "word_count_total": len(content.split()),
-            "word_count_actual": len(actual_output.split()),
-            "duration_seconds": round(duration, 2),
-            "timestamp": datetime.now().isoformat(),
-            "note": "Reasoning model - actual output extracted after </think> tag"
-        }
-
-        print(f"✅ {result['tokens']} tokens total, {result['word_count_actual']} words in actual output, {result['duration_seconds']}s")
-        return result
-
-    except Exception as e:
-        return {"error": f"Local model error: {str(e)}"}
+
+    client = OLMoClient(model="allenai/olmo-3-32b-think", timeout=180)  # Longer timeout for slow model
+    # Load and warm the model first so duration_seconds only covers this generation
+    residency = ModelResidency(client).ensure_resident()
+    completion = client.complete(
+        prompt=prompt,
+        temperature=0.7,
+        max_tokens=1500,  # Reasoning model needs lots of tokens (thinking + output)
+        answer_word_limit=answer_word_limit
+    )
+    if "error" in completion:
+        return {"error": f"Local model error: {completion['error']}"}
+
+    content = completion['response']
+
+    # Actual output after </think>, as split by the client's trace parser
+    actual_output = completion['answer']
+
+    result = {
+        "model": "OLMo 3 32B Think",
+        "model_id": "allenai/olmo-3-32b-think",
+        "scenario": scenario_name,
+        "prompt": prompt,
+        "temperature": 0.7,
+        "max_tokens": 1500,
+        "response": content,  # Full response with thinking
+        "actual_output": actual_output,  # Extracted message
+        "tokens": completion['tokens_completion'],
+        "word_count_total": len(content.split()),
+        "word_count_actual": len(actual_output.split()),
+        "duration_seconds": round(completion['duration_seconds'], 2),
+        "trace": completion['trace'],
+        "timestamp": datetime.now().isoformat(),
+        "note": "Reasoning model - actual output extracted after </think> tag"
+    }
+
+    result["residency"] = residency
+
+    if "early_exit" in completion:
+        result["early_exit"] = completion["early_exit"]
+        print(f"✂️  Stopped early ({completion['early_exit']['reason']})")
+
+    print(f"✅ {result['tokens']} tokens total, {result['word_count_actual']} words in actual output, {result['duration_seconds']}s")
+    return result
 
 
 def save_result(result: Dict, filename: str):
@@ -137,7 +147,7 @@ def main():
         print("=" * 70)
         print(f"\nPrompt: {prompt}\n")
 
-        result = test_olmo(prompt, scenario_name)
+        result = test_olmo(prompt, scenario_name, answer_word_limit=ANSWER_WORD_LIMIT)
         if "error" in result:
             print(f"❌ Test failed: {result['error']}")
             print("\n⚠️  Make sure:")
@@ -159,7 +169,8 @@ def main():
 
         for result in results:
             wc = result['word_count_actual']
-            status = "✅" if 45 <= wc <= 65 else "⚠️"
+            # Cut at ANSWER_WORD_LIMIT: the count says nothing about the model's length
+            status = "✂️" if "early_exit" in result else "✅" if 45 <= wc <= 65 else "⚠️"
             print(f"{status} {result['scenario']:30s} | {wc:3d} words")
 
 
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+"""
+Experiment matrix runner - models x scenarios x temperatures x repetitions from one config
+
+Replaces running 04_new_prompts_test_{frontier,llama,olmo,qwen}.py (and the
+05 twins) one after another. The config lists providers with their
+concurrency, the models with per-model max_tokens and thinking flags, the
+scenarios, temperatures and repetitions. Every cell is saved as its own JSON
+file in the same format the per-model scripts wrote.
+
+Each provider gets its own worker pool, so OpenAI, Anthropic, Gemini and the
+local server all run at once, each at its own concurrency. Local cells go
+through LocalScheduler, which groups them by model, loads and unloads models
+through LM Studio's API itself (within providers.lmstudio.memory_gb, if set)
+and reports swap vs generate time, so no model has to be loaded by hand.
+
+Progress is logged to <output_dir>/<prefix>.manifest.jsonl. Re-running the
+same config after a crash or Ctrl-C skips the cells already done, re-runs
+the ones that were in flight or failed, and keeps the original timestamp in
+the filenames. Use --fresh to start over.
+
+With --batch, OpenAI and Anthropic cells are submitted as one batch job per
+provider (half price, no rate limiting) and polled until they finish; the
+batch ids are kept in the manifest, so a resumed sweep waits for the batch
+it already submitted instead of paying for it twice.
+
+With --sequential, repetitions become a per-cell cap: each (model, scenario,
+temperature) is resampled only until the confidence interval on the
+config's "sequential" metric (word_count, emoji_density or judge_score) is
+narrower than target_width, and the rest of the budget goes to the cells
+that are still uncertain (see scripts/sequential_sampling.py).
+
+A reply cut off at max_tokens (finish_reason "length") is re-run with the
+budget multiplied by truncation.growth, up to truncation.retries times and
+truncation.max_tokens_cap tokens (a model's own max_tokens_cap wins); the
+budgets that fell short are kept in the result's "truncation_retries".
+
+Prompts a model refuses (Gemini's RECITATION/SAFETY blocks) are remembered
+in <output_dir>/block_memo.json per model, prompt and generation config.
+Later cells with a known block send one probe per sweep to check it still
+holds and skip the rest (--block-memo skip skips without probing, off
+disables the memo); the report counts the calls saved.
+
+With --queue PATH, cells become jobs in a SQLite queue (scripts/job_queue.py)
+instead of running here: start any number of workers on the same machine,
+each serving some providers or local models and pointed at its own GPU box
+or API key, and this process saves results and logs the manifest as their
+results come back. Re-running the same command re-attaches to the queue.
+Batched cells are retried synchronously. --auto-max-tokens replaces each
+model's max_tokens with the value scripts/token_calibration.py derives from
+earlier runs of the same family.
+
+--dry-run lists the cells and estimates the sweep's wall time, tokens and
+cost (median and p10-p90) from the durations and token counts of earlier
+runs (see scripts/sweep_planner.py); try different --concurrency values
+against it before committing the GPU box for the night.
+
+Usage:
+    python experiments/run_matrix.py experiments/configs/05_new_prompts.json
+    python experiments/run_matrix.py experiments/configs/04_new_prompts.json --models olmo3,qwen --repetitions 5
+    python experiments/run_matrix.py experiments/configs/05_new_prompts.json --dry-run
+    python experiments/run_matrix.py experiments/configs/04_new_prompts.json --dry-run --concurrency openai=8,lmstudio=2
+    python experiments/run_matrix.py experiments/configs/05_new_prompts.json --fresh
+    python experiments/run_matrix.py experiments/configs/05_new_prompts.json --batch
+    python experiments/run_matrix.py experiments/configs/05_new_prompts.json --sequential
+    python experiments/run_matrix.py experiments/configs/05_new_prompts.json --auto-max-tokens 0.99
+    python experiments/run_matrix.py experiments/configs/05_new_prompts.json --queue results/05.queue.db
+"""
+
+import argparse
+import importlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from providers import (DEFAULT_CONCURRENCY, provider_runners, provider_available, batch_items, batch_result,
+                       generation_config)
+from batch_runner import BATCH_PROVIDERS, DEFAULT_POLL_SECONDS, batch_custom_id, run_batch
+from sweep_manifest import SweepManifest, DONE
+from sequential_sampling import SequentialSampler, METRICS, judge_score, result_texts
+from local_scheduler import LocalScheduler, LocalJob
+from client_registry import print_client_stats
+from token_calibration import load_token_history, calibrate_config, retry_truncated
+from sweep_planner import plan_sweep, print_plan
+from block_memo import BlockMemo, PROBE, SKIP
+from job_queue import JobQueue, generation_job, DONE as JOB_DONE
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Re-runs of a reply cut off at max_tokens, overridable by the config's "truncation" block
+TRUNCATION_DEFAULTS = {
+    "retries": 2,
+    "growth": 2.0,
+    "max_tokens_cap": 8192
+}
+
+
+def load_config(path: Path) -> Dict[str, Any]:
+    """Load a matrix config and fill in defaults."""
+    with open(path, 'r') as f:
+        config = json.load(f)
+
+    config.setdefault("prefix", path.stem)
+    config.setdefault("output_dir", "results")
+    config.setdefault("temperatures", [0.7])
+    config.setdefault("repetitions", 1)
+    config.setdefault("providers", {})
+    config["truncation"] = {**TRUNCATION_DEFAULTS, **config.get("truncation", {})}
+    for model in config["models"]:
+        model.setdefault("slug", model["id"].split("/")[-1])
+        model.setdefault("name", model["id"])
+    return config
+
+
+def scenario_slug(name: str) -> str:
+    """Filename form of a scenario name, as the 04/05 scripts built it."""
+    return name.lower().replace(' ', '_').replace('-', '')
+
+
+def expand_matrix(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Every (model, scenario, temperature, repetition) cell, in run order.
+    A model's own "temperatures" list overrides the matrix-wide one.
+    """
+    cells = []
+    for model in config["models"]:
+        temperatures = model.get("temperatures", config["temperatures"])
+        for scenario, temperature, repetition in itertools.product(
+                config["scenarios"], temperatures, range(1, config["repetitions"] + 1)):
+            cells.append({
+                "model": model,
+                "scenario": scenario["name"],
+                "prompt": scenario["prompt"],
+                "temperature": temperature,
+                "repetition": repetition,
+                "samples": model.get("samples", 1)
+            })
+    return cells
+
+
+def cell_id(cell: Dict[str, Any]) -> str:
+    """Stable key of a cell in the sweep manifest."""
+    return f"{cell['model']['slug']}/{scenario_slug(cell['scenario'])}/t{cell['temperature']}/r{cell['repetition']}"
+
+
+def cell_filename(config: Dict[str, Any], cell: Dict[str, Any], timestamp: str) -> str:
+    """<prefix>_<model>_<scenario>[_t<temp>][_r<rep>]_<timestamp>.json"""
+    parts = [config["prefix"], cell["model"]["slug"], scenario_slug(cell["scenario"])]
+    if len(cell["model"].get("temperatures", config["temperatures"])) > 1:
+        parts.append(f"t{cell['temperature']}")
+    if config["repetitions"] > 1:
+        parts.append(f"r{cell['repetition']}")
+    return "_".join(parts + [timestamp]) + ".json"
+
+
+def save_result(result: Dict, output_dir: Path, filename: str) -> Path:
+    """Save result to JSON"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    filepath = output_dir / filename
+    with open(filepath, 'w') as f:
+        json.dump(result, f, indent=2)
+    return filepath
+
+
+def run_matrix(config: Dict[str, Any], cells: List[Dict[str, Any]], manifest: SweepManifest,
+               timestamp: str, batch: bool = False, poll_seconds: float = DEFAULT_POLL_SECONDS,
+               on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None,
+               report: bool = True, block_memo: Optional[BlockMemo] = None,
+               queue: Optional[JobQueue] = None) -> List[Optional[Dict[str, Any]]]:
+    """
+    Run cells on one worker pool per provider and save each result as it lands.
+    With batch=True, OpenAI and Anthropic cells go through their batch APIs instead.
+    on_result(cell, result) sees each successful result before it is saved; it
+    runs outside the lock the pools share, so a slow metric (a judge call)
+    only holds up its own cell.
+    block_memo, if given, skips cells whose prompt the model is known to block.
+    With a queue, every cell is enqueued for job_queue workers instead (the
+    block memo is not consulted there).
+    Returns the results in cell order (errors included); cells that never ran
+    because of Ctrl-C are None.
+    """
+    output_dir = PROJECT_ROOT / config["output_dir"]
+    runners = provider_runners()
+    print_lock = threading.Lock()
+
+    # A pool of several servers (OLMO_ENDPOINTS) routes by load instead; the scheduler drives one box
+    scheduler = None
+    if (not queue and any(cell["model"]["provider"] == "lmstudio" for cell in cells)
+            and not os.environ.get("OLMO_ENDPOINTS")):
+        settings = config["providers"].get("lmstudio", {})
+        scheduler = LocalScheduler(
+            memory_gb=settings.get("memory_gb"),
+            model_memory_gb={m["id"]: m["memory_gb"] for m in config["models"] if "memory_gb" in m},
+            concurrency=settings.get("concurrency", DEFAULT_CONCURRENCY["lmstudio"])
+        )
+
+    pools = {}
+    for provider in sorted({cell["model"]["provider"] for cell in cells}):
+        settings = config["providers"].get(provider, {})
+        concurrency = settings.get("concurrency", DEFAULT_CONCURRENCY.get(provider, 1))
+        if provider == "lmstudio" and scheduler:
+            concurrency = 1  # The scheduler thread; it runs each model's cells at the configured concurrency
+        pools[provider] = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=provider)
+
+    def label_of(cell: Dict[str, Any]) -> str:
+        return f"{cell['model']['name']:20s} | {cell['scenario']:26s} | t={cell['temperature']} r={cell['repetition']}"
+
+    def generate(cell: Dict[str, Any], model: Dict[str, Any]) -> Dict[str, Any]:
+        if block_memo:
+            generation = generation_config(model, cell)
+            key = block_memo.key(model["id"], cell["prompt"], generation)
+            action = block_memo.gate(key)
+            if action == SKIP:
+                entry = block_memo.known(key)
+                return {"error": f"Known block ({entry['finish_reason']}, {entry['blocks']}x), skipped"}
+        try:
+            result = runners[model["provider"]](model, cell)
+        except Exception as e:
+            result = {"error": str(e)}
+        if block_memo:
+            block_memo.record(key, result, model["id"], cell["prompt"], generation, probe=action == PROBE)
+        return result
+
+    def with_retries(cell: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-run a reply cut off at max_tokens with a growing budget, within the config's truncation limits."""
+        def on_retry(old: int, new: int):
+            with print_lock:
+                print(f"✂️  {label_of(cell)} | cut off at {old} tokens, retrying with {new}")
+
+        return retry_truncated(lambda model, c: generate(c, model), cell["model"], cell, result,
+                               config["truncation"], on_retry)
+
+    def finish_cell(cell: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        label = label_of(cell)
+        if "error" not in result:
+            result["repetition"] = cell["repetition"]
+            if on_result:
+                on_result(cell, result)
+        with print_lock:
+            if "error" in result:
+                manifest.failed(cell_id(cell), result["error"])
+                print(f"❌ {label} | {result['error']}")
+            else:
+                filepath = save_result(result, output_dir, cell_filename(config, cell, timestamp))
+                # Only marked done once the result file is on disk
+                manifest.done(cell_id(cell), output_file=filepath.name)
+                timing = f"{result['duration_seconds']}s" if result["duration_seconds"] is not None else "batch"
+                words = result.get("word_count_actual", result["word_count"])
+                print(f"✅ {label} | {words:3d} words, {timing} → {filepath.name}")
+        return result
+
+    def run_cell(cell: Dict[str, Any]) -> Dict[str, Any]:
+        manifest.start(cell_id(cell))
+        return finish_cell(cell, with_retries(cell, generate(cell, cell["model"])))
+
+    def run_batch_cells(provider: str, group: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One provider's cells as batch job(s), re-attaching to batches an interrupted run submitted."""
+        by_id = {batch_custom_id(cell_id(cell)): cell for cell in group}
+        items = {custom_id: batch_items(cell["model"], cell, custom_id) for custom_id, cell in by_id.items()}
+        owner = {item["custom_id"]: custom_id for custom_id, cell_items in items.items() for item in cell_items}
+        batch_ids = {custom_id: manifest.cells.get(cell_id(cell), {}).get("batch") for custom_id, cell in by_id.items()}
+
+        def on_submit(batch_id: str, custom_ids: List[str]):
+            for custom_id in dict.fromkeys(owner[i] for i in custom_ids):
+                batch_ids[custom_id] = batch_id
+                manifest.start(cell_id(by_id[custom_id]), batch=batch_id)
+
+        try:
+            replies = run_batch(provider, [item for cell_items in items.values() for item in cell_items],
+                                attach=sorted(set(batch_ids.values()) - {None}), on_submit=on_submit,
+                                poll_seconds=poll_seconds, description=config["prefix"])
+        except Exception as e:
+            return [finish_cell(cell, {"error": f"Batch error: {e}"}) for cell in group]
+        return [
+            finish_cell(cell, with_retries(cell, batch_result(
+                cell["model"], cell, [replies[item["custom_id"]] for item in items[custom_id]], batch_ids[custom_id])))
+            for custom_id, cell in by_id.items()
+        ]
+
+    queue_stop = threading.Event()
+
+    def run_queued_cells(group: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Enqueue cells for job_queue workers and finish each one as its job comes back."""
+        prefix = f"{config['prefix']}/{timestamp}/"
+        by_key = {prefix + cell_id(cell): cell for cell in group}
+        added = queue.enqueue((generation_job(key, cell, config["truncation"]) for key, cell in by_key.items()),
+                              requeue_failed=True)
+        for key, cell in by_key.items():
+            manifest.start(cell_id(cell), job=key)
+        with print_lock:
+            print(f"📋 {added} new job(s) on {queue.path} ({len(by_key) - added} already there); "
+                  f"waiting for workers (python scripts/job_queue.py worker {queue.path})")
+        finished = {}
+
+        def on_finished(job: Dict[str, Any]):
+            result = job["result"] if job["state"] == JOB_DONE else {"error": f"Queue job failed: {job['error']}"}
+            finished[job["key"]] = finish_cell(by_key[job["key"]], result)
+
+        queue.wait(by_key, on_finished, stop=queue_stop, key_prefix=prefix)
+        return [finished.get(key) for key in by_key]
+
+    start = time.time()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(cells)
+    # Each future yields the results for its list of cell indices
+    futures = {}
+    local = []
+    batched: Dict[str, List[int]] = {}
+    for i, cell in enumerate(cells):
+        provider = cell["model"]["provider"]
+        if queue:
+            continue
+        if scheduler and provider == "lmstudio":
+            local.append(i)
+        elif batch and provider in BATCH_PROVIDERS:
+            batched.setdefault(provider, []).append(i)
+        else:
+            futures[pools[provider].submit(lambda c: [run_cell(c)], cell)] = [i]
+    if local:
+        jobs = [LocalJob(cells[i]["model"]["id"], lambda c=cells[i]: run_cell(c)) for i in local]
+        futures[pools["lmstudio"].submit(scheduler.run, jobs)] = local
+    for provider, indices in batched.items():
+        futures[pools[provider].submit(run_batch_cells, provider, [cells[i] for i in indices])] = indices
+    if queue and cells:
+        pools["queue"] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="queue")
+        futures[pools["queue"].submit(run_queued_cells, cells)] = list(range(len(cells)))
+
+    def collect(future):
+        for i, result in zip(futures[future], future.result()):
+            results[i] = result
+
+    try:
+        for future in as_completed(futures):
+            collect(future)
+    except KeyboardInterrupt:
+        running = sum(1 for f in futures if f.running())
+        print(f"\n⏹  Interrupted - letting {running} in-flight job(s) finish (Ctrl-C again to abandon them)")
+        if scheduler:
+            scheduler.stop()
+        queue_stop.set()
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        try:
+            for future in futures:
+                if not future.cancelled():
+                    collect(future)
+        except KeyboardInterrupt:
+            # Worker threads can't be stopped; the manifest already has them in flight for the resume
+            print("⏹  Abandoned in-flight cells; they will be re-run on resume")
+            os._exit(130)
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    if report:
+        print(f"\n⏱  {sum(r is not None for r in results)}/{len(cells)} cells in {time.time() - start:.1f}s")
+        if scheduler:
+            scheduler.print_report()
+        print_client_stats()
+        if block_memo:
+            block_memo.print_report()
+    return results
+
+
+def sequential_metric(settings: Dict[str, Any]) -> Callable[[str], float]:
+    """Metric for --sequential: a METRICS name, or judge_score scored by one of the 03_ai_judges judges."""
+    name = settings.get("metric", "word_count")
+    if name != "judge_score":
+        return METRICS[name]
+    judges = importlib.import_module("03_ai_judges")
+    judge_class = {"claude": judges.ClaudeJudge, "gpt4o": judges.GPT4Judge, "gemini": judges.GeminiJudge}
+    return judge_score(judge_class[settings.get("judge", "claude")]())
+
+
+def run_sequential(config: Dict[str, Any], cells: List[Dict[str, Any]], manifest: SweepManifest,
+                   timestamp: str, block_memo: Optional[BlockMemo] = None,
+                   queue: Optional[JobQueue] = None) -> Dict[Any, Dict[str, Any]]:
+    """
+    Sequential sampling: each (model, scenario, temperature) gets repetitions
+    only until the confidence interval on the tracked metric is narrower than
+    target_width, or max_samples is reached, within an overall budget.
+    Rounds fill each provider's concurrency with its most uncertain cells;
+    local rounds stay on one model until its cells are finished, so the
+    scheduler doesn't swap models back and forth. cells must hold every
+    repetition up to max_samples; done ones (from the manifest) are read back
+    instead of re-run. Returns the sampler's report per group.
+    """
+    settings = config["sequential"]
+    metric_name = settings.get("metric", "word_count")
+    metric = sequential_metric(settings)
+    output_dir = PROJECT_ROOT / config["output_dir"]
+
+    def group_of(cell):
+        return (cell["model"]["slug"], cell["scenario"], cell["temperature"])
+
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for cell in cells:
+        groups.setdefault(group_of(cell), []).append(cell)
+    sampler = SequentialSampler(
+        groups,
+        target_width=settings["target_width"],
+        min_samples=settings.get("min_samples", 3),
+        max_samples=settings.get("max_samples", config["repetitions"]),
+        budget=settings.get("budget"),
+        confidence=settings.get("confidence", 0.95)
+    )
+
+    # Resume: repetitions already done count as draws, with the metric values saved in their files
+    for key, group in groups.items():
+        for cell in group:
+            info = manifest.cells.get(cell_id(cell), {})
+            if info.get("state") == DONE and (output_dir / info.get("output_file", "")).is_file():
+                with open(output_dir / info["output_file"], 'r') as f:
+                    sampler.add(key, json.load(f).get("sequential", {}).get("values"))
+
+    def record(cell: Dict[str, Any], result: Dict[str, Any]):
+        if "early_exit" in result:
+            # Cut at answer_word_limit: the metric would measure the cap, not the model
+            result["sequential"] = {"metric": metric_name, "skipped": "early_exit"}
+            sampler.add(group_of(cell), None)
+            return
+        try:
+            values = [metric(text) for text in result_texts(result)]
+        except Exception as e:
+            result["sequential"] = {"metric": metric_name, "error": str(e)}
+            sampler.add(group_of(cell), None)
+            return
+        result["sequential"] = {"metric": metric_name, "values": values}
+        sampler.add(group_of(cell), values)
+
+    by_provider: Dict[str, List[Any]] = {}
+    for key, group in groups.items():
+        by_provider.setdefault(group[0]["model"]["provider"], []).append(key)
+    local_model = None
+
+    while not sampler.done():
+        round_cells = []
+        for provider, keys in by_provider.items():
+            settings_p = config["providers"].get(provider, {})
+            slots = settings_p.get("concurrency", DEFAULT_CONCURRENCY.get(provider, 1))
+            if provider == "lmstudio":
+                open_keys = [k for k in keys if not sampler.finished(k)]
+                if local_model not in {k[0] for k in open_keys}:
+                    chosen = sampler.next_round(1, open_keys)
+                    local_model = chosen[0][0] if chosen else None
+                keys = [k for k in open_keys if k[0] == local_model]
+            for key in sampler.next_round(slots, keys, lambda k: groups[k][0].get("samples", 1)):
+                # Next repetition of this group that isn't done yet
+                cell = next((c for c in groups[key] if manifest.state(cell_id(c)) != DONE), None)
+                if cell:
+                    round_cells.append(cell)
+        if not round_cells:
+            break
+        results = run_matrix(config, round_cells, manifest, timestamp, on_result=record, report=False,
+                             block_memo=block_memo, queue=queue)
+        for cell, result in zip(round_cells, results):
+            if result is not None and "error" in result:
+                sampler.add(group_of(cell), None)
+        if any(result is None for result in results):
+            break  # Interrupted
+
+    print_client_stats()
+    return sampler.report()
+
+
+def print_sequential_report(config: Dict[str, Any], report: Dict[Any, Dict[str, Any]]):
+    settings = config["sequential"]
+    print("\n" + "=" * 70)
+    print(f"SEQUENTIAL SAMPLING: {settings.get('metric', 'word_count')} "
+          f"(target CI width {settings['target_width']}, {settings.get('confidence', 0.95):.0%})")
+    print("=" * 70)
+    for (slug, scenario, temperature), stats in report.items():
+        status = "✅" if stats["converged"] else "⚠️"
+        interval = f"{stats['mean']:8.3f} ± {stats['width'] / 2:.3f}" if "mean" in stats else "     n/a"
+        print(f"{status} {slug:12s} | {scenario:26s} | t={temperature} | n={stats['samples']:3d} | {interval}")
+    samples = sum(stats["samples"] for stats in report.values())
+    fixed = len(report) * settings.get("max_samples", config["repetitions"])
+    print(f"\n{samples} samples drawn vs {fixed} for a fixed {settings.get('max_samples', config['repetitions'])} per cell")
+
+
+def print_summary(cells: List[Dict[str, Any]], results: List[Optional[Dict[str, Any]]],
+                  word_range: Optional[List[int]]):
+    """Word count check per model and scenario, like the per-model scripts printed."""
+    print("\n" + "=" * 70)
+    print("MATRIX SUMMARY")
+    print("=" * 70)
+    ok = [r for r in results if r is not None and "error" not in r]
+    print(f"\nTotal outputs generated: {len(ok)}/{len(results)}")
+    if word_range:
+        print(f"\nWord count check (target: {word_range[0]}-{word_range[1]} words):\n")
+
+    for cell, result in zip(cells, results):
+        if result is None or "error" in result:
+            continue
+        wc = result.get("word_count_actual", result["word_count"])
+        if "early_exit" in result:
+            # Cut at the model's answer_word_limit, so the count is censored, not the model's length
+            status, note = "✂️", " (cut)"
+        else:
+            status = "✅" if not word_range or word_range[0] <= wc <= word_range[1] else "⚠️"
+            note = ""
+        print(f"{status} {result['model']:20s} | {result['scenario']:26s} | "
+              f"t={cell['temperature']} r={cell['repetition']} | {wc:3d} words{note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("config", type=Path, help="Matrix config (JSON)")
+    parser.add_argument("--models", help="Comma-separated model slugs to run (default: all)")
+    parser.add_argument("--repetitions", type=int, help="Override the config's repetitions")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the cells and estimate time, tokens and cost without running them")
+    parser.add_argument("--concurrency", help="Override provider concurrency, e.g. openai=8,lmstudio=2")
+    parser.add_argument("--fresh", action="store_true", help="Ignore an unfinished manifest and start over")
+    parser.add_argument("--skip-failed", action="store_true", help="When resuming, don't re-run failed cells")
+    parser.add_argument("--batch", action="store_true", help="Run OpenAI/Anthropic cells through their batch APIs")
+    parser.add_argument("--batch-poll", type=float, default=DEFAULT_POLL_SECONDS,
+                        help=f"Seconds between batch status checks (default {DEFAULT_POLL_SECONDS:.0f})")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Sample each cell until the config's \"sequential\" metric converges")
+    parser.add_argument("--queue", type=Path, help="Hand cells to job_queue workers through this SQLite file")
+    parser.add_argument("--block-memo", choices=("probe", "skip", "off"), default="probe",
+                        help="Known-blocked prompts: one probe per sweep then skip (default), always skip, or run them")
+    parser.add_argument("--auto-max-tokens", type=float, nargs="?", const=0.95, metavar="PERCENTILE",
+                        help="Size each model's max_tokens to cover this share of its earlier runs (default 0.95)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.repetitions is not None:
+        config["repetitions"] = args.repetitions
+    if args.sequential:
+        if "target_width" not in config.get("sequential", {}):
+            parser.error("--sequential needs a \"sequential\" block with target_width in the config")
+        # Repetitions become the per-cell cap; the sampler decides how many actually run
+        config["repetitions"] = config["sequential"].setdefault("max_samples", config["repetitions"])
+    if args.queue and args.batch:
+        parser.error("--queue and --batch are alternatives; pick one")
+    if args.concurrency:
+        for setting in args.concurrency.split(","):
+            provider, _, value = setting.partition("=")
+            if not value.isdigit():
+                parser.error(f"--concurrency expects provider=N, got '{setting}'")
+            config["providers"].setdefault(provider, {})["concurrency"] = int(value)
+    if args.models:
+        wanted = set(args.models.split(","))
+        config["models"] = [m for m in config["models"] if m["slug"] in wanted]
+    if args.sequential and config["sequential"].get("metric", "word_count") == "word_count":
+        capped = [m["slug"] for m in config["models"] if m.get("answer_word_limit") is not None]
+        if capped:
+            parser.error(f"--sequential on word_count would converge on the answer_word_limit of "
+                         f"{', '.join(capped)}; remove the cap or pick another metric")
+
+    # Drop providers that can't run here instead of failing every one of their cells
+    # (a dry run still plans them, and with --queue the workers bring their own keys)
+    runnable = []
+    for model in config["models"]:
+        reason = provider_available(model["provider"])
+        if reason and not (args.dry_run or args.queue):
+            print(f"⚠️  Skipping {model['name']}: {reason}")
+        else:
+            if reason:
+                print(f"⚠️  {model['name']} can't run here ({reason}); "
+                      f"{'planned anyway' if args.dry_run else 'left to the queue workers'}")
+            runnable.append(model)
+    config["models"] = runnable
+
+    history = load_token_history(PROJECT_ROOT / config["output_dir"])
+    if args.auto_max_tokens:
+        for change in calibrate_config(config, history, args.auto_max_tokens):
+            print(f"📏 max_tokens {change}")
+
+    cells = expand_matrix(config)
+    print("=" * 70)
+    print(f"EXPERIMENT MATRIX: {config['prefix']}")
+    print("=" * 70)
+    print(f"\n{len(config['models'])} models × {len(config['scenarios'])} scenarios × "
+          f"{len(config['temperatures'])} temperatures × {config['repetitions']} repetitions = {len(cells)} cells\n")
+
+    if args.dry_run:
+        for cell in cells:
+            print(f"  {cell['model']['provider']:10s} {cell['model']['name']:20s} | {cell['scenario']:26s} | "
+                  f"t={cell['temperature']} r={cell['repetition']}")
+        print_plan(plan_sweep(config, cells, history, batch_providers=BATCH_PROVIDERS if args.batch else ()))
+        if args.sequential:
+            print("   (--sequential: every cell at max_samples, so an upper bound)")
+        return
+
+    manifest_path = PROJECT_ROOT / config["output_dir"] / f"{config['prefix']}.manifest.jsonl"
+    manifest = SweepManifest.resume_or_start(manifest_path, fresh=args.fresh, meta={
+        "prefix": config["prefix"],
+        "config": str(args.config),
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S")
+    })
+    if not args.sequential:
+        # Sequential cells are logged as they are drawn; most of the cap never runs
+        manifest.plan(cell_id(cell) for cell in cells)
+    if manifest.resumed:
+        counts = manifest.counts()
+        print(f"↻ Resuming {manifest_path.name}: {counts['done']} done, {counts['in_flight']} interrupted, "
+              f"{counts['failed']} failed, {counts['planned']} not started\n")
+
+    block_memo = None
+    if args.block_memo != "off":
+        block_memo = BlockMemo(PROJECT_ROOT / config["output_dir"] / "block_memo.json", probe=args.block_memo == "probe")
+
+    queue = JobQueue(args.queue) if args.queue else None
+
+    if args.sequential:
+        report = run_sequential(config, cells, manifest, manifest.meta["timestamp"], block_memo=block_memo,
+                                queue=queue)
+        manifest.close()
+        if block_memo:
+            block_memo.print_report()
+        print_sequential_report(config, report)
+        report_path = save_result({"/".join(map(str, key)): stats for key, stats in report.items()},
+                                  PROJECT_ROOT / config["output_dir"], f"{config['prefix']}.sequential.json")
+        print(f"💾 Saved to: {report_path}")
+        return
+
+    pending = set(manifest.pending((cell_id(cell) for cell in cells), retry_failed=not args.skip_failed))
+    cells = [cell for cell in cells if cell_id(cell) in pending]
+
+    results = run_matrix(config, cells, manifest, manifest.meta["timestamp"], batch=args.batch,
+                         poll_seconds=args.batch_poll, block_memo=block_memo, queue=queue)
+    manifest.close()
+    print_summary(cells, results, config.get("word_range"))
+    if any(r is None for r in results):
+        print(f"\nRe-run the same command to resume ({manifest_path.name})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Asyncio twin of OLMoClient for running several LM Studio / llama.cpp slots at once.
+Shares payload building, stream accumulation, result shaping and the fallback
+and sampling steps with the sync client; only the I/O is its own.
+"""
+
+import asyncio
+import json
+import time
+from typing import Optional, Dict, Any, AsyncIterator, List
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+from completion_cache import CompletionCache
+from resilience import RetryPolicy, CircuitBreaker, RetryTracker
+from olmo_client import OLMoClient, SSEDecoder, StreamAccumulator, DEFAULT_BASE_URL
+from trace_parser import forced_close_offset
+
+
+class AsyncOLMoClient(OLMoClient):
+    """
+    Async client for LM Studio's OpenAI-compatible API.
+
+    concurrency bounds the number of in-flight requests (set it to the server's
+    parallel slot count). All requests share one pooled aiohttp session
+    (aio_session); pass aio_session= to share a pool between clients for
+    different models. The inherited requests session stays in place, so sync
+    helpers such as ModelResidency(client) still work on this client.
+
+    Use as `async with AsyncOLMoClient(...) as client:` or call close() when done.
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        model: str = "allenai/olmo-3-32b-think",
+        timeout: float = 600,
+        implicit_think: Optional[bool] = None,
+        concurrency: int = 4,
+        aio_session: Optional["aiohttp.ClientSession"] = None,
+        cache: Optional[CompletionCache] = None,
+        connect_timeout: float = 10,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        cache_prompt: bool = False
+    ):
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp package not available. Install with: pip install aiohttp")
+
+        super().__init__(base_url=base_url, model=model, timeout=timeout,
+                         implicit_think=implicit_think, cache=cache, connect_timeout=connect_timeout,
+                         retry_policy=retry_policy, circuit_breaker=circuit_breaker,
+                         cache_prompt=cache_prompt)
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.aio_session = aio_session
+        self._owns_session = aio_session is None
+
+    async def __aenter__(self) -> "AsyncOLMoClient":
+        self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """Create the pooled session lazily, inside the running event loop."""
+        if self.aio_session is None or self.aio_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+            self.aio_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, connect=self.connect_timeout,
+                                              sock_read=self.timeout)
+            )
+            self._owns_session = True
+        return self.aio_session
+
+    async def close(self):
+        """Close the session if this client created it."""
+        if self._owns_session and self.aio_session is not None and not self.aio_session.closed:
+            await self.aio_session.close()
+
+    async def verify_connection(self) -> bool:
+        """Verify LM Studio API is accessible and model is loaded."""
+        try:
+            async with self._get_session().get(f"{self.base_url}/models") as response:
+                response.raise_for_status()
+                models = await response.json()
+
+            loaded_models = [m["id"] for m in models.get("data", [])]
+            if self.model in loaded_models:
+                print(f"✓ Connected to LM Studio API")
+                print(f"✓ Model loaded: {self.model}")
+                return True
+            else:
+                print(f"✗ Model '{self.model}' not found in loaded models")
+                print(f"  Available models: {', '.join(loaded_models)}")
+                return False
+        except Exception as e:
+            print(f"✗ Connection failed: {e}")
+            return False
+
+    async def complete(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 8192,
+        stream: bool = False,
+        on_delta=None,
+        answer_word_limit: Optional[int] = None,
+        answer_sentence_limit: Optional[int] = None,
+        think_budget: Optional[int] = None,
+        fallback_ladder: Optional[List[Dict[str, Any]]] = None,
+        system: Optional[str] = None,
+        prefill: Optional[str] = None,
+        samples: int = 1,
+        cache_bypass: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Coroutine version of OLMoClient.complete(); returns the same result dict."""
+        cache_key, cache_request, cached = self._cache_lookup(
+            prompt, temperature, max_tokens, cache_bypass,
+            answer_word_limit=answer_word_limit,
+            answer_sentence_limit=answer_sentence_limit,
+            think_budget=think_budget,
+            fallback_ladder=fallback_ladder,
+            system=system,
+            prefill=prefill,
+            samples=samples,
+            **kwargs
+        )
+        if cached is not None:
+            return cached
+
+        request = dict(
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=stream,
+            on_delta=on_delta,
+            answer_word_limit=answer_word_limit,
+            answer_sentence_limit=answer_sentence_limit,
+            think_budget=think_budget,
+            fallback_ladder=fallback_ladder,
+            system=system,
+            prefill=prefill,
+            **kwargs
+        )
+        if samples > 1:
+            result = await self._complete_samples(prompt, samples, request)
+        else:
+            result = await self._complete_once(prompt, **request)
+
+        self._cache_store(cache_key, result, cache_request)
+        return result
+
+    async def _complete_once(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        on_delta,
+        answer_word_limit: Optional[int],
+        answer_sentence_limit: Optional[int],
+        think_budget: Optional[int],
+        fallback_ladder: Optional[List[Dict[str, Any]]],
+        system: Optional[str],
+        prefill: Optional[str],
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Coroutine version of OLMoClient._complete_once()."""
+        if think_budget is not None:
+            result = await self._complete_with_fallback(
+                prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                think_budget=think_budget,
+                fallback_ladder=fallback_ladder,
+                on_delta=on_delta,
+                answer_word_limit=answer_word_limit,
+                answer_sentence_limit=answer_sentence_limit,
+                system=system,
+                prefill=prefill,
+                **kwargs
+            )
+
+        elif stream or answer_word_limit is not None or answer_sentence_limit is not None:
+            result = None
+            async for delta in self.stream(
+                prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                answer_word_limit=answer_word_limit,
+                answer_sentence_limit=answer_sentence_limit,
+                system=system,
+                prefill=prefill,
+                **kwargs
+            ):
+                if delta["type"] == "result":
+                    result = delta["result"]
+                elif on_delta:
+                    on_delta(delta)
+
+        else:
+            payload = self._build_payload(prompt, temperature, max_tokens, stream=False,
+                                          system=system, prefill=prefill, **kwargs)
+            result = await self._complete_blocking(payload, prefill)
+
+        return result
+
+    async def _complete_samples(self, prompt: str, samples: int, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Coroutine version of OLMoClient._complete_samples(); the fallback requests run concurrently."""
+        start_time = time.time()
+        results = []
+        if self._native_samples_ok(request) and self.supports_n is not False:
+            results = self._native_results(await self._complete_n(prompt, samples, **request), samples)
+        native = len(results)
+
+        remaining = samples - native
+        if remaining:
+            request = self._parallel_request(request)
+            results += await asyncio.gather(*(self._complete_once(prompt, **request) for _ in range(remaining)))
+
+        return self._merge_samples(results, native, time.time() - start_time)
+
+    async def _complete_n(
+        self,
+        prompt: str,
+        samples: int,
+        temperature: float,
+        max_tokens: int,
+        system: Optional[str],
+        prefill: Optional[str],
+        stream: bool = False,
+        on_delta=None,
+        answer_word_limit: Optional[int] = None,
+        answer_sentence_limit: Optional[int] = None,
+        think_budget: Optional[int] = None,
+        fallback_ladder: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Coroutine version of OLMoClient._complete_n()."""
+        payload = self._build_payload(prompt, temperature, max_tokens, stream=False,
+                                      system=system, prefill=prefill, n=samples, **kwargs)
+        result = await self._complete_blocking(payload, prefill)
+        if "error" in result:
+            return result
+        return self._split_choices(result, prefill)
+
+    async def _complete_blocking(self, payload: Dict[str, Any], prefill: Optional[str] = None) -> Dict[str, Any]:
+        """Send a non-streaming request (retrying transient failures) and shape the reply."""
+        tracker = None
+
+        try:
+            while True:
+                # The slot is released while backing off so other requests can use it
+                async with self.semaphore:
+                    # Time from slot acquisition so queueing behind the semaphore isn't counted as generation
+                    tracker = tracker or RetryTracker(self.retry_policy, self.circuit_breaker)
+                    circuit_error = tracker.circuit_error()
+                    if circuit_error:
+                        return circuit_error
+
+                    try:
+                        url = f"{self.base_url}/chat/completions"
+                        async with self._get_session().post(url, json=payload) as response:
+                            response.raise_for_status()
+                            result = await response.json()
+
+                        response_text = (prefill or "") + result["choices"][0]["message"]["content"]
+
+                    except Exception as e:
+                        delay = tracker.failure(e)
+                        if delay is None:
+                            return tracker.error_result(e)
+                    else:
+                        tracker.success()
+                        result = self._build_result(response_text, result, time.time() - tracker.start_time,
+                                                    forced_close_offset(prefill))
+                        result["attempts"] = tracker.attempts
+                        return result
+
+                await asyncio.sleep(delay)
+        finally:
+            if tracker:
+                tracker.release()
+
+    async def stream(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 8192,
+        answer_word_limit: Optional[int] = None,
+        answer_sentence_limit: Optional[int] = None,
+        think_budget: Optional[int] = None,
+        system: Optional[str] = None,
+        prefill: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async generator version of OLMoClient.stream(); yields the same typed deltas."""
+        payload = self._build_payload(prompt, temperature, max_tokens, stream=True,
+                                      system=system, prefill=prefill, **kwargs)
+        tracker = None
+
+        try:
+            while True:
+                delay = None
+                async with self.semaphore:
+                    tracker = tracker or RetryTracker(self.retry_policy, self.circuit_breaker)
+                    circuit_error = tracker.circuit_error()
+                    if circuit_error:
+                        yield {"type": "result", "result": circuit_error}
+                        return
+
+                    accumulator = StreamAccumulator(self.model, implicit_think=self.implicit_think, prefill=prefill)
+                    stop = None
+                    try:
+                        url = f"{self.base_url}/chat/completions"
+                        async with self._get_session().post(url, json=payload) as response:
+                            response.raise_for_status()
+                            decoder = SSEDecoder()
+
+                            async for raw_line in response.content:
+                                data = decoder.feed_line(raw_line.decode("utf-8"))
+                                if data is None:
+                                    continue
+                                if data.strip() == "[DONE]":
+                                    break
+                                for delta in accumulator.add_chunk(json.loads(data)):
+                                    yield delta
+
+                                stop = accumulator.stop_signal(answer_word_limit, answer_sentence_limit, think_budget)
+                                if stop:
+                                    # Releasing the response closes the connection, which cancels generation
+                                    response.close()
+                                    yield stop
+                                    break
+
+                    except Exception as e:
+                        delay = tracker.failure(e)
+                        if delay is None:
+                            yield {"type": "result", "result": self._stream_error(e, accumulator, tracker)}
+                            return
+                    else:
+                        tracker.success()
+
+                if delay is None:
+                    break
+                # Back off outside the semaphore so the slot is free for other requests
+                yield self._retry_delta(tracker, delay)
+                await asyncio.sleep(delay)
+        finally:
+            if tracker:
+                tracker.release()
+
+        yield {"type": "result", "result": self._stream_result(accumulator, stop, tracker)}
+
+    async def _complete_with_fallback(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        think_budget: int,
+        fallback_ladder: Optional[List[Dict[str, Any]]] = None,
+        on_delta=None,
+        system: Optional[str] = None,
+        prefill: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Coroutine version of OLMoClient._complete_with_fallback()."""
+        start_time = time.time()
+        attempts = []
+        trace = ""
+        result = None
+
+        for index, rung in enumerate(self._fallback_rungs(fallback_ladder)):
+            request = self._rung_request(rung, trace, temperature, max_tokens, think_budget, system, prefill)
+            async for delta in self.stream(prompt, **request, **kwargs):
+                if delta["type"] == "result":
+                    result = delta["result"]
+                elif on_delta:
+                    on_delta({**delta, "rung": index})
+
+            trace = self._next_trace(index, rung, result, trace, attempts)
+            if trace is None:
+                break
+
+        return self._finish_fallback(result, attempts, think_budget, start_time)
+
+    async def complete_many(self, prompts: List[str], **kwargs) -> List[Dict[str, Any]]:
+        """Run complete() for every prompt concurrently (bounded by the semaphore), in input order."""
+        return await asyncio.gather(*(self.complete(prompt, **kwargs) for prompt in prompts))
@@ -0,0 +1,248 @@
+"""
+Offline batch execution through the OpenAI Batch API and Anthropic Message Batches.
+A list of requests is serialized into the provider's batch format, submitted as one
+job (split only past the provider's size limit), polled until it ends, and each
+reply is mapped back to its custom_id. Batches are billed at about half the
+synchronous price and need no client-side rate limiting.
+
+Point OPENAI_BASE_URL / ANTHROPIC_BASE_URL at scripts/fake_batch_api.py to run offline.
+"""
+
+import hashlib
+import io
+import json
+import re
+import time
+from typing import Optional, Dict, Any, List, Callable, Iterable
+
+from client_registry import openai_client, anthropic_client
+
+BATCH_PROVIDERS = ("openai", "anthropic")
+
+# Requests per batch job (both providers also cap the payload size, which our prompts stay well under)
+MAX_BATCH_REQUESTS = {
+    "openai": 50_000,
+    "anthropic": 100_000
+}
+
+DEFAULT_POLL_SECONDS = 30.0
+
+CUSTOM_ID_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def batch_custom_id(key: str) -> str:
+    """Stable custom_id for any string key, within Anthropic's ^[a-zA-Z0-9_-]{1,64}$ (and so OpenAI's)."""
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+    return f"{CUSTOM_ID_UNSAFE.sub('_', key)[:48]}-{digest}"
+
+
+def openai_batch_line(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One line of an OpenAI batch input file. item has custom_id, model, prompt
+    and optionally max_tokens, temperature, n and json (JSON-object output).
+    """
+    body: Dict[str, Any] = {
+        "model": item["model"],
+        "messages": [{"role": "user", "content": item["prompt"]}]
+    }
+    if item.get("max_tokens") is not None:
+        body["max_completion_tokens"] = item["max_tokens"]
+    if item.get("temperature") is not None:
+        body["temperature"] = item["temperature"]
+    if item.get("n", 1) > 1:
+        body["n"] = item["n"]
+    if item.get("json"):
+        body["response_format"] = {"type": "json_object"}
+    return {"custom_id": item["custom_id"], "method": "POST", "url": "/v1/chat/completions", "body": body}
+
+
+def anthropic_batch_request(item: Dict[str, Any]) -> Dict[str, Any]:
+    """One request of an Anthropic message batch (max_tokens is required there)."""
+    params: Dict[str, Any] = {
+        "model": item["model"],
+        "max_tokens": item["max_tokens"],
+        "messages": [{"role": "user", "content": item["prompt"]}]
+    }
+    if item.get("temperature") is not None:
+        params["temperature"] = item["temperature"]
+    return {"custom_id": item["custom_id"], "params": params}
+
+
+def _openai_reply(line: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize one line of an OpenAI batch output or error file."""
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or response.get("body", {}).get("error") or {}
+        return {"error": f"{error.get('code', response.get('status_code'))}: {error.get('message', 'request failed')}"}
+    body = response["body"]
+    texts = [choice["message"]["content"] for choice in body["choices"]]
+    return {
+        "response": texts[0],
+        "texts": texts,
+        "tokens_prompt": body["usage"]["prompt_tokens"],
+        "tokens_completion": body["usage"]["completion_tokens"],
+        "finish_reason": body["choices"][0].get("finish_reason")
+    }
+
+
+def _anthropic_reply(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize one Anthropic batch result (succeeded, errored, canceled or expired)."""
+    result = entry["result"]
+    if result["type"] != "succeeded":
+        error = (result.get("error") or {}).get("error") or {}
+        return {"error": f"{result['type']}: {error.get('message', 'no result')}"}
+    message = result["message"]
+    text = "".join(block.get("text", "") for block in message["content"] if block.get("type") == "text")
+    return {
+        "response": text,
+        "texts": [text],
+        "tokens_prompt": message["usage"]["input_tokens"],
+        "tokens_completion": message["usage"]["output_tokens"],
+        "finish_reason": message.get("stop_reason")
+    }
+
+
+def _as_dict(obj: Any) -> Dict[str, Any]:
+    """SDK models to plain dicts, so both providers' results parse the same way."""
+    return obj.model_dump() if hasattr(obj, "model_dump") else obj
+
+
+class BatchJob:
+    """One submitted batch on one provider, identified by its batch id."""
+
+    def __init__(self, provider: str, batch_id: str):
+        if provider not in BATCH_PROVIDERS:
+            raise ValueError(f"No batch API for provider '{provider}'")
+        self.provider = provider
+        self.batch_id = batch_id
+        self.client = openai_client() if provider == "openai" else anthropic_client()
+
+    @classmethod
+    def submit(cls, provider: str, items: List[Dict[str, Any]], description: Optional[str] = None) -> "BatchJob":
+        """Serialize items into the provider's batch format and submit them as one job."""
+        if provider == "openai":
+            client = openai_client()
+            lines = "".join(json.dumps(openai_batch_line(item), ensure_ascii=False) + "\n" for item in items)
+            input_file = client.files.create(file=("batch.jsonl", io.BytesIO(lines.encode("utf-8"))), purpose="batch")
+            batch = client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions",
+                                          completion_window="24h",
+                                          metadata={"description": description} if description else None)
+        elif provider == "anthropic":
+            batch = anthropic_client().messages.batches.create(requests=[anthropic_batch_request(i) for i in items])
+        else:
+            raise ValueError(f"No batch API for provider '{provider}'")
+        return cls(provider, batch.id)
+
+    def status(self) -> Dict[str, Any]:
+        """{"ended": bool, "status": provider status, "done": n, "total": n}"""
+        if self.provider == "openai":
+            batch = self.client.batches.retrieve(self.batch_id)
+            counts = batch.request_counts
+            return {
+                "ended": batch.status in ("completed", "failed", "expired", "cancelled"),
+                "status": batch.status,
+                "done": (counts.completed + counts.failed) if counts else 0,
+                "total": counts.total if counts else 0
+            }
+        batch = self.client.messages.batches.retrieve(self.batch_id)
+        counts = batch.request_counts
+        done = counts.succeeded + counts.errored + counts.canceled + counts.expired
+        return {
+            "ended": batch.processing_status == "ended",
+            "status": batch.processing_status,
+            "done": done,
+            "total": done + counts.processing
+        }
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        """Normalized reply per custom_id; requests the batch never answered are missing."""
+        if self.provider == "anthropic":
+            return {entry["custom_id"]: _anthropic_reply(entry)
+                    for entry in map(_as_dict, self.client.messages.batches.results(self.batch_id))}
+
+        batch = self.client.batches.retrieve(self.batch_id)
+        replies = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    replies[record["custom_id"]] = _openai_reply(record)
+        if batch.status == "failed" and batch.errors:
+            # Rejected at validation: no output file, only batch-level errors
+            reason = "; ".join(e.message for e in (batch.errors.data or []) if e.message)
+            replies.setdefault("*", {"error": f"Batch failed: {reason}"})
+        return replies
+
+    def cancel(self):
+        if self.provider == "openai":
+            self.client.batches.cancel(self.batch_id)
+        else:
+            self.client.messages.batches.cancel(self.batch_id)
+
+    def wait(self, poll_seconds: float = DEFAULT_POLL_SECONDS,
+             timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Poll until the batch ends (printing progress as it moves), then return results()."""
+        start = time.time()
+        last = None
+        while True:
+            status = self.status()
+            progress = (status["status"], status["done"])
+            if progress != last:
+                print(f"⏳ {self.provider} batch {self.batch_id}: {status['status']}, "
+                      f"{status['done']}/{status['total']} done")
+                last = progress
+            if status["ended"]:
+                return self.results()
+            if timeout is not None and time.time() - start > timeout:
+                raise TimeoutError(f"{self.provider} batch {self.batch_id} still {status['status']} after {timeout:.0f}s")
+            time.sleep(poll_seconds)
+
+
+def _chunks(items: List[Dict[str, Any]], size: int) -> Iterable[List[Dict[str, Any]]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def run_batch(
+    provider: str,
+    items: List[Dict[str, Any]],
+    attach: Iterable[str] = (),
+    on_submit: Optional[Callable[[str, List[str]], None]] = None,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    description: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run items as batch jobs and return the normalized reply per custom_id
+    ({"response", "texts", "tokens_prompt", "tokens_completion",
+    "finish_reason"} or {"error"}).
+
+    attach lists batch ids an earlier, interrupted run already submitted:
+    they are waited for first, and only items they didn't answer
+    successfully are submitted again. on_submit(batch_id, custom_ids) is
+    called as soon as each new job is accepted, so callers can record the id
+    before the long wait.
+    """
+    replies: Dict[str, Dict[str, Any]] = {}
+    wanted = {item["custom_id"] for item in items}
+    for batch_id in attach:
+        for custom_id, reply in BatchJob(provider, batch_id).wait(poll_seconds).items():
+            if custom_id in wanted and "error" not in reply:
+                replies[custom_id] = reply
+
+    remaining = [item for item in items if item["custom_id"] not in replies]
+    jobs = []
+    for chunk in _chunks(remaining, MAX_BATCH_REQUESTS[provider]):
+        job = BatchJob.submit(provider, chunk, description)
+        print(f"📦 Submitted {len(chunk)} request(s) as {provider} batch {job.batch_id}")
+        if on_submit:
+            on_submit(job.batch_id, [item["custom_id"] for item in chunk])
+        jobs.append((job, chunk))
+
+    for job, chunk in jobs:
+        results = job.wait(poll_seconds)
+        for item in chunk:
+            missing = results.get("*", {"error": f"Not returned by batch {job.batch_id}"})
+            replies[item["custom_id"]] = results.get(item["custom_id"], missing)
+    return replies
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: sync OLMoClient vs AsyncOLMoClient at several concurrency levels.
+Sends the same batch of prompts each way and reports requests/sec and completion tokens/sec.
+
+Usage:
+    python scripts/bench_concurrency.py --model qwen3-14b-instruct --requests 16 --levels 1,2,4,8
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, Any, List
+
+from olmo_client import OLMoClient, DEFAULT_BASE_URL
+from async_olmo_client import AsyncOLMoClient
+
+BENCH_PROMPT = """Hype up your friend who just got a good grade using Gen-Alpha slang and emojis. Keep it short (50-100 words max)."""
+
+
+def summarize(label: str, results: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    """Aggregate one benchmark run."""
+    ok = [r for r in results if "error" not in r]
+    tokens = sum(r["tokens_completion"] for r in ok)
+    return {
+        "label": label,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "wall_seconds": wall,
+        "requests_per_second": len(ok) / wall if wall else 0.0,
+        "tokens_per_second": tokens / wall if wall else 0.0
+    }
+
+
+def run_sync(base_url: str, model: str, count: int, max_tokens: int) -> Dict[str, Any]:
+    """Baseline: the existing client, one request at a time."""
+    client = OLMoClient(base_url=base_url, model=model)
+    start = time.time()
+    results = [client.complete(BENCH_PROMPT, max_tokens=max_tokens) for _ in range(count)]
+    return summarize("sync", results, time.time() - start)
+
+
+async def run_async(base_url: str, model: str, concurrency: int, count: int, max_tokens: int) -> Dict[str, Any]:
+    """The async client with `concurrency` requests in flight."""
+    async with AsyncOLMoClient(base_url=base_url, model=model, concurrency=concurrency) as client:
+        start = time.time()
+        results = await client.complete_many([BENCH_PROMPT] * count, max_tokens=max_tokens)
+        return summarize(f"async x{concurrency}", results, time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--model", default="allenai/olmo-3-32b-think")
+    parser.add_argument("--requests", type=int, default=16, help="Requests per run")
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma-separated async concurrency levels")
+    parser.add_argument("--max-tokens", type=int, default=256)
+    args = parser.parse_args()
+
+    if not OLMoClient(base_url=args.base_url, model=args.model).verify_connection():
+        return
+
+    runs = [run_sync(args.base_url, args.model, args.requests, args.max_tokens)]
+    for level in [int(x) for x in args.levels.split(",")]:
+        runs.append(asyncio.run(run_async(args.base_url, args.model, level, args.requests, args.max_tokens)))
+
+    baseline = runs[0]["requests_per_second"] or 1.0
+    print(f"\n{'='*70}")
+    print(f"THROUGHPUT ({args.requests} requests, max_tokens={args.max_tokens})")
+    print(f"{'='*70}")
+    print(f"{'run':12s} {'wall s':>8s} {'req/s':>8s} {'tok/s':>9s} {'speedup':>8s} {'errors':>7s}")
+    for run in runs:
+        print(f"{run['label']:12s} {run['wall_seconds']:8.2f} {run['requests_per_second']:8.2f} "
+              f"{run['tokens_per_second']:9.1f} {run['requests_per_second'] / baseline:7.2f}x {run['errors']:7d}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Persistent memo of prompts a provider refuses to answer.
+Gemini 3 Pro blocks some of our prompts outright (finish reason RECITATION or
+SAFETY, even with every safety filter off), and a sweep would otherwise pay a
+full round trip per cell to find that out again. Blocks are recorded per
+model, prompt hash and generation config with the finish reason and safety
+ratings; later cells with the same key are skipped, after at most one probe
+per sweep to check the block still holds.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+RUN = "run"
+PROBE = "probe"
+SKIP = "skip"
+
+# A block older than this is re-tested as if it were unknown
+DEFAULT_TTL_DAYS = 30
+
+
+class BlockMemo:
+    """
+    Known blocks, stored as one JSON file keyed by key().
+
+    gate(key) says what to do with a cell: RUN it (no known block), PROBE
+    (known block, and this is the sweep's one call to re-check it) or SKIP.
+    While a probe is in flight, other cells with the same key wait for it.
+    record() feeds every outcome back: a block adds or refreshes the entry,
+    a successful reply clears it, and any other error leaves it as it was
+    (the next cell probes again). With probe=False, known blocks are skipped
+    without re-checking.
+    """
+
+    def __init__(self, path: Path, probe: bool = True, ttl_days: float = DEFAULT_TTL_DAYS):
+        self.path = Path(path)
+        self.probe = probe
+        self.ttl = timedelta(days=ttl_days)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        self.skipped = 0
+        self.probes = 0
+        self.still_blocked = 0
+        self.cleared = 0
+        self.new_blocks = 0
+        self._probing: Dict[str, threading.Event] = {}
+        self._confirmed: set = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_id: str, prompt: str, generation: Dict[str, Any]) -> str:
+        """Hash of model, prompt and generation config (temperature, max_tokens, sampling, system prompt)."""
+        canonical = json.dumps({
+            "model": model_id,
+            "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+            "generation": generation
+        }, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def known(self, key: str) -> Optional[Dict[str, Any]]:
+        """The block entry for key, unless there is none or it has expired."""
+        entry = self.entries.get(key)
+        if entry and datetime.now() - datetime.fromisoformat(entry["last_blocked"]) <= self.ttl:
+            return entry
+        return None
+
+    def gate(self, key: str) -> str:
+        """RUN, PROBE or SKIP for the next cell with this key."""
+        while True:
+            with self._lock:
+                if self.known(key) is None:
+                    return RUN
+                if not self.probe or key in self._confirmed:
+                    self.skipped += 1
+                    return SKIP
+                probing = self._probing.get(key)
+                if probing is None:
+                    self._probing[key] = threading.Event()
+                    self.probes += 1
+                    return PROBE
+            probing.wait()
+
+    def record(self, key: str, result: Dict[str, Any], model_id: str, prompt: str,
+               generation: Dict[str, Any], probe: bool = False):
+        """Feed back the outcome of a cell gate() let through (probe=True if it was the PROBE)."""
+        blocked = result.get("blocked")
+        with self._lock:
+            now = datetime.now().isoformat()
+            changed = bool(blocked)
+            if blocked:
+                entry = self.entries.get(key) or {
+                    "model": model_id,
+                    "prompt_preview": prompt[:80],
+                    "generation": generation,
+                    "first_blocked": now,
+                    "blocks": 0
+                }
+                entry.update(blocked, last_blocked=now, blocks=entry["blocks"] + 1)
+                if key not in self.entries:
+                    self.new_blocks += 1
+                self.entries[key] = entry
+                # Seen blocked in this sweep already, so the rest of its cells need no probe
+                self._confirmed.add(key)
+                if probe:
+                    self.still_blocked += 1
+            elif "error" not in result and key in self.entries:
+                del self.entries[key]
+                self.cleared += 1
+                changed = True
+            if probe:
+                # Waiting cells re-check: skip if confirmed, run if cleared, probe again if inconclusive
+                self._probing.pop(key).set()
+            if changed:
+                self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "known_blocks": len(self.entries),
+            "new_blocks": self.new_blocks,
+            "probes": self.probes,
+            "still_blocked": self.still_blocked,
+            "cleared": self.cleared,
+            "calls_saved": self.skipped
+        }
+
+    def print_report(self):
+        stats = self.stats()
+        if not (stats["calls_saved"] or stats["probes"] or stats["new_blocks"]):
+            return
+        print(f"\n🚫 Block memo: {stats['calls_saved']} call(s) saved on known-blocked cells | "
+              f"{stats['probes']} probe(s): "
+              f"{stats['still_blocked']} still blocked, {stats['cleared']} cleared | "
+              f"{stats['new_blocks']} new block(s) recorded")
@@ -0,0 +1,230 @@
+"""
+Process-wide registry of pooled, keep-alive API clients.
+One OpenAI or Anthropic client per API key and endpoint, and one requests
+session per LM Studio server, shared by every generation and judging path so
+repeated calls reuse open connections instead of paying TCP/TLS setup again.
+"""
+
+import os
+import threading
+from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+try:
+    from anthropic import Anthropic
+    CLAUDE_AVAILABLE = True
+except ImportError:
+    CLAUDE_AVAILABLE = False
+
+try:
+    import google.generativeai as genai
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+# Connections kept open per client (and the most in flight at once).
+# Override with CLIENT_POOL_<PROVIDER>, e.g. CLIENT_POOL_OPENAI=32.
+DEFAULT_POOL_SIZES = {
+    "openai": 16,
+    "anthropic": 16,
+    "lmstudio": 8
+}
+
+# Idle connections older than this are closed rather than reused
+KEEPALIVE_EXPIRY = 60.0
+
+
+def pool_size(provider: str) -> int:
+    return int(os.environ.get(f"CLIENT_POOL_{provider.upper()}", DEFAULT_POOL_SIZES.get(provider, 8)))
+
+
+class ConnectionStats:
+    """Requests sent vs connections opened for one pooled client."""
+
+    def __init__(self, name: str, pool_size: int):
+        self.name = name
+        self.pool_size = pool_size
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def request(self):
+        with self._lock:
+            self.requests += 1
+
+    def connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "client": self.name,
+            "pool_size": self.pool_size,
+            "requests": self.requests,
+            "connections": self.connections,
+            "reused": max(0, self.requests - self.connections),
+            "reuse_rate": round(1 - self.connections / self.requests, 3) if self.requests else 0.0
+        }
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter that reports every request and every new connection to a ConnectionStats."""
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # urllib3 calls _new_conn only when no idle connection can be reused
+        for scheme in ("http", "https"):
+            pool_cls = self.poolmanager.pool_classes_by_scheme[scheme]
+            stats = self.stats
+
+            class CountingPool(pool_cls):
+                def _new_conn(self):
+                    stats.connection()
+                    return super()._new_conn()
+
+            self.poolmanager.pool_classes_by_scheme = {**self.poolmanager.pool_classes_by_scheme,
+                                                       scheme: CountingPool}
+
+    def send(self, request, **kwargs):
+        self.stats.request()
+        return super().send(request, **kwargs)
+
+
+_clients: Dict[Any, Any] = {}
+_stats: Dict[str, ConnectionStats] = {}
+_lock = threading.Lock()
+
+
+def _endpoint(base_url: Optional[str]) -> str:
+    """scheme://host[:port] of a base URL; clients and connections are per endpoint."""
+    if not base_url:
+        return "default"
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _register(key, name: str, size: int, build):
+    with _lock:
+        if key not in _clients:
+            stats = _stats.setdefault(name, ConnectionStats(name, size))
+            _clients[key] = build(stats)
+        return _clients[key]
+
+
+def http_session(base_url: str, provider: str = "lmstudio") -> requests.Session:
+    """Shared keep-alive requests session for one server (LM Studio or any plain HTTP API)."""
+    endpoint = _endpoint(base_url)
+    size = pool_size(provider)
+
+    def build(stats: ConnectionStats) -> requests.Session:
+        session = requests.Session()
+        adapter = _CountingAdapter(stats, pool_maxsize=size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    return _register(("session", endpoint), f"{provider}:{endpoint}", size, build)
+
+
+def _httpx_client(stats: ConnectionStats, size: int) -> "httpx.Client":
+    """httpx client with a bounded keep-alive pool whose new connections are counted via httpcore's trace hook."""
+    def trace(event: str, info: Dict[str, Any]):
+        if event == "connection.connect_tcp.complete":
+            stats.connection()
+
+    def on_request(request: "httpx.Request"):
+        stats.request()
+        request.extensions["trace"] = trace
+
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=KEEPALIVE_EXPIRY),
+        timeout=httpx.Timeout(600, connect=10),
+        event_hooks={"request": [on_request]}
+    )
+
+
+def openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                  max_retries: Optional[int] = None) -> "OpenAI":
+    """
+    Shared OpenAI client for this key and endpoint (OPENAI_API_KEY if api_key is None).
+    max_retries=0 turns off the SDK's own retries for callers that go through
+    rate_limiter.rate_limited_call, which needs to see the 429s itself.
+    """
+    if not OPENAI_AVAILABLE:
+        raise RuntimeError("OpenAI package not available")
+    api_key = api_key or os.environ.get("OPENAI_API_KEY")
+    endpoint = _endpoint(base_url)
+    size = pool_size("openai")
+
+    def build(stats: ConnectionStats) -> "OpenAI":
+        http_client = _httpx_client(stats, size) if HTTPX_AVAILABLE else None
+        retries = {} if max_retries is None else {"max_retries": max_retries}
+        return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, **retries)
+
+    return _register(("openai", api_key, endpoint, max_retries), f"openai:{endpoint}", size, build)
+
+
+def anthropic_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                     max_retries: Optional[int] = None) -> "Anthropic":
+    """Shared Anthropic client for this key and endpoint (ANTHROPIC_API_KEY if api_key is None); max_retries as for openai_client()."""
+    if not CLAUDE_AVAILABLE:
+        raise RuntimeError("Anthropic package not available")
+    api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
+    endpoint = _endpoint(base_url)
+    size = pool_size("anthropic")
+
+    def build(stats: ConnectionStats) -> "Anthropic":
+        http_client = _httpx_client(stats, size) if HTTPX_AVAILABLE else None
+        retries = {} if max_retries is None else {"max_retries": max_retries}
+        return Anthropic(api_key=api_key, base_url=base_url, http_client=http_client, **retries)
+
+    return _register(("anthropic", api_key, endpoint, max_retries), f"anthropic:{endpoint}", size, build)
+
+
+def configure_gemini(api_key: Optional[str] = None):
+    """
+    Configure the google.generativeai module once per key. Its gRPC channel is
+    process-wide already; re-running configure() on every call would rebuild it.
+    """
+    if not GEMINI_AVAILABLE:
+        raise RuntimeError("Google GenAI package not available")
+    api_key = api_key or os.environ.get("GOOGLE_API_KEY")
+    with _lock:
+        if _clients.get("gemini") != api_key:
+            genai.configure(api_key=api_key)
+            _clients["gemini"] = api_key
+
+
+def client_stats() -> Dict[str, Dict[str, Any]]:
+    """Requests, connections opened and reuse rate per pooled client."""
+    with _lock:
+        return {name: stats.as_dict() for name, stats in _stats.items()}
+
+
+def print_client_stats():
+    stats = [s for s in client_stats().values() if s["requests"]]
+    if not stats:
+        return
+    print("\n🔌 Connection reuse:")
+    for s in stats:
+        print(f"   {s['client']:40s} {s['requests']:5d} requests | {s['connections']:3d} connections "
+              f"(pool {s['pool_size']}) | {s['reuse_rate'] * 100:.0f}% reused")
@@ -0,0 +1,148 @@
+"""
+Persistent on-disk completion cache for OLMoClient.
+Results are stored content-addressed (sha256 of the full request) with LRU eviction by size.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+# A writer's temp file lives for milliseconds; one this old was left by a crashed writer
+STALE_TMP_SECONDS = 3600
+
+
+class CompletionCache:
+    """
+    Content-addressed cache of completion results under cache_dir.
+
+    Each entry is one JSON file named after the request hash. Reads refresh the
+    file's mtime, and writes evict least-recently-used entries once the
+    directory exceeds max_bytes. One cache can be shared by threads (the async
+    client, OLMoClientPool and run_matrix all do) and by processes: writes go
+    through a uniquely named temp file, the counters are guarded by a lock, and
+    every write re-measures the directory, so other processes' entries count
+    toward max_bytes too. Temp files left by crashed writers are swept on start.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._sweep_temp_files()
+        self._bytes = sum(size for _, size, _ in self._entries())
+
+    def _sweep_temp_files(self):
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for path in self.cache_dir.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                continue  # Renamed into place or swept by another process
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        """Hash a request description (payload, model id, control options) into a cache key."""
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            # Touch so eviction sees this entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted since it was read; the result is still good
+        with self._lock:
+            self.hits += 1
+        return entry["result"]
+
+    def put(self, key: str, result: Dict[str, Any], request: Optional[Dict[str, Any]] = None):
+        """Store a result (atomically) and evict old entries if over budget."""
+        path = self._path(key)
+        # Unique per writer, so concurrent puts of the same key never share a temp file
+        with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, prefix=f"{key}.", suffix=".tmp",
+                                         delete=False) as f:
+            json.dump({"key": key, "request": request, "result": result}, f)
+
+        with self._lock:
+            os.replace(f.name, path)
+            self.writes += 1
+            self._evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in max_bytes."""
+        with self._lock:
+            self._evict()
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry on disk, whichever process wrote it."""
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Removed by another process
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        self._bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._bytes <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "entries": len(list(self.cache_dir.glob("*.json"))),
+                "bytes": self._bytes
+            }
+
+
+def cache_from_env() -> Optional[CompletionCache]:
+    """
+    Build a cache from OLMO_CACHE_DIR (and optional OLMO_CACHE_MAX_MB), or None when unset.
+    Lets the experiment scripts opt in without code changes.
+    """
+    cache_dir = os.environ.get("OLMO_CACHE_DIR")
+    if not cache_dir:
+        return None
+    max_mb = int(os.environ.get("OLMO_CACHE_MAX_MB", "512"))
+    return CompletionCache(cache_dir, max_bytes=max_mb * 1024 * 1024)
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the OpenAI Batch API and Anthropic Message Batches, for testing batch mode.
+Serves the endpoints batch_runner uses (OpenAI /v1/files, /v1/batches; Anthropic
+/v1/messages/batches and its results) and answers every request after a fixed delay:
+judge-style prompts asking for JSON get random 1-10 scores, the rest a canned reply.
+
+Usage:
+    python scripts/fake_batch_api.py --port 8100 --complete-after 5
+    OPENAI_BASE_URL=http://localhost:8100/v1 ANTHROPIC_BASE_URL=http://localhost:8100 \\
+        OPENAI_API_KEY=x ANTHROPIC_API_KEY=x python experiments/run_matrix.py CONFIG --batch
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from fake_lmstudio import DEFAULT_CORPUS, load_corpus
+from trace_parser import parse_trace
+
+# Score categories of the judge prompt in experiments/03_ai_judges.py
+JUDGE_CATEGORIES = ["overall_vibe", "slang_game", "emoji_energy", "humor_level"]
+
+
+class FakeBatchConfig:
+    """Behaviour of the fake batch API; replies are seeded from seed and each request body."""
+
+    def __init__(
+        self,
+        corpus: Optional[List[str]] = None,
+        complete_after: float = 2.0,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.corpus = corpus or ["No cap, that lunch was bussin fr 🔥💀"]
+        # Seconds from submission until a batch reports itself finished
+        self.complete_after = complete_after
+        self.error_rate = error_rate
+        self.seed = seed
+
+
+class FakeBatchAPI(ThreadingHTTPServer):
+    """HTTP server holding uploaded files and submitted batches of both providers."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: FakeBatchConfig):
+        super().__init__(address, FakeBatchHandler)
+        self.config = config
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    @property
+    def root_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI-style base URL (Anthropic's SDK wants root_url, without /v1)."""
+        return f"{self.root_url}/v1"
+
+    def new_id(self, prefix: str) -> str:
+        with self._lock:
+            self._next_id += 1
+            return f"{prefix}_{self._next_id:06d}"
+
+    def reply(self, custom_id: str, model: str, prompt: str, json_mode: bool) -> Optional[str]:
+        """Deterministic reply text for one request, or None for an injected failure."""
+        digest = hashlib.sha256(f"{self.config.seed}:{custom_id}:{model}:{prompt}".encode("utf-8")).hexdigest()
+        rng = random.Random(int(digest[:16], 16))
+        if rng.random() < self.config.error_rate:
+            return None
+        if json_mode or "JSON" in prompt:
+            return json.dumps({c: {"score": rng.randint(1, 10), "reasoning": "Stub judgement."}
+                               for c in JUDGE_CATEGORIES})
+        return parse_trace(rng.choice(self.config.corpus)).answer
+
+    def finished(self, batch: Dict[str, Any]) -> bool:
+        return batch.get("cancelled") or time.time() - batch["created"] >= self.config.complete_after
+
+
+def _words(text: str) -> int:
+    return len(text.split())
+
+
+class FakeBatchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeBatchAPI
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, data: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        self._send(status, json.dumps(body, ensure_ascii=False).encode("utf-8"))
+
+    def _not_found(self):
+        self._send_json(404, {"error": {"type": "not_found_error", "message": f"No route {self.path}"}})
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", path)
+        if match and match.group(1) in self.server.batches:
+            return self._send_json(200, self._openai_batch(self.server.batches[match.group(1)]))
+        match = re.fullmatch(r"/v1/files/([\w-]+)/content", path)
+        if match and match.group(1) in self.server.files:
+            return self._send(200, self.server.files[match.group(1)]["content"], "application/octet-stream")
+        match = re.fullmatch(r"/v1/messages/batches/([\w-]+)(/results)?", path)
+        if match and match.group(1) in self.server.batches:
+            batch = self.server.batches[match.group(1)]
+            if not match.group(2):
+                return self._send_json(200, self._anthropic_batch(batch))
+            if not self.server.finished(batch):
+                return self._send_json(409, {"error": {"type": "invalid_request_error", "message": "Batch still processing"}})
+            return self._send(200, self._anthropic_results(batch), "application/binary")
+        self._not_found()
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path == "/v1/files":
+            return self._upload()
+        if path == "/v1/batches":
+            body = json.loads(self._body() or b"{}")
+            lines = self.server.files[body["input_file_id"]]["content"].decode("utf-8").splitlines()
+            requests = [json.loads(line) for line in lines if line.strip()]
+            batch = self._create("batch", "openai", requests, body)
+            return self._send_json(200, self._openai_batch(batch))
+        if path == "/v1/messages/batches":
+            body = json.loads(self._body() or b"{}")
+            batch = self._create("msgbatch", "anthropic", body["requests"], body)
+            return self._send_json(200, self._anthropic_batch(batch))
+        match = re.fullmatch(r"/v1/(messages/)?batches/([\w-]+)/cancel", path)
+        if match and match.group(2) in self.server.batches:
+            self._body()
+            batch = self.server.batches[match.group(2)]
+            batch["cancelled"] = True
+            view = self._anthropic_batch if batch["provider"] == "anthropic" else self._openai_batch
+            return self._send_json(200, view(batch))
+        self._not_found()
+
+    def _upload(self):
+        """multipart/form-data upload of a batch input file (fields purpose and file)."""
+        message = BytesParser(policy=email_policy).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + self._body())
+        fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+        content = fields["file"].get_payload(decode=True)
+        file_id = self.server.new_id("file")
+        self.server.files[file_id] = {"content": content}
+        self._send_json(200, {
+            "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+            "filename": fields["file"].get_filename() or "batch.jsonl",
+            "purpose": fields["purpose"].get_content().strip(), "status": "processed"
+        })
+
+    def _create(self, prefix: str, provider: str, requests: List[Dict[str, Any]], body: Dict[str, Any]) -> Dict[str, Any]:
+        batch = {
+            "id": self.server.new_id(prefix),
+            "provider": provider,
+            "requests": requests,
+            "created": time.time(),
+            "input_file_id": body.get("input_file_id"),
+            "metadata": body.get("metadata")
+        }
+        self.server.batches[batch["id"]] = batch
+        return batch
+
+    def _openai_batch(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        finished = self.server.finished(batch)
+        total = len(batch["requests"])
+        view = {
+            "id": batch["id"], "object": "batch", "endpoint": "/v1/chat/completions", "errors": None,
+            "input_file_id": batch["input_file_id"], "completion_window": "24h",
+            "status": "in_progress", "output_file_id": None, "error_file_id": None,
+            "created_at": int(batch["created"]), "metadata": batch["metadata"],
+            "request_counts": {"total": total, "completed": 0, "failed": 0}
+        }
+        if not finished:
+            return view
+        if "output_file_id" not in batch:
+            self._write_openai_output(batch)
+        view.update({
+            "status": "cancelled" if batch.get("cancelled") else "completed",
+            "output_file_id": batch["output_file_id"],
+            "error_file_id": batch["error_file_id"],
+            "request_counts": {"total": total, "completed": batch["succeeded"], "failed": total - batch["succeeded"]}
+        })
+        return view
+
+    def _write_openai_output(self, batch: Dict[str, Any]):
+        output, errors = [], []
+        for request in batch["requests"]:
+            body = request["body"]
+            prompt = body["messages"][-1]["content"]
+            json_mode = body.get("response_format", {}).get("type") == "json_object"
+            texts = [self.server.reply(f"{request['custom_id']}:{k}", body["model"], prompt, json_mode)
+                     for k in range(body.get("n", 1))]
+            line = {"id": self.server.new_id("batch_req"), "custom_id": request["custom_id"]}
+            if batch.get("cancelled") or None in texts:
+                error = "batch_cancelled" if batch.get("cancelled") else "server_error"
+                errors.append({**line, "response": None, "error": {"code": error, "message": "Stub failure"}})
+                continue
+            output.append({**line, "error": None, "response": {"status_code": 200, "request_id": line["id"], "body": {
+                "id": f"chatcmpl-{line['id']}", "object": "chat.completion", "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": k, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                            for k, text in enumerate(texts)],
+                "usage": {"prompt_tokens": _words(prompt), "completion_tokens": sum(map(_words, texts)),
+                          "total_tokens": _words(prompt) + sum(map(_words, texts))}
+            }}})
+        batch["succeeded"] = len(output)
+        batch["output_file_id"] = self._store_jsonl(output)
+        batch["error_file_id"] = self._store_jsonl(errors) if errors else None
+
+    def _store_jsonl(self, records: List[Dict[str, Any]]) -> str:
+        file_id = self.server.new_id("file")
+        content = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        self.server.files[file_id] = {"content": content.encode("utf-8")}
+        return file_id
+
+    def _anthropic_batch(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        finished = self.server.finished(batch)
+        total = len(batch["requests"])
+        counts = {"processing": total, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        if finished:
+            outcomes = [entry["result"]["type"] for entry in self._anthropic_entries(batch)]
+            counts = {"processing": 0, **{kind: outcomes.count(kind) for kind in ("succeeded", "errored", "canceled", "expired")}}
+        created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(batch["created"]))
+        return {
+            "id": batch["id"], "type": "message_batch",
+            "processing_status": "ended" if finished else "in_progress",
+            "request_counts": counts, "created_at": created, "expires_at": created,
+            "ended_at": created if finished else None, "cancel_initiated_at": None, "archived_at": None,
+            "results_url": f"{self.server.root_url}/v1/messages/batches/{batch['id']}/results" if finished else None
+        }
+
+    def _anthropic_entries(self, batch: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if "entries" in batch:
+            return batch["entries"]
+        entries = []
+        for request in batch["requests"]:
+            params = request["params"]
+            prompt = params["messages"][-1]["content"]
+            text = None if batch.get("cancelled") else self.server.reply(request["custom_id"], params["model"], prompt, False)
+            if batch.get("cancelled"):
+                result = {"type": "canceled"}
+            elif text is None:
+                result = {"type": "errored", "error": {"type": "error", "error": {"type": "api_error", "message": "Stub failure"}}}
+            else:
+                result = {"type": "succeeded", "message": {
+                    "id": self.server.new_id("msg"), "type": "message", "role": "assistant", "model": params["model"],
+                    "content": [{"type": "text", "text": text}], "stop_reason": "end_turn", "stop_sequence": None,
+                    "usage": {"input_tokens": _words(prompt), "output_tokens": _words(text)}
+                }}
+            entries.append({"custom_id": request["custom_id"], "result": result})
+        batch["entries"] = entries
+        return entries
+
+    def _anthropic_results(self, batch: Dict[str, Any]) -> bytes:
+        return "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in self._anthropic_entries(batch)).encode("utf-8")
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, config: Optional[FakeBatchConfig] = None) -> FakeBatchAPI:
+    """Start the fake batch API on a background thread (port=0 picks a free port)."""
+    server = FakeBatchAPI((host, port), config or FakeBatchConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--complete-after", type=float, default=2.0, help="Seconds until a batch finishes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="Directory of stored results to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = load_corpus(Path(args.corpus))
+    server = FakeBatchAPI((args.host, args.port), FakeBatchConfig(
+        corpus=corpus or None, complete_after=args.complete_after, error_rate=args.error_rate, seed=args.seed))
+    print(f"✓ Fake batch API at {server.root_url} (OpenAI base {server.base_url}), "
+          f"{len(corpus)} canned replies, batches finish after {args.complete_after}s")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
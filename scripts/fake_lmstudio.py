@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for LM Studio's OpenAI-compatible server, for offline benchmarking.
+Serves /v1/models, /v1/chat/completions (streaming and not), /api/v0/models and the
+/api/v1/models/load|unload endpoints with canned replies from results/, simulated
+prefill and decode speed, optional model load times, and injectable errors.
+
+Usage:
+    python scripts/fake_lmstudio.py --port 1234 --tokens-per-sec 40 --prefill-ms 2
+    LMSTUDIO_BASE_URL=http://localhost:1234/v1 python experiments/05_new_prompts_test_olmo.py
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from trace_parser import parse_trace
+
+DEFAULT_CORPUS = Path(__file__).parent.parent / "results"
+DEFAULT_MODELS = ["allenai/olmo-3-32b-think", "qwen3-14b-instruct", "meta-llama-3.1-8b-instruct"]
+
+# One "token" per word plus its trailing whitespace; close enough for timing
+TOKEN_PATTERN = re.compile(r"\s*\S+\s*")
+
+FILLER_THOUGHTS = [
+    "Okay, let me think about what slang fits here.",
+    "The user wants something short, so I should keep it tight.",
+    "Maybe start with a hook, then the twist, then an emoji.",
+    "Wait, is that word still used or is it outdated?",
+    "I should check the word count before answering."
+]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into token-sized pieces that join back to the original."""
+    return TOKEN_PATTERN.findall(text)
+
+
+def load_corpus(corpus_dir: Path) -> List[str]:
+    """Every stored model response under corpus_dir, in a stable order."""
+    replies = []
+    for path in sorted(corpus_dir.rglob("*.json")):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        # OLMoClient.save_result() nests the result; the 04/05 scripts store it flat
+        record = data.get("result", data) if isinstance(data, dict) else None
+        response = record.get("response") if isinstance(record, dict) else None
+        if isinstance(response, str) and response.strip():
+            replies.append(response)
+    return replies
+
+
+class FakeConfig:
+    """Behaviour of the fake server; every random choice is seeded from seed and the request."""
+
+    def __init__(
+        self,
+        models: Optional[List[str]] = None,
+        corpus: Optional[List[str]] = None,
+        prefill_seconds: float = 0.05,
+        prefill_ms_per_token: float = 0.5,
+        tokens_per_sec: float = 50.0,
+        think_words: Optional[int] = None,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        drop_rate: float = 0.0,
+        support_n: bool = False,
+        load_seconds: Optional[float] = None,
+        max_loaded: int = 1,
+        seed: int = 0
+    ):
+        self.models = models or list(DEFAULT_MODELS)
+        self.corpus = corpus or ["Okay, quick one.</think>\n\nNo cap, that lunch was bussin fr 🔥💀"]
+        self.prefill_seconds = prefill_seconds
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.tokens_per_sec = tokens_per_sec
+        self.think_words = think_words
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.support_n = support_n
+        # None: every model is always loaded. Otherwise models start unloaded, take this long
+        # to load (explicitly or just-in-time on first request) and at most max_loaded stay resident.
+        self.load_seconds = load_seconds
+        self.max_loaded = max_loaded
+        self.seed = seed
+
+
+class FakeLMStudio(ThreadingHTTPServer):
+    """HTTP server holding the config and per-prompt request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: FakeConfig):
+        super().__init__(address, FakeHandler)
+        self.config = config
+        self.requests = 0
+        self.loads = 0
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Resident models, least recently loaded first
+        self.loaded: List[str] = list(config.models) if config.load_seconds is None else []
+        self._load_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def request_rng(self, request: Dict[str, Any]) -> random.Random:
+        """
+        RNG for one request: seeded by the config seed, the request body and how
+        many times that body was seen before, so repeated runs replay exactly.
+        """
+        body = json.dumps(request, sort_keys=True)
+        with self._lock:
+            self.requests += 1
+            count = self._seen.get(body, 0)
+            self._seen[body] = count + 1
+        digest = hashlib.sha256(f"{self.config.seed}:{count}:{body}".encode("utf-8")).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def is_loaded(self, model: str) -> bool:
+        return model in self.loaded
+
+    def load(self, model: str):
+        """Load a model (sleeping load_seconds), evicting the oldest beyond max_loaded."""
+        if self.config.load_seconds is None:
+            return
+        with self._load_lock:
+            if model in self.loaded:
+                return
+            time.sleep(self.config.load_seconds)
+            self.loaded.append(model)
+            self.loads += 1
+            while len(self.loaded) > self.config.max_loaded:
+                self.loaded.pop(0)
+
+    def unload(self, model: str) -> bool:
+        with self._load_lock:
+            if model not in self.loaded:
+                return False
+            self.loaded.remove(model)
+            return True
+
+    def reply_text(self, rng: random.Random, model: str) -> str:
+        """Pick a canned reply, optionally replacing its reasoning with a trace of think_words words."""
+        text = rng.choice(self.config.corpus)
+        if self.config.think_words is None:
+            return text
+
+        answer = parse_trace(text).answer
+        words: List[str] = []
+        while len(words) < self.config.think_words:
+            words.extend(rng.choice(FILLER_THOUGHTS).split())
+        trace = " ".join(words[:self.config.think_words])
+        # OLMo 3 Think's template opens <think> itself, so only the closing tag is generated
+        opening = "" if model.endswith("-think") else "<think>\n"
+        return f"{opening}{trace}\n</think>\n\n{answer}"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeLMStudio
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        config = self.server.config
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in config.models]})
+        elif self.path.rstrip("/") == "/api/v0/models":
+            self._send_json(200, {"object": "list", "data": [self._native_model(m) for m in config.models]})
+        elif self.path.startswith("/api/v0/models/"):
+            model = self.path[len("/api/v0/models/"):]
+            if model in config.models:
+                self._send_json(200, self._native_model(model))
+            else:
+                self._send_json(404, {"error": f"Model {model} not found"})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def _native_model(self, model: str) -> Dict[str, Any]:
+        state = "loaded" if self.server.is_loaded(model) else "not-loaded"
+        return {"id": model, "object": "model", "type": "llm", "state": state}
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.server.config
+
+        path = self.path.rstrip("/")
+        if path == "/api/v1/models/load":
+            model = request.get("model")
+            if model not in config.models:
+                self._send_json(404, {"error": f"Model {model} not found"})
+                return
+            start = time.time()
+            self.server.load(model)
+            self._send_json(200, {"type": "llm", "instance_id": model, "status": "loaded",
+                                  "load_time_seconds": time.time() - start})
+            return
+        if path == "/api/v1/models/unload":
+            model = request.get("instance_id")
+            if self.server.unload(model):
+                self._send_json(200, {"instance_id": model})
+            else:
+                self._send_json(404, {"error": f"No loaded instance {model}"})
+            return
+        if path != "/v1/chat/completions":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        model = request.get("model", config.models[0])
+        if model not in config.models:
+            self._send_json(404, {"error": {"message": f"Model {model} not loaded"}})
+            return
+        # Just-in-time load, like LM Studio with JIT loading on
+        self.server.load(model)
+
+        rng = self.server.request_rng(request)
+        if rng.random() < config.error_rate:
+            headers = {"Retry-After": "1"} if config.error_status == 429 else None
+            self._send_json(config.error_status, {"error": {"message": "Injected error"}}, headers)
+            return
+
+        prompt_text = "".join(str(m.get("content", "")) for m in request.get("messages", []))
+        prompt_tokens = len(tokenize(prompt_text)) + 4 * len(request.get("messages", []))
+        max_tokens = request.get("max_tokens") or 8192
+        prefill = config.prefill_seconds + prompt_tokens * config.prefill_ms_per_token / 1000
+        time.sleep(prefill)
+
+        n = max(1, int(request.get("n") or 1)) if config.support_n else 1
+        if request.get("stream"):
+            self._stream(request, rng, model, prompt_tokens, max_tokens, prefill)
+        else:
+            self._blocking(rng, model, prompt_tokens, max_tokens, prefill, n)
+
+    def _generate(self, rng: random.Random, model: str, max_tokens: int) -> Tuple[List[str], str]:
+        tokens = tokenize(self.server.reply_text(rng, model))
+        if len(tokens) > max_tokens:
+            return tokens[:max_tokens], "length"
+        return tokens, "stop"
+
+    def _timings(self, prompt_tokens: int, predicted: int, prefill: float) -> Dict[str, Any]:
+        """llama.cpp-style timings block."""
+        return {
+            "prompt_n": prompt_tokens,
+            "prompt_ms": prefill * 1000,
+            "predicted_n": predicted,
+            "predicted_per_second": self.server.config.tokens_per_sec
+        }
+
+    def _blocking(self, rng: random.Random, model: str, prompt_tokens: int, max_tokens: int, prefill: float, n: int):
+        choices = []
+        completion_tokens = 0
+        for index in range(n):
+            tokens, finish_reason = self._generate(rng, model, max_tokens)
+            completion_tokens += len(tokens)
+            choices.append({
+                "index": index,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": finish_reason
+            })
+        # Choices decode in parallel batches on a real server; charge the longest one
+        time.sleep(max(len(tokenize(c["message"]["content"])) for c in choices) / self.server.config.tokens_per_sec)
+
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{self.server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            },
+            "timings": self._timings(prompt_tokens, completion_tokens, prefill),
+            "system_fingerprint": "fake-lmstudio"
+        })
+
+    def _stream(self, request: Dict[str, Any], rng: random.Random, model: str, prompt_tokens: int,
+                max_tokens: int, prefill: float):
+        config = self.server.config
+        tokens, finish_reason = self._generate(rng, model, max_tokens)
+        drop_at = rng.randrange(1, len(tokens) + 1) if rng.random() < config.drop_rate else None
+        completion_id = f"chatcmpl-fake-{self.server.requests}"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # Chunked like llama.cpp, so a dropped stream is visible to the client as a truncated body
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def write(data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def send(chunk: Dict[str, Any]):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "model": model, **chunk}
+            write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        try:
+            for index, token in enumerate(tokens):
+                if drop_at is not None and index == drop_at:
+                    # Simulate the server dying mid-reply
+                    return
+                send({"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                time.sleep(1 / config.tokens_per_sec)
+
+            send({"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                  "timings": self._timings(prompt_tokens, len(tokens), prefill)})
+            if (request.get("stream_options") or {}).get("include_usage"):
+                send({"choices": [], "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens)
+                }})
+            write(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled (early exit, think budget) - just stop generating
+            pass
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, config: Optional[FakeConfig] = None) -> FakeLMStudio:
+    """Start the fake server on a background thread (port=0 picks a free port); use .base_url."""
+    server = FakeLMStudio((host, port), config or FakeConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="Comma-separated model ids to serve")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="Directory of stored results to replay")
+    parser.add_argument("--prefill-seconds", type=float, default=0.05, help="Fixed delay before the first token")
+    parser.add_argument("--prefill-ms", type=float, default=0.5, help="Extra prefill delay per prompt token")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--think-words", type=int, default=None,
+                        help="Replace each reply's reasoning with a trace this many words long")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of streams cut off mid-reply")
+    parser.add_argument("--support-n", action="store_true", help="Honour n>1 (LM Studio ignores it)")
+    parser.add_argument("--load-seconds", type=float, default=None,
+                        help="Start with no model loaded and take this long to load each one")
+    parser.add_argument("--max-loaded", type=int, default=1, help="Models resident at once with --load-seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = load_corpus(Path(args.corpus))
+    config = FakeConfig(
+        models=[m.strip() for m in args.models.split(",") if m.strip()],
+        corpus=corpus,
+        prefill_seconds=args.prefill_seconds,
+        prefill_ms_per_token=args.prefill_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        think_words=args.think_words,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        drop_rate=args.drop_rate,
+        support_n=args.support_n,
+        load_seconds=args.load_seconds,
+        max_loaded=args.max_loaded,
+        seed=args.seed
+    )
+
+    server = FakeLMStudio((args.host, args.port), config)
+    print(f"✓ Fake LM Studio at {server.base_url} ({len(corpus)} canned replies, "
+          f"{args.tokens_per_sec:g} tok/s, seed {args.seed})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+SQLite job queue for spreading a sweep over several worker processes.
+A coordinator (run_matrix.py --queue, 03_ai_judges.py --queue) enqueues
+generation and judging jobs; any number of workers lease them, keep the lease
+alive with heartbeats while they run, and write each result back to the queue.
+A job whose worker stopped heartbeating is reclaimed once its lease expires
+and handed to the next worker, up to max_attempts.
+
+Jobs sit in pools: "<provider>:<model id>" for generation and
+"judge:<judge class>" for judging. A worker serving "lmstudio" takes every
+local model's jobs, one serving "lmstudio:qwen3-14b-instruct" only that
+model's, and a worker prefers more jobs from the pool it just served, so a
+GPU box keeps its loaded model.
+
+The database runs in WAL mode so workers reading it never block the one
+writing. SQLite's locking needs every process on the same host (WAL's shared
+memory does not work across a network filesystem), so to use several GPU
+boxes or API keys, start one worker per box or key next to the queue and
+point it there with LMSTUDIO_BASE_URL or the provider's API key variable.
+
+Usage:
+    python scripts/job_queue.py worker results/05.queue.db --pools lmstudio
+    LMSTUDIO_BASE_URL=http://gpu2:1234/v1 python scripts/job_queue.py worker results/05.queue.db \\
+        --pools lmstudio:qwen3-14b-instruct
+    OPENAI_API_KEY=... python scripts/job_queue.py worker results/05.queue.db --pools openai,judge --concurrency 4
+    python scripts/job_queue.py status results/05.queue.db
+    python scripts/job_queue.py reclaim results/05.queue.db
+"""
+
+import argparse
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable, Callable
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_LEASE_SECONDS = 120.0
+DEFAULT_POLL_SECONDS = 2.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    pool TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, pool, id);
+"""
+
+
+class JobQueue:
+    """
+    Jobs table in one SQLite file. Jobs are dicts with id, key, kind, pool,
+    payload, state, attempts, max_attempts, worker, result and error (payload
+    and result decoded from JSON).
+
+    enqueue() is idempotent per key, so a coordinator can re-enqueue a whole
+    sweep after a restart. lease() hands out the oldest queued job in the
+    given pools (reclaiming expired leases first); heartbeat(), complete()
+    and fail() only act while the caller still holds the lease.
+    """
+
+    def __init__(self, path: Path, timeout: float = 30.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit; writes that must be atomic open BEGIN IMMEDIATE themselves
+        self.db = sqlite3.connect(str(self.path), timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def _write(self, sql: str, params: Iterable = ()) -> int:
+        with self._lock:
+            return self.db.execute(sql, tuple(params)).rowcount
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, jobs: Iterable[Dict[str, Any]], requeue_failed: bool = False) -> int:
+        """
+        Add jobs ({"key", "kind", "pool", "payload"} and optionally
+        "max_attempts") in one transaction; keys already queued are left
+        alone, except that with requeue_failed failed ones start over, and so
+        do done ones whose result is an {"error": ...} stored by an older
+        worker. Returns how many were new.
+        """
+        now = time.time()
+        rows = [(job["key"], job["kind"], job["pool"], json.dumps(job["payload"], ensure_ascii=False),
+                 job.get("max_attempts", DEFAULT_MAX_ATTEMPTS), now, now) for job in jobs]
+        with self._lock:
+            before = self.db.total_changes
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO jobs (key, kind, pool, payload, max_attempts, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                added = self.db.total_changes - before
+                if requeue_failed:
+                    self.db.executemany(
+                        "UPDATE jobs SET state = ?, attempts = 0, result = NULL, error = NULL, updated = ? "
+                        "WHERE key = ? AND (state = ? OR (state = ? AND json_extract(result, '$.error') IS NOT NULL))",
+                        [(QUEUED, now, row[0], FAILED, DONE) for row in rows])
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            return added
+
+    def _reclaim(self, now: float) -> int:
+        """Expired leases back to queued, or failed once out of attempts (caller holds the lock)."""
+        return self.db.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+            "worker = NULL, lease_expires = NULL, error = 'lease expired (worker stopped heartbeating)', updated = ? "
+            "WHERE state = ? AND lease_expires < ?", (FAILED, QUEUED, now, LEASED, now)).rowcount
+
+    def reclaim(self) -> int:
+        """Reclaim every expired lease now; returns how many."""
+        with self._lock:
+            return self._reclaim(time.time())
+
+    def lease(self, worker: str, pools: Optional[List[str]] = None, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+              prefer_pool: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Lease the oldest queued job in pools (all pools if None; "lmstudio"
+        also matches "lmstudio:<model>"), preferring prefer_pool. None if
+        there is nothing to do.
+        """
+        where, params = "state = ?", [QUEUED]
+        if pools:
+            where += " AND (" + " OR ".join("pool = ? OR pool LIKE ?" for _ in pools) + ")"
+            for pool in pools:
+                params += [pool, f"{pool}:%"]
+        now = time.time()
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self._reclaim(now)
+                row = self.db.execute(f"SELECT id FROM jobs WHERE {where} ORDER BY (pool = ?) DESC, id LIMIT 1",
+                                      params + [prefer_pool]).fetchone()
+                if row is None:
+                    self.db.execute("COMMIT")
+                    return None
+                self.db.execute(
+                    "UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? "
+                    "WHERE id = ?", (LEASED, worker, now + lease_seconds, now, row["id"]))
+                job = self.db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return self._job(job)
+
+    def heartbeat(self, job_id: int, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend a lease; False if the job was reclaimed from this worker meanwhile."""
+        now = time.time()
+        return self._write(
+            "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND state = ?",
+            (now + lease_seconds, now, job_id, worker, LEASED)) == 1
+
+    def complete(self, job_id: int, worker: str, result: Dict[str, Any]) -> bool:
+        """Store a job's result; False (and nothing stored) if this worker no longer holds it."""
+        return self._write(
+            "UPDATE jobs SET state = ?, result = ?, error = NULL, lease_expires = NULL, updated = ? "
+            "WHERE id = ? AND worker = ? AND state = ?",
+            (DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id, worker, LEASED)) == 1
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        """Give a job back after an exception: queued for another try, or failed once out of attempts."""
+        return self._write(
+            "UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+            "worker = NULL, lease_expires = NULL, error = ?, updated = ? WHERE id = ? AND worker = ? AND state = ?",
+            (FAILED, QUEUED, error, time.time(), job_id, worker, LEASED)) == 1
+
+    def finished(self, key_prefix: str = "", exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Done and failed jobs whose key starts with key_prefix, minus the keys in exclude."""
+        exclude = set(exclude)
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT * FROM jobs WHERE state IN (?, ?) AND substr(key, 1, ?) = ? ORDER BY id",
+                (DONE, FAILED, len(key_prefix), key_prefix)).fetchall()
+        return [self._job(row) for row in rows if row["key"] not in exclude]
+
+    def counts(self, key_prefix: str = "") -> Dict[str, int]:
+        """Jobs per state (and per pool under "pools")."""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT pool, state, COUNT(*) AS n FROM jobs WHERE substr(key, 1, ?) = ? GROUP BY pool, state",
+                (len(key_prefix), key_prefix)).fetchall()
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0, "pools": {}}
+        for row in rows:
+            counts[row["state"]] += row["n"]
+            counts["pools"].setdefault(row["pool"], {})[row["state"]] = row["n"]
+        return counts
+
+    def wait(self, keys: Iterable[str], on_finished: Callable[[Dict[str, Any]], None],
+             poll_seconds: float = DEFAULT_POLL_SECONDS, stop: Optional[threading.Event] = None,
+             key_prefix: str = "") -> bool:
+        """
+        Call on_finished(job) once for each of keys as it finishes, until all
+        have (True) or stop is set (False; the jobs stay queued for later).
+        """
+        pending = set(keys)
+        seen: set = set()
+        stop = stop or threading.Event()
+        while pending:
+            for job in self.finished(key_prefix, exclude=seen):
+                seen.add(job["key"])
+                if job["key"] in pending:
+                    pending.discard(job["key"])
+                    on_finished(job)
+            if pending and stop.wait(poll_seconds):
+                return False
+        return True
+
+
+def generation_job(key: str, cell: Dict[str, Any], truncation: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue job generating one run_matrix cell (truncated replies retried as in run_matrix)."""
+    model = cell["model"]
+    return {"key": key, "kind": "generate", "pool": f"{model['provider']}:{model['id']}",
+            "payload": {"cell": cell, "truncation": truncation}}
+
+
+def judge_job(key: str, judge_class: str, output: str) -> Dict[str, Any]:
+    """Queue job scoring one output with one 03_ai_judges judge class."""
+    return {"key": key, "kind": "judge", "pool": f"judge:{judge_class}",
+            "payload": {"judge": judge_class, "output": output}}
+
+
+class Handlers:
+    """What a worker does per job kind; providers and judges are built once per worker process."""
+
+    def __init__(self):
+        self._runners = None
+        self._judges: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def generate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        from providers import provider_runners
+        from token_calibration import retry_truncated
+        with self._lock:
+            if self._runners is None:
+                self._runners = provider_runners()
+        cell = payload["cell"]
+        model = cell["model"]
+        run = self._runners[model["provider"]]
+        return retry_truncated(run, model, cell, run(model, cell), payload["truncation"])
+
+    def judge(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        name = payload["judge"]
+        with self._lock:
+            if name not in self._judges:
+                sys.path.insert(0, str(Path(__file__).parent.parent / "experiments"))
+                judges = importlib.import_module("03_ai_judges")
+                self._judges[name] = getattr(judges, name)()
+        return self._judges[name].evaluate(payload["output"])
+
+    def __call__(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        if job["kind"] == "generate":
+            return self.generate(job["payload"])
+        if job["kind"] == "judge":
+            return self.judge(job["payload"])
+        raise ValueError(f"Unknown job kind '{job['kind']}'")
+
+
+def run_worker(queue: JobQueue, pools: Optional[List[str]] = None, concurrency: int = 1,
+               lease_seconds: float = DEFAULT_LEASE_SECONDS, poll_seconds: float = DEFAULT_POLL_SECONDS,
+               idle_exit: Optional[float] = None) -> Dict[str, int]:
+    """
+    Lease and run jobs on `concurrency` threads until stopped (or idle for
+    idle_exit seconds). Each running job is heartbeated every third of its
+    lease; a job whose lease was lost has its result discarded. A result
+    carrying "error" counts as a failed attempt, like an exception.
+    """
+    handlers = Handlers()
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+    counts = {DONE: 0, FAILED: 0, "lost": 0}
+    counts_lock = threading.Lock()
+
+    def count(outcome: str):
+        with counts_lock:
+            counts[outcome] += 1
+
+    def heartbeat(job: Dict[str, Any], worker: str, finished: threading.Event):
+        while not finished.wait(lease_seconds / 3):
+            if not queue.heartbeat(job["id"], worker, lease_seconds):
+                print(f"⚠️  {worker} lost the lease on {job['key']}")
+                return
+
+    def loop(index: int):
+        worker = f"{worker_name}:{index}"
+        last_pool = None
+        idle_since = time.time()
+        while True:
+            job = queue.lease(worker, pools, lease_seconds, prefer_pool=last_pool)
+            if job is None:
+                if idle_exit is not None and time.time() - idle_since > idle_exit:
+                    return
+                time.sleep(poll_seconds)
+                continue
+            last_pool = job["pool"]
+            finished = threading.Event()
+            beat = threading.Thread(target=heartbeat, args=(job, worker, finished), daemon=True)
+            beat.start()
+            start = time.time()
+            try:
+                result = handlers(job)
+                if "error" in result:
+                    # Runners report failures as {"error": ...}; retry them like exceptions
+                    raise RuntimeError(result["error"])
+            except Exception as e:
+                finished.set()
+                queue.fail(job["id"], worker, str(e))
+                count(FAILED)
+                print(f"❌ {job['key']} (attempt {job['attempts']}/{job['max_attempts']}): {e}")
+            else:
+                finished.set()
+                if queue.complete(job["id"], worker, result):
+                    count(DONE)
+                    print(f"✅ {job['key']} | {time.time() - start:.1f}s")
+                else:
+                    count("lost")
+                    print(f"⚠️  {job['key']} finished after its lease was reclaimed; result discarded")
+            beat.join()
+            idle_since = time.time()
+
+    threads = [threading.Thread(target=loop, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        # Leased jobs are reclaimed by the next worker once their leases expire
+        print("\n⏹  Worker stopped")
+    return counts
+
+
+def print_status(queue: JobQueue):
+    counts = queue.counts()
+    print(f"📋 {queue.path}: {counts[QUEUED]} queued | {counts[LEASED]} leased | "
+          f"{counts[DONE]} done | {counts[FAILED]} failed")
+    for pool, states in sorted(counts["pools"].items()):
+        print(f"   {pool:45s} " + " | ".join(f"{n} {state}" for state, n in sorted(states.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Lease and run jobs")
+    worker.add_argument("queue", type=Path)
+    worker.add_argument("--pools", help="Comma-separated pools to serve (default: all), e.g. lmstudio,judge")
+    worker.add_argument("--concurrency", type=int, default=1, help="Jobs run at once by this worker")
+    worker.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, help="Lease length in seconds")
+    worker.add_argument("--idle-exit", type=float, help="Exit after this many seconds without work")
+    status = sub.add_parser("status", help="Job counts per state and pool")
+    status.add_argument("queue", type=Path)
+    reclaim = sub.add_parser("reclaim", help="Requeue jobs whose leases expired")
+    reclaim.add_argument("queue", type=Path)
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == "worker":
+        pools = args.pools.split(",") if args.pools else None
+        print(f"👷 Worker on {args.queue} | pools: {', '.join(pools) if pools else 'all'} | "
+              f"concurrency {args.concurrency}")
+        counts = run_worker(queue, pools, args.concurrency, args.lease, idle_exit=args.idle_exit)
+        print(f"\n{counts[DONE]} done, {counts[FAILED]} failed attempt(s), {counts['lost']} lost lease(s)")
+    elif args.command == "status":
+        print_status(queue)
+    else:
+        print(f"↻ Reclaimed {queue.reclaim()} expired lease(s)")
+        print_status(queue)
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Schedule a mixed queue of local jobs on one LM Studio box with as few model swaps as possible.
+Jobs are grouped by model, models already loaded go first, and LM Studio's load/unload
+API is driven directly so nobody has to switch models by hand between runs.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable
+
+from client_registry import http_session
+from olmo_client import OLMoClient, ModelResidency, DEFAULT_BASE_URL, load_model, native_api_root
+
+# Approximate resident size (GB) of the models used here at their default LM Studio quantisation
+DEFAULT_MODEL_MEMORY_GB = {
+    "meta-llama-3.1-8b-instruct": 5.0,
+    "qwen3-14b-instruct": 9.0,
+    "allenai/olmo-3-32b-think": 19.5
+}
+
+
+class LocalJob:
+    """One unit of local work: a model id and a callable that runs the request and returns its result."""
+
+    def __init__(self, model: str, run: Callable[[], Dict[str, Any]], label: Optional[str] = None):
+        self.model = model
+        self.run = run
+        self.label = label or model
+
+
+class LMStudioModels:
+    """
+    Thin wrapper over LM Studio's native model management API.
+
+    Load state comes from GET /api/v0/models. Loading goes through
+    olmo_client.load_model() (POST /api/v1/models/load, or a just-in-time
+    one-token request where that endpoint is missing); unloading uses
+    POST /api/v1/models/unload (LM Studio 0.4+) and is otherwise left to
+    LM Studio's auto-evict.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, connect_timeout: float = 10, load_timeout: float = 600):
+        self.base_url = base_url
+        self.native_root = native_api_root(base_url)
+        self.connect_timeout = connect_timeout
+        self.load_timeout = load_timeout
+        self.session = http_session(base_url)
+
+    def loaded(self) -> Optional[List[str]]:
+        """Ids of the LLMs currently loaded, or None if the server doesn't report load state."""
+        try:
+            response = self.session.get(f"{self.native_root}/v0/models", timeout=(self.connect_timeout, 30))
+            response.raise_for_status()
+            models = response.json().get("data", [])
+        except Exception:
+            return None
+        return [m["id"] for m in models if m.get("state") == "loaded" and m.get("type", "llm") == "llm"]
+
+    def load(self, model: str) -> Dict[str, Any]:
+        """Load model; returns {"seconds", "method"} plus "error" on failure (see load_model())."""
+        client = OLMoClient(base_url=self.base_url, model=model, timeout=self.load_timeout,
+                            connect_timeout=self.connect_timeout)
+        return load_model(client)
+
+    def unload(self, model: str) -> bool:
+        """Unload model; False if the server has no unload endpoint or refused."""
+        try:
+            response = self.session.post(f"{self.native_root}/v1/models/unload", json={"instance_id": model},
+                                         timeout=(self.connect_timeout, 120))
+            return response.ok
+        except Exception:
+            return False
+
+
+class LocalScheduler:
+    """
+    Run local jobs grouped by model, loading and unloading models itself.
+
+    Models that are already loaded run first (no swap), then the rest in
+    order of first appearance. Before a model is loaded, resident models are
+    unloaded until it fits in memory_gb: ones with no jobs left first, then
+    the one needed furthest in the future. With memory_gb unset only one
+    model is kept resident at a time. A model's jobs run concurrency at a
+    time once it is loaded and warmed.
+
+    Time is split into swap_seconds (unload, load and warm-up) and
+    generate_seconds (wall time running jobs); see report().
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        memory_gb: Optional[float] = None,
+        model_memory_gb: Optional[Dict[str, float]] = None,
+        concurrency: int = 1,
+        warmup: bool = True
+    ):
+        self.base_url = base_url
+        self.memory_gb = memory_gb
+        self.model_memory_gb = {**DEFAULT_MODEL_MEMORY_GB, **(model_memory_gb or {})}
+        self.concurrency = concurrency
+        self.warmup = warmup
+        self.models = LMStudioModels(base_url)
+        self.resident: List[str] = []
+        self.events: List[Dict[str, Any]] = []
+        self.per_model: Dict[str, Dict[str, float]] = {}
+        self.stopped = False
+
+    def stop(self):
+        """Skip every job not yet started (e.g. on Ctrl-C); running ones finish."""
+        self.stopped = True
+
+    def plan(self, jobs: List[LocalJob]) -> List[str]:
+        """Model run order: resident models first, then by first appearance in the queue."""
+        order: List[str] = []
+        for job in jobs:
+            if job.model not in order:
+                order.append(job.model)
+        return sorted(order, key=lambda m: m not in self.resident)
+
+    def _fits(self, model: str, keep: List[str]) -> bool:
+        if self.memory_gb is None:
+            return not keep
+        sizes = [self.model_memory_gb.get(m) for m in keep + [model]]
+        if any(size is None for size in sizes):
+            # Unknown footprint: only risk it alone
+            return not keep
+        return sum(sizes) <= self.memory_gb
+
+    def _make_room(self, model: str, upcoming: List[str]):
+        """Unload resident models until model fits, preferring ones no longer needed."""
+        def eviction_rank(m: str):
+            # Not needed again sorts first; otherwise the one needed furthest away
+            return (m in upcoming, -upcoming.index(m) if m in upcoming else 0)
+
+        keep = [m for m in self.resident if m != model]
+        for victim in sorted(keep, key=eviction_rank):
+            if self._fits(model, keep):
+                break
+            start = time.time()
+            unloaded = self.models.unload(victim)
+            self._record("unload", victim, time.time() - start, unloaded=unloaded)
+            ModelResidency.forget(self.base_url, victim)
+            keep.remove(victim)
+            if unloaded:
+                print(f"⏏  Unloaded {victim}")
+        self.resident = keep
+
+    def _ensure_loaded(self, model: str, upcoming: List[str]) -> Optional[str]:
+        """Load and warm model; returns an error message on failure."""
+        if model in self.resident:
+            return None
+        self._make_room(model, upcoming)
+
+        print(f"⏳ Loading {model}...")
+        event = self.models.load(model)
+        self._record("load", model, event["seconds"], method=event["method"], error=event.get("error"))
+        if "error" in event:
+            print(f"✗ Could not load {model}: {event['error']}")
+            return event["error"]
+
+        if self.warmup:
+            residency = ModelResidency(OLMoClient(base_url=self.base_url, model=model)).ensure_resident()
+            self._record("warmup", model, residency["warmup_seconds"], error=residency.get("error"))
+            if "error" in residency:
+                # load_failed / warmup_failed: the model can't serve its jobs, so it isn't resident
+                self.resident = [m for m in (self.models.loaded() or self.resident) if m != model]
+                return residency["error"]
+        # The server may have evicted others on its own (JIT auto-evict); trust its view when it has one
+        self.resident = [m for m in (self.models.loaded() or self.resident) if m != model] + [model]
+        return None
+
+    def _record(self, kind: str, model: str, seconds: float, **details):
+        self.events.append({"event": kind, "model": model, "seconds": seconds,
+                            **{k: v for k, v in details.items() if v is not None}})
+        stats = self.per_model.setdefault(model, {"swap_seconds": 0.0, "generate_seconds": 0.0, "jobs": 0, "loads": 0})
+        if kind == "generate":
+            stats["generate_seconds"] += seconds
+            stats["jobs"] += details.get("jobs", 0)
+        else:
+            stats["swap_seconds"] += seconds
+            stats["loads"] += kind == "load"
+
+    def run(self, jobs: List[LocalJob]) -> List[Optional[Dict[str, Any]]]:
+        """Run every job; results come back in the order the jobs were given (None if skipped by stop())."""
+        self.resident = self.models.loaded() or []
+        order = self.plan(jobs)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+
+        for position, model in enumerate(order):
+            if self.stopped:
+                break
+            indexed = [(i, job) for i, job in enumerate(jobs) if job.model == model]
+            error = self._ensure_loaded(model, order[position + 1:])
+            if error:
+                for i, _ in indexed:
+                    results[i] = {"error": f"Model load failed: {error}"}
+                continue
+
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                runs = pool.map(lambda item: None if self.stopped else item[1].run(), indexed)
+                for (i, _), result in zip(indexed, runs):
+                    results[i] = result
+            self._record("generate", model, time.time() - start, jobs=len(indexed))
+
+        return results
+
+    def report(self) -> Dict[str, Any]:
+        """Swap vs generate time, overall and per model, plus the event log."""
+        swap = sum(s["swap_seconds"] for s in self.per_model.values())
+        generate = sum(s["generate_seconds"] for s in self.per_model.values())
+        return {
+            "swap_seconds": swap,
+            "generate_seconds": generate,
+            "swap_fraction": swap / (swap + generate) if swap + generate else 0.0,
+            "loads": sum(1 for e in self.events if e["event"] == "load"),
+            "unloads": sum(1 for e in self.events if e["event"] == "unload"),
+            "models": self.per_model,
+            "events": self.events
+        }
+
+    def print_report(self):
+        report = self.report()
+        print(f"\n🔁 Local models: {report['loads']} load(s), {report['unloads']} unload(s); "
+              f"{report['swap_seconds']:.1f}s swapping vs {report['generate_seconds']:.1f}s generating "
+              f"({report['swap_fraction'] * 100:.0f}% swap)")
+        for model, stats in report["models"].items():
+            print(f"   {model:30s} {stats['jobs']:3d} jobs | swap {stats['swap_seconds']:6.1f}s | "
+                  f"generate {stats['generate_seconds']:7.1f}s")
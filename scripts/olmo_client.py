@@ -4,24 +4,392 @@ Handles inference requests and response analysis.
 """
 
 import json
+import math
+import os
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any
-import requests
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Tuple
+
+from client_registry import http_session
+from completion_cache import CompletionCache
+from resilience import RetryPolicy, CircuitBreaker, RetryTracker
+from trace_parser import TraceParser, parse_trace, forced_close_offset, THINK_CLOSE, ANSWER
+
+
+class SSEDecoder:
+    """
+    Line-at-a-time server-sent events decoder.
+    Multi-line data fields are joined with newlines; comments and other fields are ignored.
+    """
+
+    def __init__(self):
+        self.data_lines: List[str] = []
+
+    def feed_line(self, line: Optional[str]) -> Optional[str]:
+        """Feed one line (without its newline); return an event's data once the event is complete."""
+        if line is None:
+            return None
+        line = line.rstrip("\r\n")
+        if not line:
+            return self.flush()
+        if line.startswith("data:"):
+            self.data_lines.append(line[5:].lstrip(" "))
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Return any buffered event data (e.g. when the stream ends without a blank line)."""
+        if not self.data_lines:
+            return None
+        data = "\n".join(self.data_lines)
+        self.data_lines = []
+        return data
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (pct in 0-100); None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def iter_sse_data(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the data payload of each server-sent event from an iterable of lines."""
+    decoder = SSEDecoder()
+    for line in lines:
+        data = decoder.feed_line(line)
+        if data is not None:
+            yield data
+
+    data = decoder.flush()
+    if data is not None:
+        yield data
+
+
+# Point every client at another server (or scripts/fake_lmstudio.py) without code changes
+DEFAULT_BASE_URL = os.environ.get("LMSTUDIO_BASE_URL", "http://localhost:1234/v1")
+
+
+# A sentence ends at terminal punctuation followed by whitespace or the end of the text
+SENTENCE_END = re.compile(r"[.!?]+(?:[\"')\]]*)(?=\s|$)")
+
+# Cheaper policies tried in order once a request overruns its thinking budget.
+# A rung may override temperature / max_tokens / think_budget (None = unbounded),
+# add a system hint, or force-close the partial trace and ask for the answer.
+# A force_close rung's max_tokens defaults to think_budget + answer_tokens, so a
+# model that ignores the forced </think> and keeps reasoning is cut off early.
+DEFAULT_FALLBACK_LADDER = [
+    {"name": "force_close", "force_close_think": True, "answer_tokens": 512},
+    {"name": "no_think_hint", "system": "Answer directly without deliberating. /no_think"},
+    {"name": "low_temperature", "temperature": 0.3, "system": "Answer directly without deliberating. /no_think"},
+]
+
+
+class StreamAccumulator:
+    """
+    Collects streamed chat-completion chunks and turns them into typed deltas.
+    raw_result() rebuilds the body a non-streaming request would have returned.
+
+    With implicit_think=True the chat template opens <think> itself (OLMo 3 Think),
+    so everything before the first </think> is treated as reasoning. With None
+    (the model may or may not do that) the text is held back until a tag shows
+    which it is, the same rule the final parse uses; answer limits wait for
+    that, and the think budget counts every token until then. Pass False for
+    a model known not to reason, to apply answer limits from the first token.
+
+    A prefill ending in </think> (the force_close rung) closes the trace for
+    the model. If the model keeps reasoning and closes it again itself, what
+    it wrote in between is counted as reasoning, think budget included.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        implicit_think: Optional[bool] = False,
+        prefill: Optional[str] = None,
+        start_time: Optional[float] = None
+    ):
+        self.model = model
+        self.implicit_think = implicit_think
+        self.start_time = time.time() if start_time is None else start_time
+        self.first_token_time: Optional[float] = None
+        self.think_end_time: Optional[float] = None
+        self.last_token_time: Optional[float] = None
+        self.token_times: List[float] = []
+        self.content_parts: List[str] = []
+        self.reasoning_parts: List[str] = []
+        self.usage: Dict[str, Any] = {}
+        self.timings: Optional[Dict[str, Any]] = None
+        self.finish_reason: Optional[str] = None
+        self.completion_id: Optional[str] = None
+        self.system_fingerprint: Optional[str] = None
+        self.chunks = 0
+        self.token_deltas = 0
+        self.think_tokens = 0
+        self.parser = TraceParser(implicit_think=implicit_think)
+        self.forced_close_at = forced_close_offset(prefill)
+        if prefill:
+            # Assistant prefill is part of the reply text but was never generated
+            self._append_content(prefill)
+        if self.forced_close_at is not None:
+            self.parser.mark_forced_close()
+
+    def add_chunk(self, chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Absorb one decoded SSE chunk and return the deltas it carried."""
+        now = time.time()
+        self.chunks += 1
+        self.completion_id = chunk.get("id", self.completion_id)
+        self.system_fingerprint = chunk.get("system_fingerprint", self.system_fingerprint)
+
+        deltas = []
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or {}
+
+            # LM Studio can split reasoning out of content when "separate reasoning" is on
+            reasoning = delta.get("reasoning_content") or delta.get("reasoning")
+            if reasoning:
+                self._mark_token(now)
+                self.think_tokens += 1
+                self.reasoning_parts.append(reasoning)
+                deltas.append({"type": "reasoning", "text": reasoning})
+
+            content = delta.get("content")
+            if content:
+                self._mark_token(now)
+                if self.reasoning_parts and self.think_end_time is None:
+                    # Separated reasoning ends when the first content token arrives
+                    self.think_end_time = now
+                was_thinking = self.parser.in_think
+                was_pending = self.parser.pending
+                was_closed = self.parser.think_closed
+                late_closes = self.parser.late_closes
+                pieces = self._append_content(content)
+                if not was_closed and self.parser.think_closed:
+                    self.think_end_time = now
+                if was_thinking or self.parser.in_think or any(kind != ANSWER for kind, _ in pieces):
+                    self.think_tokens += 1
+                if self.parser.late_closes > late_closes or (was_pending and self.parser.think_closed):
+                    # A late close after the forced </think>, or the close of an implicit trace:
+                    # everything generated so far was reasoning
+                    self.think_tokens = self.token_deltas
+                    self.think_end_time = now
+                deltas.append({"type": "content", "text": content})
+
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+                deltas.append({"type": "finish", "finish_reason": self.finish_reason})
+
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+            deltas.append({"type": "usage", "usage": self.usage})
+
+        if chunk.get("timings"):
+            # llama.cpp server's own counters (prompt_n = prompt tokens actually evaluated)
+            self.timings = chunk["timings"]
+
+        return deltas
+
+    def _mark_token(self, now: float):
+        """Count one generated token delta and remember when it arrived."""
+        self.token_deltas += 1
+        self.token_times.append(now)
+        if self.first_token_time is None:
+            self.first_token_time = now
+        self.last_token_time = now
+
+    def timing(self, end_time: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Per-phase latency metrics for the stream so far.
+
+        Prefill is approximated by time-to-first-token; the think phase runs from the
+        first token to </think> and the answer phase from </think> to the last token.
+        """
+        end_time = time.time() if end_time is None else end_time
+        total = end_time - self.start_time
+        timing: Dict[str, Any] = {"total_seconds": total}
+        if self.first_token_time is None:
+            return timing
+
+        ttft = self.first_token_time - self.start_time
+        think_tokens = self.think_tokens
+        answer_tokens = self.token_deltas - think_tokens
+        if self.think_end_time is not None:
+            think_seconds = self.think_end_time - self.first_token_time
+            answer_seconds = self.last_token_time - self.think_end_time
+        elif think_tokens:
+            # Trace never closed (budget hit or max_tokens): the whole decode was thinking
+            think_seconds = self.last_token_time - self.first_token_time
+            answer_seconds = 0.0
+        else:
+            think_seconds = 0.0
+            answer_seconds = self.last_token_time - self.first_token_time
+
+        gaps = [(b - a) * 1000 for a, b in zip(self.token_times, self.token_times[1:])]
+        decode_seconds = self.last_token_time - self.first_token_time
+
+        timing.update({
+            "ttft_seconds": ttft,
+            "time_to_think_end_seconds": (self.think_end_time - self.start_time) if self.think_end_time else None,
+            "think_phase_seconds": think_seconds,
+            "answer_phase_seconds": answer_seconds,
+            "think_tokens": think_tokens,
+            "answer_tokens": answer_tokens,
+            "think_tokens_per_second": think_tokens / think_seconds if think_seconds > 0 else None,
+            "answer_tokens_per_second": answer_tokens / answer_seconds if answer_seconds > 0 else None,
+            "decode_tokens_per_second": (self.token_deltas - 1) / decode_seconds if decode_seconds > 0 else None,
+            "inter_token_ms": {
+                "p50": percentile(gaps, 50),
+                "p90": percentile(gaps, 90),
+                "p99": percentile(gaps, 99),
+                "max": max(gaps) if gaps else None
+            }
+        })
+
+        # Which phase the wall time went to: prefill (TTFT), reasoning, or answer decode
+        phases = {"prefill": ttft, "reasoning": think_seconds, "decode": answer_seconds}
+        timing["dominant_phase"] = max(phases, key=phases.get)
+        return timing
+
+    def _append_content(self, content: str) -> List[tuple]:
+        """Append content and run it through the trace parser; returns the parsed pieces."""
+        self.content_parts.append(content)
+        return self.parser.feed(content)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.content_parts)
+
+    def answer_text(self) -> Optional[str]:
+        """Answer streamed so far, or None while the model is still thinking."""
+        if self.parser.in_think:
+            return None
+        return self.parser.text_of(ANSWER)
+
+    def answer_limit_reason(
+        self,
+        word_limit: Optional[int] = None,
+        sentence_limit: Optional[int] = None
+    ) -> Optional[str]:
+        """Return which answer limit has been passed, if any."""
+        if self.parser.in_think:
+            return None
+        # Word counts are kept incrementally by the parser, so this stays cheap per chunk
+        if word_limit is not None and self.parser.stats[ANSWER].words > word_limit:
+            return "answer_word_limit"
+        if sentence_limit is not None and len(SENTENCE_END.findall(self.answer_text())) >= sentence_limit:
+            return "answer_sentence_limit"
+        return None
+
+    def stop_signal(
+        self,
+        answer_word_limit: Optional[int] = None,
+        answer_sentence_limit: Optional[int] = None,
+        think_budget: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return an early_exit / think_budget_exceeded delta once the stream should be cancelled.
+        Checked after every chunk by both the sync and async clients.
+        """
+        reason = self.answer_limit_reason(answer_word_limit, answer_sentence_limit)
+        if reason:
+            answer = self.answer_text()
+            return {
+                "type": "early_exit",
+                "reason": reason,
+                "answer_word_limit": answer_word_limit,
+                "answer_sentence_limit": answer_sentence_limit,
+                "answer_words": len(answer.split()),
+                "answer_sentences": len(SENTENCE_END.findall(answer)),
+                "completion_tokens_at_exit": self.token_deltas
+            }
+
+        # Whitespace after a forced </think> doesn't count as an answer yet; undecided text may be reasoning
+        think_tokens = self.token_deltas if self.parser.pending else self.think_tokens
+        if think_budget is not None and not (self.answer_text() or "").strip() and think_tokens > think_budget:
+            return {
+                "type": "think_budget_exceeded",
+                "think_budget": think_budget,
+                "think_tokens": think_tokens
+            }
+
+        return None
+
+    def raw_result(self) -> Dict[str, Any]:
+        """Rebuild a chat.completion body equivalent to the non-streaming response."""
+        message = {"role": "assistant", "content": self.text}
+        usage = self.usage
+        if not usage:
+            # Cancelled streams never see the final usage chunk; LM Studio sends one token per delta
+            usage = {
+                "prompt_tokens": 0,
+                "completion_tokens": self.token_deltas,
+                "total_tokens": self.token_deltas,
+                "estimated": True
+            }
+        if self.reasoning_parts:
+            message["reasoning_content"] = "".join(self.reasoning_parts)
+
+        raw_result = {
+            "id": self.completion_id,
+            "object": "chat.completion",
+            "model": self.model,
+            "choices": [{"index": 0, "message": message, "finish_reason": self.finish_reason}],
+            "usage": usage,
+            "system_fingerprint": self.system_fingerprint,
+            "streamed": True,
+            "stream_chunks": self.chunks,
+            "stream_think_deltas": self.think_tokens
+        }
+        if self.timings:
+            raw_result["timings"] = self.timings
+        return raw_result
 
 
 class OLMoClient:
     """Client for interacting with OLMo 3 via LM Studio's local API."""
 
-    def __init__(self, base_url: str = "http://localhost:1234/v1", model: str = "allenai/olmo-3-32b-think"):
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        model: str = "allenai/olmo-3-32b-think",
+        timeout: float = 600,  # 10 minute read timeout for long responses
+        implicit_think: Optional[bool] = None,
+        cache: Optional[CompletionCache] = None,
+        connect_timeout: float = 10,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        cache_prompt: bool = False
+    ):
         self.base_url = base_url
         self.model = model
-        self.session = requests.Session()
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Shared per endpoint so a dead server fails fast for every client pointed at it
+        self.circuit_breaker = circuit_breaker or CircuitBreaker.for_endpoint(base_url)
+        # OLMo 3 Think's chat template opens <think> itself, so only </think> appears in the output;
+        # for other models None leaves it to the first tag (streaming and final parse alike)
+        if implicit_think is None and model.endswith("-think"):
+            implicit_think = True
+        self.implicit_think = implicit_think
+        # Idle TTL (seconds) sent with every request once ModelResidency has loaded the model
+        self.keep_alive_ttl: Optional[int] = None
+        # Whether the server honours n (None until the first multi-sample request finds out)
+        self.supports_n: Optional[bool] = None
+        # Ask llama.cpp to keep each prompt's KV cache so a request sharing its prefix skips that prefill
+        self.cache_prompt = cache_prompt
+        # Keep-alive connections shared with every other client of this server
+        self.session = http_session(base_url)
 
     def verify_connection(self) -> bool:
         """Verify LM Studio API is accessible and model is loaded."""
         try:
-            response = self.session.get(f"{self.base_url}/models")
+            response = self.session.get(f"{self.base_url}/models", timeout=(self.connect_timeout, 30))
             response.raise_for_status()
             models = response.json()
 
@@ -44,11 +412,45 @@ class OLMoClient:
         temperature: float = 0.7,
         max_tokens: int = 8192,
         stream: bool = False,
+        on_delta=None,
+        answer_word_limit: Optional[int] = None,
+        answer_sentence_limit: Optional[int] = None,
+        think_budget: Optional[int] = None,
+        fallback_ladder: Optional[List[Dict[str, Any]]] = None,
+        system: Optional[str] = None,
+        prefill: Optional[str] = None,
+        samples: int = 1,
+        cache_bypass: bool = False,
         **kwargs
     ) -> Dict[str, Any]:
         """
         Send completion request to LM Studio API.
 
+        With stream=True the reply is read as server-sent events; on_delta (if given)
+        is called with each typed delta as it arrives (see stream()).
+
+        answer_word_limit / answer_sentence_limit enable early exit: the reply is
+        streamed and the request cancelled once the answer after </think> passes
+        the limit. Such results carry an "early_exit" record.
+
+        think_budget caps the reasoning trace at that many streamed tokens. An
+        overrunning request is aborted and re-issued under the next policy of
+        fallback_ladder (DEFAULT_FALLBACK_LADDER if None); the "fallback" record
+        says which rung produced the answer and lists every attempt.
+
+        system adds a system message; prefill seeds the assistant turn (on every
+        fallback rung too) and is included in the returned response text.
+
+        samples > 1 draws that many completions for the same prompt. Plain
+        (non-streamed, unbudgeted) requests ask the server for them in one call
+        via the OpenAI n parameter, so the prompt is processed once; anything the
+        server doesn't return is made up with parallel requests. The result
+        describes the first sample and adds a "samples" list (see _merge_samples).
+
+        With a cache configured, identical requests are served from disk (the
+        result's "cache" record says whether it was a hit). cache_bypass=True
+        skips the lookup to draw a fresh sample, which then replaces the entry.
+
         Returns dict with:
         - response: The model's text response
         - thinking: Extracted thinking traces (if present)
@@ -56,70 +458,655 @@ class OLMoClient:
         - tokens_completion: Tokens in the completion
         - total_tokens: Total tokens used
         - duration_seconds: Time taken for generation
+        - timing: Per-phase latency metrics (streamed requests only; see StreamAccumulator.timing)
+        - attempts: One record per HTTP attempt (connect errors, drops and 5xx are retried)
         """
+        cache_key, cache_request, cached = self._cache_lookup(
+            prompt, temperature, max_tokens, cache_bypass,
+            answer_word_limit=answer_word_limit,
+            answer_sentence_limit=answer_sentence_limit,
+            think_budget=think_budget,
+            fallback_ladder=fallback_ladder,
+            system=system,
+            prefill=prefill,
+            samples=samples,
+            **kwargs
+        )
+        if cached is not None:
+            return cached
+
+        request = dict(
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=stream,
+            on_delta=on_delta,
+            answer_word_limit=answer_word_limit,
+            answer_sentence_limit=answer_sentence_limit,
+            think_budget=think_budget,
+            fallback_ladder=fallback_ladder,
+            system=system,
+            prefill=prefill,
+            **kwargs
+        )
+        if samples > 1:
+            result = self._complete_samples(prompt, samples, request)
+        else:
+            result = self._complete_once(prompt, **request)
+
+        self._cache_store(cache_key, result, cache_request)
+        return result
+
+    def _complete_once(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        on_delta,
+        answer_word_limit: Optional[int],
+        answer_sentence_limit: Optional[int],
+        think_budget: Optional[int],
+        fallback_ladder: Optional[List[Dict[str, Any]]],
+        system: Optional[str],
+        prefill: Optional[str],
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Route a single uncached request to the fallback ladder, the stream or a blocking call."""
+        if think_budget is not None:
+            result = self._complete_with_fallback(
+                prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                think_budget=think_budget,
+                fallback_ladder=fallback_ladder,
+                on_delta=on_delta,
+                answer_word_limit=answer_word_limit,
+                answer_sentence_limit=answer_sentence_limit,
+                system=system,
+                prefill=prefill,
+                **kwargs
+            )
+
+        elif stream or answer_word_limit is not None or answer_sentence_limit is not None:
+            result = None
+            for delta in self.stream(
+                prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                answer_word_limit=answer_word_limit,
+                answer_sentence_limit=answer_sentence_limit,
+                system=system,
+                prefill=prefill,
+                **kwargs
+            ):
+                if delta["type"] == "result":
+                    result = delta["result"]
+                elif on_delta:
+                    on_delta(delta)
+
+        else:
+            payload = self._build_payload(prompt, temperature, max_tokens, stream=False,
+                                          system=system, prefill=prefill, **kwargs)
+            result = self._complete_blocking(payload, prefill)
+
+        return result
+
+    @staticmethod
+    def _native_samples_ok(request: Dict[str, Any]) -> bool:
+        """Whether a request can use the server's n parameter (plain blocking requests only)."""
+        return not (request["stream"]
+                    or request["think_budget"] is not None
+                    or request["answer_word_limit"] is not None
+                    or request["answer_sentence_limit"] is not None)
+
+    def _complete_samples(self, prompt: str, samples: int, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Draw `samples` completions: natively via n where possible, the rest in parallel."""
         start_time = time.time()
+        results = []
+        if self._native_samples_ok(request) and self.supports_n is not False:
+            results = self._native_results(self._complete_n(prompt, samples, **request), samples)
+        native = len(results)
+
+        remaining = samples - native
+        if remaining:
+            request = self._parallel_request(request)
+            with ThreadPoolExecutor(max_workers=remaining) as pool:
+                results += list(pool.map(lambda _: self._complete_once(prompt, **request), range(remaining)))
+
+        return self._merge_samples(results, native, time.time() - start_time)
+
+    def _native_results(self, native_result: Dict[str, Any], samples: int) -> List[Dict[str, Any]]:
+        """Per-choice results of an n request ([] if it failed), noting whether the server honours n."""
+        if "error" in native_result:
+            return []
+        results = native_result.pop("choices_results")
+        # Servers that ignore n answer with a single choice
+        self.supports_n = len(results) >= samples
+        return results
+
+    @staticmethod
+    def _parallel_request(request: Dict[str, Any]) -> Dict[str, Any]:
+        """Request for the samples drawn one per call; they must not all queue on one pinned slot."""
+        return {k: v for k, v in request.items() if k != "id_slot"}
+
+    def _complete_n(
+        self,
+        prompt: str,
+        samples: int,
+        temperature: float,
+        max_tokens: int,
+        system: Optional[str],
+        prefill: Optional[str],
+        stream: bool = False,
+        on_delta=None,
+        answer_word_limit: Optional[int] = None,
+        answer_sentence_limit: Optional[int] = None,
+        think_budget: Optional[int] = None,
+        fallback_ladder: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        One blocking request with n=samples; per-choice results go in "choices_results".
+        Takes the same options as _complete_once(); the streaming controls are unused here.
+        """
+        payload = self._build_payload(prompt, temperature, max_tokens, stream=False,
+                                      system=system, prefill=prefill, n=samples, **kwargs)
+        result = self._complete_blocking(payload, prefill)
+        if "error" in result:
+            return result
+        return self._split_choices(result, prefill)
+
+    def _split_choices(self, result: Dict[str, Any], prefill: Optional[str]) -> Dict[str, Any]:
+        """Build one result per choice of an n reply, stored in result["choices_results"]."""
+        raw_result = result["raw_result"]
+        choices_results = []
+        for index, choice in enumerate(raw_result["choices"]):
+            text = (prefill or "") + choice["message"]["content"]
+            # Usage covers every choice, so it stays on the first one only
+            sample = self._build_result(text, raw_result if index == 0 else {}, result["duration_seconds"],
+                                        forced_close_offset(prefill))
+            sample["finish_reason"] = choice.get("finish_reason")
+            sample["attempts"] = result["attempts"] if index == 0 else []
+            choices_results.append(sample)
+        result["choices_results"] = choices_results
+        return result
+
+    @staticmethod
+    def _merge_samples(results: List[Dict[str, Any]], native: int, duration: float) -> Dict[str, Any]:
+        """
+        Fold per-sample results into one record. Top-level fields describe the
+        first successful sample, token counts are totals across all of them, and
+        "samples" holds one entry per completion (response, thinking, answer,
+        completion tokens, finish reason, or error). samples_native says how
+        many came from a single n request, whose prompt was only processed once.
+        """
+        ok = [r for r in results if "error" not in r]
+        if not ok:
+            return {**results[0], "samples_requested": len(results), "duration_seconds": duration}
+
+        merged = dict(ok[0])
+        merged["samples"] = []
+        for index, result in enumerate(results):
+            if "error" in result:
+                merged["samples"].append({"error": result["error"]})
+                continue
+            raw_result = result.get("raw_result") or {}
+            choices = raw_result.get("choices") or [{}]
+            merged["samples"].append({
+                "response": result["response"],
+                "thinking": result["thinking"],
+                "answer": result["answer"],
+                # A native n reply only reports completion tokens for all choices together
+                "tokens_completion": None if index < native and native > 1 else result["tokens_completion"],
+                "finish_reason": result.get("finish_reason", choices[0].get("finish_reason")),
+                "duration_seconds": result["duration_seconds"],
+                "early_exit": result.get("early_exit")
+            })
+
+        merged["samples_requested"] = len(results)
+        merged["samples_native"] = native
+        merged["tokens_prompt"] = sum(r["tokens_prompt"] for r in ok)
+        merged["tokens_completion"] = sum(r["tokens_completion"] for r in ok)
+        merged["total_tokens"] = sum(r["total_tokens"] for r in ok)
+        merged["duration_seconds"] = duration
+        merged.pop("finish_reason", None)
+        return merged
+
+    def _complete_blocking(self, payload: Dict[str, Any], prefill: Optional[str] = None) -> Dict[str, Any]:
+        """Send a non-streaming request (retrying transient failures) and shape the reply."""
+        tracker = RetryTracker(self.retry_policy, self.circuit_breaker)
+
+        try:
+            while True:
+                circuit_error = tracker.circuit_error()
+                if circuit_error:
+                    return circuit_error
+
+                try:
+                    response = self.session.post(
+                        f"{self.base_url}/chat/completions",
+                        json=payload,
+                        timeout=(self.connect_timeout, self.timeout)
+                    )
+                    response.raise_for_status()
+                    result = response.json()
+
+                    # Extract response text
+                    response_text = (prefill or "") + result["choices"][0]["message"]["content"]
+
+                except Exception as e:
+                    delay = tracker.failure(e)
+                    if delay is None:
+                        return tracker.error_result(e)
+                    time.sleep(delay)
+                    continue
+
+                tracker.success()
+                result = self._build_result(response_text, result, time.time() - tracker.start_time,
+                                            forced_close_offset(prefill))
+                result["attempts"] = tracker.attempts
+                return result
+        finally:
+            tracker.release()
+
+    def _cache_lookup(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        cache_bypass: bool,
+        answer_word_limit: Optional[int] = None,
+        answer_sentence_limit: Optional[int] = None,
+        think_budget: Optional[int] = None,
+        fallback_ladder: Optional[List[Dict[str, Any]]] = None,
+        system: Optional[str] = None,
+        prefill: Optional[str] = None,
+        samples: int = 1,
+        **kwargs
+    ) -> tuple[Optional[str], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Return (cache key, the request it hashes, cached result); key and
+        request are None when no cache is configured.
+        """
+        if self.cache is None:
+            return None, None, None
+
+        # Keyed on the full request body plus the options that change what comes back
+        payload = self._build_payload(prompt, temperature, max_tokens, stream=False,
+                                      system=system, prefill=prefill, **kwargs)
+        # Residency and KV-cache hints only affect speed, not the reply
+        for hint in ("ttl", "cache_prompt", "id_slot"):
+            payload.pop(hint, None)
+        request = {
+            "model": self.model,
+            "payload": payload,
+            "controls": {
+                "answer_word_limit": answer_word_limit,
+                "answer_sentence_limit": answer_sentence_limit,
+                "think_budget": think_budget,
+                "fallback_ladder": fallback_ladder,
+                # Only keyed when set, so single-sample entries keep their existing keys
+                **({"samples": samples} if samples > 1 else {})
+            }
+        }
+        key = self.cache.key(request)
+
+        if cache_bypass:
+            return key, request, None
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached["cache"] = {"hit": True, "key": key}
+        return key, request, cached
+
+    def _cache_store(self, key: Optional[str], result: Dict[str, Any], request: Optional[Dict[str, Any]] = None):
+        """Cache a successful result under key, alongside the request it was keyed on."""
+        if key is None or "error" in result:
+            return
+        self.cache.put(key, result, request)
+        result["cache"] = {"hit": False, "key": key}
+
+    def stream(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 8192,
+        answer_word_limit: Optional[int] = None,
+        answer_sentence_limit: Optional[int] = None,
+        think_budget: Optional[int] = None,
+        system: Optional[str] = None,
+        prefill: Optional[str] = None,
+        **kwargs
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a completion from LM Studio, yielding typed deltas as they arrive.
+
+        Delta types:
+        - {"type": "reasoning", "text": ...}: reasoning split out by the server
+        - {"type": "content", "text": ...}: message content (may include <think> tags)
+        - {"type": "finish", "finish_reason": ...}
+        - {"type": "usage", "usage": {...}}
+        - {"type": "early_exit", "reason": ...}: an answer limit was passed; the request is cancelled
+        - {"type": "think_budget_exceeded", ...}: the trace passed think_budget; the request is cancelled
+        - {"type": "retry", ...}: the attempt failed transiently and is being re-sent; discard
+          any text received so far
+        - {"type": "result", "result": {...}}: always last; same shape as complete()
+
+        stream() makes a single attempt; complete(think_budget=...) adds the fallback ladder.
+        """
+        payload = self._build_payload(prompt, temperature, max_tokens, stream=True,
+                                      system=system, prefill=prefill, **kwargs)
+        tracker = RetryTracker(self.retry_policy, self.circuit_breaker)
+
+        try:
+            while True:
+                circuit_error = tracker.circuit_error()
+                if circuit_error:
+                    yield {"type": "result", "result": circuit_error}
+                    return
+
+                accumulator = StreamAccumulator(self.model, implicit_think=self.implicit_think, prefill=prefill)
+                stop = None
+
+                try:
+                    with self.session.post(
+                        f"{self.base_url}/chat/completions",
+                        json=payload,
+                        stream=True,
+                        timeout=(self.connect_timeout, self.timeout)
+                    ) as response:
+                        response.raise_for_status()
+                        # SSE bodies are UTF-8, but requests assumes ISO-8859-1 for text/* without a charset
+                        response.encoding = "utf-8"
+
+                        for data in iter_sse_data(response.iter_lines(decode_unicode=True)):
+                            if data.strip() == "[DONE]":
+                                break
+                            for delta in accumulator.add_chunk(json.loads(data)):
+                                yield delta
+
+                            stop = accumulator.stop_signal(answer_word_limit, answer_sentence_limit, think_budget)
+                            if stop:
+                                # Leaving the with-block closes the connection, which cancels generation
+                                yield stop
+                                break
+
+                except Exception as e:
+                    delay = tracker.failure(e)
+                    if delay is None:
+                        yield {"type": "result", "result": self._stream_error(e, accumulator, tracker)}
+                        return
+                    yield self._retry_delta(tracker, delay)
+                    time.sleep(delay)
+                    continue
+
+                tracker.success()
+                break
+        finally:
+            tracker.release()
+
+        yield {"type": "result", "result": self._stream_result(accumulator, stop, tracker)}
+
+    def _complete_with_fallback(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        think_budget: int,
+        fallback_ladder: Optional[List[Dict[str, Any]]] = None,
+        on_delta=None,
+        system: Optional[str] = None,
+        prefill: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Stream under a thinking budget, stepping down the fallback ladder on each overrun."""
+        start_time = time.time()
+        attempts = []
+        trace = ""
+        result = None
+
+        for index, rung in enumerate(self._fallback_rungs(fallback_ladder)):
+            request = self._rung_request(rung, trace, temperature, max_tokens, think_budget, system, prefill)
+            for delta in self.stream(prompt, **request, **kwargs):
+                if delta["type"] == "result":
+                    result = delta["result"]
+                elif on_delta:
+                    on_delta({**delta, "rung": index})
+
+            trace = self._next_trace(index, rung, result, trace, attempts)
+            if trace is None:
+                break
+
+        return self._finish_fallback(result, attempts, think_budget, start_time)
+
+    @staticmethod
+    def _fallback_rungs(fallback_ladder: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """The primary attempt followed by the ladder (DEFAULT_FALLBACK_LADDER if None)."""
+        return [{"name": "primary"}] + list(DEFAULT_FALLBACK_LADDER if fallback_ladder is None else fallback_ladder)
+
+    @staticmethod
+    def _next_trace(
+        index: int,
+        rung: Dict[str, Any],
+        result: Dict[str, Any],
+        trace: str,
+        attempts: List[Dict[str, Any]]
+    ) -> Optional[str]:
+        """Record a rung's attempt; return the trace to carry to the next rung, or None to stop."""
+        attempts.append(OLMoClient._attempt_record(index, rung, result))
+        if attempts[-1]["outcome"] != "think_budget_exceeded":
+            return None
+        # A force_close continuation isn't a trace of its own; keep the one it closed
+        return trace if rung.get("force_close_think") else result["response"]
+
+    @staticmethod
+    def _rung_request(
+        rung: Dict[str, Any],
+        trace: str,
+        temperature: float,
+        max_tokens: int,
+        think_budget: int,
+        system: Optional[str],
+        prefill: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Request settings for one rung of the fallback ladder. Every rung keeps
+        the caller's prefill; force_close extends it, since the trace it
+        closes was generated after that prefill.
+        """
+        think_budget = rung.get("think_budget", think_budget)
+        max_tokens = rung.get("max_tokens", max_tokens)
+        if rung.get("force_close_think"):
+            # Keep the reasoning already paid for and make the model answer from it
+            prefill = trace.rstrip() + "\n" + THINK_CLOSE + "\n\n"
+            if "max_tokens" not in rung and "answer_tokens" in rung:
+                # Until a late </think>, reasoning past the forced close counts as answer, not budget
+                max_tokens = min(max_tokens, (think_budget or 0) + rung["answer_tokens"])
+
+        return {
+            "temperature": rung.get("temperature", temperature),
+            "max_tokens": max_tokens,
+            "think_budget": think_budget,
+            "system": rung.get("system", system),
+            "prefill": prefill
+        }
+
+    @staticmethod
+    def _attempt_record(index: int, rung: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """Summarize one fallback attempt."""
+        if "error" in result:
+            outcome = "error"
+        elif "think_budget_exceeded" in result:
+            outcome = "think_budget_exceeded"
+        elif rung.get("answer_tokens") and OLMoClient._cut_off(result):
+            # The forced close was ignored and the capped continuation ran out: no answer came
+            outcome = "think_budget_exceeded"
+        else:
+            outcome = "ok"
+
+        return {
+            "rung": index,
+            "policy": rung["name"],
+            "outcome": outcome,
+            "think_tokens": (result.get("raw_result") or {}).get("stream_think_deltas"),
+            "duration_seconds": result["duration_seconds"]
+        }
+
+    @staticmethod
+    def _cut_off(result: Dict[str, Any]) -> bool:
+        """Whether a reply stopped at max_tokens."""
+        choices = (result.get("raw_result") or {}).get("choices") or [{}]
+        return choices[0].get("finish_reason") == "length"
+
+    @staticmethod
+    def _finish_fallback(
+        result: Dict[str, Any],
+        attempts: List[Dict[str, Any]],
+        think_budget: int,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Attach the fallback record to the final attempt's result."""
+        result["fallback"] = {
+            "rung": attempts[-1]["rung"],
+            "policy": attempts[-1]["policy"],
+            "think_budget": think_budget,
+            "exhausted": attempts[-1]["outcome"] == "think_budget_exceeded",
+            "attempts": attempts
+        }
+        # Wall time across every attempt, which is what a sweep cell actually costs
+        result["duration_seconds"] = time.time() - start_time
+        return result
+
+    def _stream_result(
+        self,
+        accumulator: StreamAccumulator,
+        stop: Optional[Dict[str, Any]],
+        tracker: RetryTracker
+    ) -> Dict[str, Any]:
+        """Build the final result of a streamed request."""
+        end_time = time.time()
+        result = self._build_result(accumulator.text, accumulator.raw_result(), end_time - tracker.start_time,
+                                    accumulator.forced_close_at)
+        result["timing"] = accumulator.timing(end_time)
+        result["attempts"] = tracker.attempts
+        if stop:
+            record = {k: v for k, v in stop.items() if k != "type"}
+            result[stop["type"]] = record
+        return result
+
+    @staticmethod
+    def _stream_error(error: Exception, accumulator: StreamAccumulator, tracker: RetryTracker) -> Dict[str, Any]:
+        """Build the error result of a streamed request, keeping whatever text arrived."""
+        return tracker.error_result(error, partial_response=accumulator.text)
+
+    @staticmethod
+    def _retry_delta(tracker: RetryTracker, delay: float) -> Dict[str, Any]:
+        """Delta announcing that a failed attempt is about to be re-sent."""
+        failed = tracker.attempts[-1]
+        return {
+            "type": "retry",
+            "attempt": failed["attempt"],
+            "category": failed["category"],
+            "error": failed["error"],
+            "backoff_seconds": delay
+        }
+
+    def _build_payload(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        system: Optional[str] = None,
+        prefill: Optional[str] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Build the /chat/completions request body."""
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        if prefill:
+            # llama.cpp-based servers continue a trailing assistant message instead of starting a new one
+            messages.append({"role": "assistant", "content": prefill})
 
         payload = {
             "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
             "stream": stream,
             **kwargs
         }
+        if stream:
+            # Ask for a final usage chunk so token counts match the non-streaming path
+            payload.setdefault("stream_options", {"include_usage": True})
+        if self.keep_alive_ttl is not None:
+            # LM Studio resets the model's idle timer on each request carrying a ttl
+            payload.setdefault("ttl", self.keep_alive_ttl)
+        if self.cache_prompt:
+            payload.setdefault("cache_prompt", True)
+        return payload
 
-        try:
-            response = self.session.post(
-                f"{self.base_url}/chat/completions",
-                json=payload,
-                timeout=600  # 10 minute timeout for long responses
-            )
-            response.raise_for_status()
-            result = response.json()
+    def _build_result(self, response_text: str, raw_result: Dict[str, Any], duration: float,
+                      forced_close_at: Optional[int] = None) -> Dict[str, Any]:
+        """Shape a completion body into the result dict returned by complete()."""
+        # Parse thinking traces if present (OLMo 3 Think uses <think>...</think> tags)
+        trace = self._parse_trace(response_text, forced_close_at)
 
-            duration = time.time() - start_time
+        # Extract token usage
+        usage = raw_result.get("usage") or {}
 
-            # Extract response text
-            response_text = result["choices"][0]["message"]["content"]
+        return {
+            "response": response_text,
+            "thinking": trace.thinking,
+            "answer": trace.answer,
+            "tokens_prompt": usage.get("prompt_tokens", 0),
+            "tokens_completion": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "duration_seconds": duration,
+            "prompt_cache": self._prompt_cache_stats(raw_result),
+            "trace": trace.summary(),
+            "raw_result": raw_result
+        }
 
-            # Parse thinking traces if present (OLMo 3 Think uses <think>...</think> tags)
-            thinking, answer = self._extract_thinking(response_text)
+    @staticmethod
+    def _prompt_cache_stats(raw_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        How much of the prompt was served from the server's KV cache, or None if
+        the server doesn't say. llama.cpp reports prompt tokens actually evaluated
+        in timings.prompt_n; OpenAI-style servers report usage.prompt_tokens_details.cached_tokens.
+        """
+        usage = raw_result.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        if not prompt_tokens or usage.get("estimated"):
+            return None
 
-            # Extract token usage
-            usage = result.get("usage", {})
+        timings = raw_result.get("timings") or {}
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if timings.get("prompt_n") is not None:
+            evaluated = timings["prompt_n"]
+        elif cached is not None:
+            evaluated = prompt_tokens - cached
+        else:
+            return None
 
-            return {
-                "response": response_text,
-                "thinking": thinking,
-                "answer": answer,
-                "tokens_prompt": usage.get("prompt_tokens", 0),
-                "tokens_completion": usage.get("completion_tokens", 0),
-                "total_tokens": usage.get("total_tokens", 0),
-                "duration_seconds": duration,
-                "raw_result": result
-            }
+        return {
+            "prompt_tokens": prompt_tokens,
+            "evaluated_tokens": evaluated,
+            "reused_tokens": max(0, prompt_tokens - evaluated)
+        }
 
-        except Exception as e:
-            return {
-                "error": str(e),
-                "duration_seconds": time.time() - start_time
-            }
+    def _parse_trace(self, text: str, forced_close_at: Optional[int] = None) -> TraceParser:
+        """Parse a complete response; OLMo 3 Think's trace has no opening <think> tag."""
+        return parse_trace(text, implicit_think=self.implicit_think, forced_close_at=forced_close_at)
 
     def _extract_thinking(self, text: str) -> tuple[Optional[str], str]:
         """
         Extract thinking traces from response.
-        OLMo 3 Think may use <think>...</think> tags or other delimiters.
+        Returns (thinking or None, answer); see trace_parser.TraceParser for the rules.
         """
-        # Check for <think> tags
-        if "<think>" in text and "</think>" in text:
-            start = text.find("<think>") + len("<think>")
-            end = text.find("</think>")
-            thinking = text[start:end].strip()
-            answer = text[end + len("</think>"):].strip()
-            return thinking, answer
-
-        # No explicit thinking markers found
-        return None, text
+        trace = self._parse_trace(text)
+        return trace.thinking, trace.answer
 
     def save_result(self, result: Dict[str, Any], output_path: str, metadata: Optional[Dict] = None):
         """Save experiment result to JSON file."""
@@ -149,6 +1136,42 @@ class OLMoClient:
         print(f"Completion tokens: {result['tokens_completion']:,}")
         print(f"Total tokens: {result['total_tokens']:,}")
 
+        timing = result.get('timing') or {}
+        if 'ttft_seconds' in timing:
+            def rate(value):
+                return f"{value:.1f} tok/s" if value else "n/a"
+
+            itl = timing['inter_token_ms']
+            print(f"\nTime to first token: {timing['ttft_seconds']:.2f}s")
+            if timing['time_to_think_end_seconds'] is not None:
+                print(f"Time to </think>: {timing['time_to_think_end_seconds']:.2f}s")
+            print(f"Think phase: {timing['think_phase_seconds']:.2f}s, {timing['think_tokens']:,} tokens "
+                  f"({rate(timing['think_tokens_per_second'])})")
+            print(f"Answer phase: {timing['answer_phase_seconds']:.2f}s, {timing['answer_tokens']:,} tokens "
+                  f"({rate(timing['answer_tokens_per_second'])})")
+            if itl['p50'] is not None:
+                print(f"Inter-token latency p50/p90/p99: {itl['p50']:.0f}/{itl['p90']:.0f}/{itl['p99']:.0f} ms")
+            print(f"Dominant phase: {timing['dominant_phase']}")
+
+        retries = [a for a in result.get('attempts', []) if a['outcome'] == 'error']
+        if retries:
+            categories = ", ".join(a['category'] for a in retries)
+            print(f"Retried {len(retries)} time(s): {categories}")
+
+        if (result.get('cache') or {}).get('hit'):
+            print("Served from completion cache (timings are from the original run)")
+
+        if result.get('early_exit'):
+            early_exit = result['early_exit']
+            print(f"Early exit: {early_exit['reason']} ({early_exit['answer_words']} answer words, "
+                  f"stopped at ~{early_exit['completion_tokens_at_exit']:,} tokens)")
+
+        if result.get('fallback'):
+            fallback = result['fallback']
+            print(f"Think budget: {fallback['think_budget']:,} tokens → answered by rung "
+                  f"{fallback['rung']} ({fallback['policy']}) after {len(fallback['attempts'])} attempt(s)"
+                  + (" [ladder exhausted]" if fallback['exhausted'] else ""))
+
         if result['thinking']:
             thinking_len = len(result['thinking'])
             answer_len = len(result['answer'])
@@ -159,6 +1182,245 @@ class OLMoClient:
         print(f"{'='*60}\n")
 
 
+def common_prefix_length(a: str, b: str) -> int:
+    """Number of leading characters two strings share."""
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+
+def plan_prefix_order(
+    items: List[Any],
+    prompt_of: Callable[[Any], str] = lambda item: item,
+    slots: int = 1,
+    min_shared_chars: int = 64
+) -> List[Tuple[int, Any]]:
+    """
+    Order jobs so prompts sharing a prefix run back-to-back on the same server slot.
+
+    Sorting prompts puts shared prefixes next to each other; neighbours sharing
+    at least min_shared_chars form a group. Groups are spread over `slots`
+    (largest first, onto the least-loaded slot), so passing each job's slot as
+    id_slot lets llama.cpp reuse the group's cached prefix instead of
+    re-evaluating it. Returns (slot, item) pairs in run order.
+    """
+    ordered = sorted(items, key=prompt_of)
+    groups: List[List[Any]] = []
+    for item in ordered:
+        if groups and common_prefix_length(prompt_of(groups[-1][-1]), prompt_of(item)) >= min_shared_chars:
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+
+    load = [0] * slots
+    slot_of_group = {}
+    for index in sorted(range(len(groups)), key=lambda i: -len(groups[i])):
+        slot = load.index(min(load))
+        slot_of_group[index] = slot
+        load[slot] += len(groups[index])
+
+    return [(slot_of_group[index], item) for index, group in enumerate(groups) for item in group]
+
+
+WARMUP_PROMPT = "Reply with the single word: ready."
+
+# Native API roots found to have no load endpoint (plain llama.cpp, LM Studio before 0.4)
+_no_load_api: set = set()
+_no_load_api_lock = threading.Lock()
+
+
+def native_api_root(base_url: str) -> str:
+    """LM Studio's native REST root for an OpenAI-compatible base URL (.../v1 → .../api)."""
+    root = base_url.rstrip("/")
+    if root.endswith("/v1"):
+        root = root[:-len("/v1")]
+    return f"{root}/api"
+
+
+def load_model(client: OLMoClient, ttl: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Load client's model and wait until it is ready, within client.timeout.
+
+    Uses LM Studio's POST /api/v1/models/load (0.4+). On servers without that
+    endpoint, a one-token request makes LM Studio load the model just in time
+    (carrying ttl, if given, as its idle timeout). Returns {"seconds", "method":
+    "api" or "jit"} plus "error" on failure.
+
+    LM Studio also answers 404 for a model id it doesn't have, so a 404 only
+    counts as a missing endpoint when the server's model list includes the
+    model (or there is no list); otherwise it is this model's load error.
+    """
+    root = native_api_root(client.base_url)
+    start = time.time()
+    with _no_load_api_lock:
+        use_api = root not in _no_load_api
+
+    if use_api:
+        try:
+            response = client.session.post(f"{root}/v1/models/load", json={"model": client.model},
+                                           timeout=(client.connect_timeout, client.timeout))
+            if response.status_code == 404 and not _load_endpoint_missing(client, root):
+                return {"seconds": time.time() - start, "method": "api",
+                        "error": f"Model '{client.model}' not found on the server"}
+            if response.status_code not in (404, 405):
+                response.raise_for_status()
+                return {"seconds": time.time() - start, "method": "api"}
+        except Exception as e:
+            return {"seconds": time.time() - start, "method": "api", "error": str(e)}
+        with _no_load_api_lock:
+            _no_load_api.add(root)
+
+    payload = client._build_payload(WARMUP_PROMPT, 0.0, 1, stream=False,
+                                    **({"ttl": ttl} if ttl is not None else {}))
+    result = client._complete_blocking(payload)
+    event = {"seconds": time.time() - start, "method": "jit"}
+    if "error" in result:
+        event["error"] = result["error"]
+    return event
+
+
+def _load_endpoint_missing(client: OLMoClient, root: str) -> bool:
+    """After a 404 from the load endpoint: True if the endpoint is missing, False if the model is unknown."""
+    try:
+        response = client.session.get(f"{root}/v0/models", timeout=(client.connect_timeout, 30))
+        response.raise_for_status()
+        known = {m["id"] for m in response.json().get("data", [])}
+    except Exception:
+        return True  # No native model list either: not an LM Studio with the load API
+    return client.model in known
+
+
+class ModelResidency:
+    """
+    Load a client's model explicitly, warm it up, and keep it resident.
+
+    The first request after a load pays for reading the weights and the first
+    prefill. ensure_resident() pays that up front and records it as
+    cold_load_seconds and warmup_seconds, so experiment durations only cover
+    generation. Afterwards every request from the client carries an idle ttl,
+    so LM Studio keeps the model loaded between cells instead of unloading it.
+
+    Load state comes from LM Studio's native /api/v0/models endpoint, and
+    loading goes through load_model(). On servers that don't report state
+    (plain llama.cpp) the load is always attempted; if the model is already
+    loaded it just returns quickly.
+    """
+
+    # (base_url, model) pairs already warmed in this process
+    _warmed: set = set()
+    _warmed_lock = threading.Lock()
+
+    def __init__(
+        self,
+        client: OLMoClient,
+        ttl: int = 3600,
+        warmup_prompt: str = WARMUP_PROMPT,
+        warmup_tokens: int = 16
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.warmup_prompt = warmup_prompt
+        self.warmup_tokens = warmup_tokens
+        self.events: List[Dict[str, Any]] = []
+
+    @classmethod
+    def forget(cls, base_url: str, model: str):
+        """Drop the warm-up record of a model that has since been unloaded."""
+        with cls._warmed_lock:
+            cls._warmed.discard((base_url, model))
+
+    @property
+    def native_url(self) -> str:
+        """LM Studio's native v0 REST root (the OpenAI-compatible API lives under /v1)."""
+        return f"{native_api_root(self.client.base_url)}/v0"
+
+    def state(self) -> Optional[str]:
+        """"loaded" or "not-loaded" as reported by LM Studio, or None if the server doesn't say."""
+        try:
+            response = self.client.session.get(
+                f"{self.native_url}/models/{self.client.model}",
+                timeout=(self.client.connect_timeout, 30)
+            )
+            response.raise_for_status()
+            return response.json().get("state")
+        except Exception:
+            return None
+
+    def _request(self, prompt: str, max_tokens: int) -> Dict[str, Any]:
+        """Send a throwaway non-streaming request carrying the residency ttl."""
+        payload = self.client._build_payload(prompt, 0.0, max_tokens, stream=False, ttl=self.ttl)
+        return self.client._complete_blocking(payload)
+
+    def ensure_resident(self) -> Dict[str, Any]:
+        """
+        Make sure the model is loaded and warm, loading it if needed.
+        Cheap when it already is, so it can be called before every cell.
+
+        Returns an event record: action ("resident", "warmed" or "loaded"),
+        state_before, load_method, cold_load_seconds, warmup_seconds, and
+        error on failure (action "load_failed" or "warmup_failed").
+        """
+        key = (self.client.base_url, self.client.model)
+        state_before = self.state()
+        event = {
+            "timestamp": datetime.now().isoformat(),
+            "model": self.client.model,
+            "state_before": state_before,
+            "cold_load_seconds": 0.0,
+            "warmup_seconds": 0.0,
+            "ttl_seconds": self.ttl
+        }
+        self.client.keep_alive_ttl = self.ttl
+
+        with self._warmed_lock:
+            warmed = key in self._warmed
+
+        # Without a reported state, trust an earlier warm-up in this process
+        if warmed and state_before in ("loaded", None):
+            event["action"] = "resident"
+            self.events.append(event)
+            return event
+
+        if state_before != "loaded":
+            print(f"⏳ Loading {self.client.model}...")
+            load = load_model(self.client, ttl=self.ttl)
+            event["load_method"] = load["method"]
+            if "error" in load:
+                event.update(action="load_failed", error=load["error"])
+                self.events.append(event)
+                print(f"✗ Could not load {self.client.model}: {load['error']}")
+                return event
+            event["cold_load_seconds"] = load["seconds"]
+
+        warmup = self._request(self.warmup_prompt, max_tokens=self.warmup_tokens)
+        if "error" in warmup:
+            event.update(action="warmup_failed", error=warmup["error"])
+            self.events.append(event)
+            print(f"✗ Warm-up failed for {self.client.model}: {warmup['error']}")
+            return event
+        event["warmup_seconds"] = warmup["duration_seconds"]
+        event["action"] = "warmed" if state_before == "loaded" else "loaded"
+
+        with self._warmed_lock:
+            self._warmed.add(key)
+        self.events.append(event)
+        print(f"✓ {self.client.model} resident (load {event['cold_load_seconds']:.2f}s, "
+              f"warm-up {event['warmup_seconds']:.2f}s, ttl {self.ttl}s)")
+        return event
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals across every ensure_resident() call, for saving alongside results."""
+        return {
+            "model": self.client.model,
+            "loads": sum(1 for e in self.events if e.get("action") == "loaded"),
+            "cold_load_seconds": sum(e["cold_load_seconds"] for e in self.events),
+            "warmup_seconds": sum(e["warmup_seconds"] for e in self.events),
+            "events": self.events
+        }
+
+
 if __name__ == "__main__":
     # Test connection
     client = OLMoClient()
@@ -0,0 +1,313 @@
+"""
+Pool of OLMoClients across several LM Studio / llama.cpp servers.
+Routes each request to the least-loaded healthy endpoint that has the model resident.
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, Iterator, List
+
+from completion_cache import CompletionCache
+from olmo_client import OLMoClient, ModelResidency
+from resilience import NON_HEALTH_CATEGORIES
+
+
+class Endpoint:
+    """One server in the pool: its client plus routing and health state."""
+
+    def __init__(self, client: OLMoClient):
+        self.client = client
+        self.in_flight = 0
+        self.ewma_latency: Optional[float] = None
+        self.has_model = False
+        self.failures = 0
+        self.ejected_until: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def base_url(self) -> str:
+        return self.client.base_url
+
+    def score(self, default_latency: float) -> float:
+        """Expected wait if one more request lands here; lower is better."""
+        latency = self.ewma_latency if self.ewma_latency is not None else default_latency
+        return (self.in_flight + 1) * latency
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "has_model": self.has_model,
+            "in_flight": self.in_flight,
+            "ewma_latency_seconds": self.ewma_latency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejected": self.ejected_until is not None
+        }
+
+
+class OLMoClientPool:
+    """
+    Drop-in replacement for OLMoClient that spreads requests over several servers.
+
+    complete() and stream() pick the endpoint with the lowest
+    (in-flight + 1) * EWMA latency among those that have the model loaded.
+    An endpoint whose requests fail with connect, drop, timeout or 5xx errors
+    failure_threshold times in a row is ejected for eject_seconds. It is then
+    re-probed and readmitted if it answers and still has the model. A failed
+    request is re-sent to the next-best endpoint.
+
+    Every endpoint client shares the same completion cache, so a cached
+    result is reused whichever server produced it.
+    """
+
+    def __init__(
+        self,
+        base_urls: List[str],
+        model: str = "allenai/olmo-3-32b-think",
+        timeout: float = 600,
+        implicit_think: Optional[bool] = None,
+        cache: Optional[CompletionCache] = None,
+        failure_threshold: int = 2,
+        eject_seconds: float = 60.0,
+        ewma_alpha: float = 0.3,
+        **client_kwargs
+    ):
+        if not base_urls:
+            raise ValueError("OLMoClientPool needs at least one endpoint")
+
+        self.model = model
+        self.cache = cache
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.ewma_alpha = ewma_alpha
+        self.endpoints = [
+            Endpoint(OLMoClient(base_url=url, model=model, timeout=timeout,
+                                implicit_think=implicit_think, cache=cache, **client_kwargs))
+            for url in base_urls
+        ]
+        self._lock = threading.Lock()
+
+    def _probe(self, endpoint: Endpoint) -> bool:
+        """Check one endpoint for the model; True if it is reachable and has it."""
+        state = ModelResidency(endpoint.client).state()
+        if state is not None:
+            endpoint.has_model = state == "loaded"
+            return True
+
+        # No native state endpoint (llama.cpp): fall back to the OpenAI model list
+        client = endpoint.client
+        try:
+            response = client.session.get(f"{client.base_url}/models", timeout=(client.connect_timeout, 30))
+            response.raise_for_status()
+            loaded_models = [m["id"] for m in response.json().get("data", [])]
+        except Exception:
+            endpoint.has_model = False
+            return False
+
+        endpoint.has_model = self.model in loaded_models
+        return True
+
+    def refresh(self):
+        """Re-probe every endpoint and readmit any that answer."""
+        for endpoint in self.endpoints:
+            reachable = self._probe(endpoint)
+            with self._lock:
+                if reachable:
+                    endpoint.failures = 0
+                    endpoint.ejected_until = None
+                elif endpoint.ejected_until is None:
+                    endpoint.ejected_until = time.time() + self.eject_seconds
+
+    def verify_connection(self) -> bool:
+        """Probe every endpoint; True if at least one has the model loaded."""
+        self.refresh()
+        for endpoint in self.endpoints:
+            if endpoint.ejected_until is not None:
+                print(f"✗ {endpoint.base_url}: unreachable")
+            elif endpoint.has_model:
+                print(f"✓ {endpoint.base_url}: {self.model} loaded")
+            else:
+                print(f"✗ {endpoint.base_url}: {self.model} not loaded")
+
+        available = sum(1 for e in self.endpoints if e.has_model and e.ejected_until is None)
+        if available:
+            print(f"✓ Pool ready: {available}/{len(self.endpoints)} endpoint(s) serving {self.model}")
+        return available > 0
+
+    def _readmit_expired(self):
+        """Re-probe endpoints whose ejection period is over."""
+        now = time.time()
+        for endpoint in self.endpoints:
+            if endpoint.ejected_until is not None and endpoint.ejected_until <= now:
+                if self._probe(endpoint):
+                    with self._lock:
+                        endpoint.failures = 0
+                        endpoint.ejected_until = None
+                else:
+                    with self._lock:
+                        endpoint.ejected_until = now + self.eject_seconds
+
+    def _acquire(self, exclude: List[Endpoint]) -> Optional[Endpoint]:
+        """Pick the best endpoint not in exclude and count a request against it."""
+        self._readmit_expired()
+        with self._lock:
+            live = [e for e in self.endpoints if e.ejected_until is None and e not in exclude]
+            # Prefer endpoints with the model resident; otherwise let a live one load it on demand
+            candidates = [e for e in live if e.has_model] or live
+            if not candidates:
+                return None
+
+            known = [e.ewma_latency for e in self.endpoints if e.ewma_latency is not None]
+            default_latency = sum(known) / len(known) if known else 1.0
+            endpoint = min(candidates, key=lambda e: e.score(default_latency))
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: Endpoint, result: Dict[str, Any]) -> bool:
+        """Record a finished request; return True if it failed in a way worth re-routing."""
+        with self._lock:
+            endpoint.in_flight -= 1
+
+            if "error" not in result:
+                endpoint.failures = 0
+                endpoint.has_model = True
+                if not (result.get("cache") or {}).get("hit"):
+                    latency = result["duration_seconds"]
+                    if endpoint.ewma_latency is None:
+                        endpoint.ewma_latency = latency
+                    else:
+                        endpoint.ewma_latency += self.ewma_alpha * (latency - endpoint.ewma_latency)
+                return False
+
+            endpoint.errors += 1
+            if result.get("error_category") in NON_HEALTH_CATEGORIES:
+                return False
+
+            endpoint.failures += 1
+            if endpoint.failures >= self.failure_threshold:
+                endpoint.ejected_until = time.time() + self.eject_seconds
+            return True
+
+    @staticmethod
+    def _no_endpoint_error(last_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return last_result or {
+            "error": "No healthy endpoint available",
+            "error_category": "no_endpoint",
+            "duration_seconds": 0.0
+        }
+
+    def complete(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Same arguments and result as OLMoClient.complete(); adds result["endpoint"]."""
+        tried: List[Endpoint] = []
+        result = None
+
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                return self._no_endpoint_error(result)
+            tried.append(endpoint)
+
+            try:
+                result = endpoint.client.complete(prompt, **kwargs)
+            except BaseException:
+                with self._lock:
+                    endpoint.in_flight -= 1
+                raise
+
+            result["endpoint"] = endpoint.base_url
+            if not self._release(endpoint, result):
+                return result
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[Dict[str, Any]]:
+        """
+        Same deltas as OLMoClient.stream(). Fails over to another endpoint only
+        if an attempt fails before producing any output.
+        """
+        tried: List[Endpoint] = []
+        last_result = None
+
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                yield {"type": "result", "result": self._no_endpoint_error(last_result)}
+                return
+            tried.append(endpoint)
+
+            result = None
+            produced = False
+            try:
+                for delta in endpoint.client.stream(prompt, **kwargs):
+                    if delta["type"] == "result":
+                        result = delta["result"]
+                        break
+                    produced = True
+                    yield delta
+            finally:
+                if result is None:
+                    # Consumer stopped early or the stream raised
+                    with self._lock:
+                        endpoint.in_flight -= 1
+
+            result["endpoint"] = endpoint.base_url
+            if self._release(endpoint, result) and not produced:
+                last_result = result
+                continue
+            yield {"type": "result", "result": result}
+            return
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Routing and health state of every endpoint."""
+        with self._lock:
+            return [e.stats() for e in self.endpoints]
+
+    # Result handling doesn't depend on the endpoint
+    save_result = OLMoClient.save_result
+    print_summary = OLMoClient.print_summary
+
+
+class PoolResidency:
+    """ModelResidency for every endpoint in a pool, with the same ensure_resident()/summary() API."""
+
+    def __init__(self, pool: OLMoClientPool, **kwargs):
+        self.members = [ModelResidency(e.client, **kwargs) for e in pool.endpoints]
+
+    def ensure_resident(self) -> Dict[str, Any]:
+        events = [m.ensure_resident() for m in self.members]
+        return {
+            "cold_load_seconds": sum(e["cold_load_seconds"] for e in events),
+            "warmup_seconds": sum(e["warmup_seconds"] for e in events),
+            "endpoints": {m.client.base_url: e for m, e in zip(self.members, events)}
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        summaries = [m.summary() for m in self.members]
+        return {
+            "model": summaries[0]["model"],
+            "loads": sum(s["loads"] for s in summaries),
+            "cold_load_seconds": sum(s["cold_load_seconds"] for s in summaries),
+            "warmup_seconds": sum(s["warmup_seconds"] for s in summaries),
+            "endpoints": {m.client.base_url: s for m, s in zip(self.members, summaries)}
+        }
+
+
+def client_from_env(**kwargs):
+    """
+    OLMoClientPool over the comma-separated base URLs in OLMO_ENDPOINTS, or a
+    plain OLMoClient when it is unset. Lets the experiment scripts spread
+    load over several servers without code changes.
+    """
+    endpoints = [url.strip() for url in os.environ.get("OLMO_ENDPOINTS", "").split(",") if url.strip()]
+    if not endpoints:
+        return OLMoClient(**kwargs)
+    kwargs.pop("base_url", None)
+    return OLMoClientPool(endpoints, **kwargs)
+
+
+def residency_for(client, **kwargs):
+    """ModelResidency for a single client, PoolResidency for a pool."""
+    if isinstance(client, OLMoClientPool):
+        return PoolResidency(client, **kwargs)
+    return ModelResidency(client, **kwargs)
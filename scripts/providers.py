@@ -0,0 +1,371 @@
+"""
+One call per provider behind a common interface, for the experiment-matrix runner.
+
+Each runner takes a model entry from a matrix config plus one cell
+(scenario, prompt, temperature) and returns a result dict in the same shape
+the 04/05 scripts save: model, model_id, scenario, prompt, temperature,
+max_tokens, response, tokens, word_count, duration_seconds, timestamp, plus
+finish_reason as the provider reported it ("length", "max_tokens" or
+MAX_TOKENS when the reply was cut off at max_tokens).
+Failures, including SDK and network exceptions, come back as
+{"error": ...} rather than raising.
+
+API calls go through the shared rate_limiter budget for their provider and
+model; duration_seconds excludes time spent waiting for that budget. SDK
+clients come from client_registry, so cells share pooled connections.
+"""
+
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, List
+
+# API clients
+try:
+    from anthropic import Anthropic
+    CLAUDE_AVAILABLE = True
+except ImportError:
+    CLAUDE_AVAILABLE = False
+
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+try:
+    import google.generativeai as genai
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+from client_registry import openai_client, anthropic_client, configure_gemini
+from olmo_pool import client_from_env, residency_for
+from rate_limiter import limiter_for, rate_limited_call, estimate_tokens
+
+# In-flight requests per provider unless the config says otherwise.
+# One LM Studio server generates one reply at a time per loaded model.
+DEFAULT_CONCURRENCY = {
+    "openai": 4,
+    "anthropic": 4,
+    "gemini": 2,
+    "lmstudio": 1
+}
+
+
+def _errors_as_results(run: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """Turn an exception escaping a runner (SDK, network, rate limit given up) into {"error": ...}."""
+    @functools.wraps(run)
+    def wrapper(*args, **kwargs) -> Dict[str, Any]:
+        try:
+            return run(*args, **kwargs)
+        except Exception as e:
+            return {"error": str(e)}
+    return wrapper
+
+
+def _base_result(model: Dict[str, Any], cell: Dict[str, Any], response: str, tokens: int, duration: float,
+                 finish_reason: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "model": model["name"],
+        "model_id": model["id"],
+        "scenario": cell["scenario"],
+        "prompt": cell["prompt"],
+        "temperature": cell["temperature"],
+        "max_tokens": model["max_tokens"],
+        "response": response,
+        "tokens": tokens,
+        "word_count": len(response.split()),
+        "duration_seconds": round(duration, 2),
+        "finish_reason": finish_reason,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def generation_config(model: Dict[str, Any], cell: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything besides model and prompt that shapes a reply; block_memo keys on it."""
+    return {
+        "temperature": cell["temperature"],
+        "max_tokens": model["max_tokens"],
+        "top_p": model.get("top_p"),
+        "top_k": model.get("top_k"),
+        "system_instruction": model.get("system_instruction")
+    }
+
+
+@_errors_as_results
+def run_openai(model: Dict[str, Any], cell: Dict[str, Any]) -> Dict[str, Any]:
+    """OpenAI chat completions; samples > 1 are drawn in one request via n."""
+    if not OPENAI_AVAILABLE:
+        return {"error": "OpenAI package not available"}
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        return {"error": "OPENAI_API_KEY not set"}
+
+    samples = cell.get("samples", 1)
+    client = openai_client(api_key, max_retries=0)
+    limiter = limiter_for("openai", model["id"])
+    tokens = estimate_tokens(cell["prompt"], model["max_tokens"] * samples)
+    timing = {}
+
+    def create():
+        timing["start"] = time.time()
+        # Raw response so the limiter can read the x-ratelimit-* headers
+        return client.chat.completions.with_raw_response.create(
+            model=model["id"],
+            messages=[{"role": "user", "content": cell["prompt"]}],
+            temperature=cell["temperature"],
+            n=samples,
+            max_completion_tokens=model["max_tokens"]
+        )
+
+    response = rate_limited_call(limiter, create, tokens).parse()
+    duration = time.time() - timing["start"]
+    limiter.settle(tokens, response.usage.total_tokens)
+    outputs = [choice.message.content for choice in response.choices]
+
+    result = _base_result(model, cell, outputs[0], response.usage.completion_tokens, duration,
+                          response.choices[0].finish_reason)
+    if samples > 1:
+        result["samples"] = [
+            {"response": choice.message.content, "word_count": len(choice.message.content.split()),
+             "finish_reason": choice.finish_reason}
+            for choice in response.choices
+        ]
+        result["tokens_prompt"] = response.usage.prompt_tokens  # Shared by all samples
+    return result
+
+
+@_errors_as_results
+def run_anthropic(model: Dict[str, Any], cell: Dict[str, Any]) -> Dict[str, Any]:
+    """Anthropic Messages API; no n, so samples > 1 are sent as parallel requests."""
+    if not CLAUDE_AVAILABLE:
+        return {"error": "Anthropic package not available"}
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        return {"error": "ANTHROPIC_API_KEY not set"}
+
+    samples = cell.get("samples", 1)
+    client = anthropic_client(api_key, max_retries=0)
+    limiter = limiter_for("anthropic", model["id"])
+    tokens = estimate_tokens(cell["prompt"], model["max_tokens"])
+    starts = []
+
+    def send():
+        starts.append(time.time())
+        return client.messages.with_raw_response.create(
+            model=model["id"],
+            max_tokens=model["max_tokens"],
+            temperature=cell["temperature"],
+            messages=[{"role": "user", "content": cell["prompt"]}]
+        )
+
+    def create(_):
+        response = rate_limited_call(limiter, send, tokens).parse()
+        limiter.settle(tokens, response.usage.input_tokens + response.usage.output_tokens)
+        return response
+
+    with ThreadPoolExecutor(max_workers=samples) as pool:
+        responses = list(pool.map(create, range(samples)))
+    duration = time.time() - min(starts)
+
+    text = responses[0].content[0].text
+    result = _base_result(model, cell, text, sum(r.usage.output_tokens for r in responses), duration,
+                          responses[0].stop_reason)
+    if samples > 1:
+        result["samples"] = [
+            {"response": r.content[0].text, "word_count": len(r.content[0].text.split()), "tokens": r.usage.output_tokens,
+             "finish_reason": r.stop_reason}
+            for r in responses
+        ]
+    return result
+
+
+@_errors_as_results
+def run_gemini(model: Dict[str, Any], cell: Dict[str, Any]) -> Dict[str, Any]:
+    """Gemini generate_content with safety filters off; a blocked reply is returned as an error."""
+    if not GEMINI_AVAILABLE:
+        return {"error": "Google GenAI package not available"}
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        return {"error": "GOOGLE_API_KEY not set"}
+
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
+    configure_gemini(api_key)
+    safety_settings = {
+        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+    }
+    client = genai.GenerativeModel(model["id"], system_instruction=model.get("system_instruction"))
+    generation_config = genai.GenerationConfig(
+        temperature=cell["temperature"],
+        max_output_tokens=model["max_tokens"],
+        top_p=model.get("top_p"),
+        top_k=model.get("top_k")
+    )
+
+    limiter = limiter_for("gemini", model["id"])
+    tokens = estimate_tokens(cell["prompt"], model["max_tokens"])
+    timing = {}
+
+    def create():
+        timing["start"] = time.time()
+        return client.generate_content(cell["prompt"], generation_config=generation_config,
+                                       safety_settings=safety_settings)
+
+    # The Gemini SDK doesn't expose rate-limit headers, so only the budget and 429s apply
+    response = rate_limited_call(limiter, create, tokens)
+    duration = time.time() - timing["start"]
+    usage = getattr(response, "usage_metadata", None)
+    limiter.settle(tokens, getattr(usage, "total_token_count", None))
+
+    if not response.candidates or not response.candidates[0].content.parts:
+        finish_reason = response.candidates[0].finish_reason if response.candidates else None
+        safety_ratings = str(response.candidates[0].safety_ratings if response.candidates else 'None')
+        return {
+            "error": f"Gemini blocked response. Finish reason: {finish_reason if response.candidates else 'No candidates'}",
+            "safety_ratings": safety_ratings,
+            # For block_memo: what to remember about the refusal
+            "blocked": {
+                "finish_reason": getattr(finish_reason, "name", str(finish_reason)),
+                "safety_ratings": safety_ratings
+            }
+        }
+
+    word_count = len(response.text.split())
+    finish_reason = response.candidates[0].finish_reason
+    # Token count approximated by words
+    return _base_result(model, cell, response.text, word_count, duration, getattr(finish_reason, "name", str(finish_reason)))
+
+
+class LocalModels:
+    """
+    One OLMoClient (or pool, via OLMO_ENDPOINTS) per local model id, each
+    made resident and warmed once before its first cell.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+        self._residency: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._model_locks: Dict[str, threading.Lock] = {}
+
+    def client_for(self, model: Dict[str, Any]):
+        """Client for a model entry, plus the residency event of the first load."""
+        model_id = model["id"]
+        with self._lock:
+            model_lock = self._model_locks.setdefault(model_id, threading.Lock())
+        with model_lock:
+            if model_id not in self._clients:
+                client = client_from_env(model=model_id, timeout=model.get("timeout", 120),
+                                         implicit_think=model.get("implicit_think"))
+                self._residency[model_id] = residency_for(client).ensure_resident()
+                self._clients[model_id] = client
+        return self._clients[model_id], self._residency[model_id]
+
+    @_errors_as_results
+    def __call__(self, model: Dict[str, Any], cell: Dict[str, Any]) -> Dict[str, Any]:
+        """Local model via LM Studio; thinking models also get the answer split from the trace."""
+        client, residency = self.client_for(model)
+        completion = client.complete(
+            prompt=cell["prompt"],
+            temperature=cell["temperature"],
+            max_tokens=model["max_tokens"],
+            answer_word_limit=model.get("answer_word_limit"),
+            samples=cell.get("samples", 1)
+        )
+        if "error" in completion:
+            return {"error": f"Local model error: {completion['error']}"}
+
+        choices = (completion.get("raw_result") or {}).get("choices") or [{}]
+        result = _base_result(model, cell, completion["response"], completion["tokens_completion"],
+                              completion["duration_seconds"], choices[0].get("finish_reason"))
+        if model.get("thinking"):
+            result["actual_output"] = completion["answer"]
+            result["word_count_total"] = result["word_count"]
+            result["word_count_actual"] = len(completion["answer"].split())
+            result["trace"] = completion["trace"]
+        result["residency"] = residency
+
+        if "samples" in completion:
+            result["samples"] = [
+                {"response": sample["response"], "word_count": len(sample["response"].split()),
+                 "tokens": sample["tokens_completion"], "finish_reason": sample["finish_reason"]}
+                for sample in completion["samples"] if "error" not in sample
+            ]
+        if "early_exit" in completion:
+            result["early_exit"] = completion["early_exit"]
+        return result
+
+
+def batch_items(model: Dict[str, Any], cell: Dict[str, Any], custom_id: str) -> List[Dict[str, Any]]:
+    """
+    batch_runner request(s) for one cell. OpenAI draws samples via n in one
+    request; Anthropic has no n, so each sample is its own request (<custom_id>-s<k>).
+    """
+    item = {
+        "model": model["id"],
+        "prompt": cell["prompt"],
+        "temperature": cell["temperature"],
+        "max_tokens": model["max_tokens"]
+    }
+    samples = cell.get("samples", 1)
+    if model["provider"] == "openai" or samples == 1:
+        return [{**item, "custom_id": custom_id, "n": samples}]
+    return [{**item, "custom_id": f"{custom_id}-s{k}"} for k in range(samples)]
+
+
+def batch_result(model: Dict[str, Any], cell: Dict[str, Any], replies: List[Dict[str, Any]],
+                 batch_id: Optional[str] = None) -> Dict[str, Any]:
+    """Result record for a cell from its batch replies, shaped like the synchronous runners'."""
+    errors = [reply["error"] for reply in replies if "error" in reply]
+    if errors:
+        return {"error": f"Batch request failed: {errors[0]}"}
+
+    texts = [text for reply in replies for text in reply["texts"]]
+    result = _base_result(model, cell, texts[0], sum(r["tokens_completion"] for r in replies), 0,
+                          replies[0]["finish_reason"])
+    result["duration_seconds"] = None  # Batches don't time individual requests
+    result["batch_id"] = batch_id
+    if len(texts) > 1:
+        result["samples"] = [{"response": text, "word_count": len(text.split())} for text in texts]
+        if model["provider"] == "openai":
+            result["tokens_prompt"] = replies[0]["tokens_prompt"]  # Shared by all samples
+        else:
+            for sample, reply in zip(result["samples"], replies):
+                sample["tokens"] = reply["tokens_completion"]
+                sample["finish_reason"] = reply["finish_reason"]
+    return result
+
+
+def provider_runners() -> Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]]:
+    """Runner per provider name used in matrix configs."""
+    return {
+        "openai": run_openai,
+        "anthropic": run_anthropic,
+        "gemini": run_gemini,
+        "lmstudio": LocalModels()
+    }
+
+
+def provider_available(provider: str) -> Optional[str]:
+    """Why a provider can't run here (missing package or key), or None if it can."""
+    requirements = {
+        "openai": (OPENAI_AVAILABLE, "OPENAI_API_KEY"),
+        "anthropic": (CLAUDE_AVAILABLE, "ANTHROPIC_API_KEY"),
+        "gemini": (GEMINI_AVAILABLE, "GOOGLE_API_KEY")
+    }
+    if provider not in requirements:
+        return None if provider == "lmstudio" else f"unknown provider '{provider}'"
+    available, key = requirements[provider]
+    if not available:
+        return f"{provider} package not installed"
+    if not os.environ.get(key):
+        return f"{key} not set"
+    return None
@@ -0,0 +1,278 @@
+"""
+Token-bucket rate limiting for the OpenAI, Anthropic and Gemini APIs.
+One limiter per provider and model enforces requests-per-minute and
+tokens-per-minute budgets, and tightens or relaxes itself from the
+rate-limit headers and 429s the provider sends back.
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, Callable, Mapping
+
+from resilience import RetryPolicy, error_status, retry_after_seconds
+
+# Budgets used until the provider's headers say otherwise (roughly the entry paid tiers).
+# Override with RATE_LIMIT_<PROVIDER>_RPM / RATE_LIMIT_<PROVIDER>_TPM, e.g. RATE_LIMIT_ANTHROPIC_TPM=80000.
+DEFAULT_LIMITS = {
+    "openai": {"rpm": 500, "tpm": 500_000},
+    "anthropic": {"rpm": 50, "tpm": 30_000},
+    "gemini": {"rpm": 25, "tpm": 1_000_000}
+}
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to capacity units and refills continuously
+    at capacity per minute. Not thread-safe on its own; RateLimiter locks it.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+        # Running total of what acquire() has charged, so a response's headers
+        # can tell which local charges the server had not yet seen
+        self.charged = 0.0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount units are available (0 if they are now)."""
+        self._refill(now)
+        # A request larger than the bucket would never fit; let it through once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def take(self, amount: float):
+        # May go negative when settling a request that used more than estimated
+        self.level -= amount
+
+    def charge(self, amount: float):
+        self.take(amount)
+        self.charged += amount
+
+    def set_limit(self, per_minute: float):
+        if per_minute > 0 and per_minute != self.capacity:
+            self.level = min(self.level, per_minute)
+            self.capacity = per_minute
+
+    def set_remaining(self, remaining: float, now: float, charged_at_send: Optional[float] = None):
+        """
+        Adopt the server's remaining count. It already includes every request
+        the server had received, in-flight ones we charged locally among them,
+        so only what we charged after this request was sent is taken off again.
+        """
+        self._refill(now)
+        unseen = self.charged - charged_at_send if charged_at_send is not None else 0.0
+        self.level = min(self.capacity, remaining) - unseen
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budget for one provider/model.
+
+    acquire(tokens) blocks until both buckets can cover one request of the
+    estimated size. settle() corrects the token bucket once the real usage is
+    known. observe_headers() adopts the limits and remaining counts the
+    provider reports (OpenAI x-ratelimit-*, Anthropic anthropic-ratelimit-*),
+    and penalize() pauses every caller after a 429 for Retry-After seconds
+    (or a short backoff when there is none).
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: float):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request of about `tokens` tokens fits the budget; return seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = max(self.paused_until - now,
+                            self.requests.wait_time(1, now),
+                            self.tokens.wait_time(tokens, now))
+                if delay <= 0:
+                    self.requests.charge(1)
+                    self.tokens.charge(min(tokens, self.tokens.capacity))
+                    self.calls += 1
+                    if waited:
+                        self.throttled += 1
+                        self.wait_seconds += waited
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """Replace a request's estimated token cost with what it actually used."""
+        if actual is None:
+            return
+        with self._lock:
+            self.tokens.take(actual - min(estimated, self.tokens.capacity))
+
+    def mark(self) -> Dict[str, float]:
+        """Snapshot of what has been charged so far; pass it to observe_headers() for the request sent next."""
+        with self._lock:
+            return {"requests": self.requests.charged, "tokens": self.tokens.charged}
+
+    def observe_headers(self, headers: Optional[Mapping[str, str]], sent: Optional[Dict[str, float]] = None):
+        """
+        Adopt the limits and remaining budget from OpenAI or Anthropic response
+        headers. `sent` is the mark() taken when the request went out; without
+        it the server's remaining count is taken as covering every local charge.
+        """
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                limit = _header_number(headers, f"x-ratelimit-limit-{kind}", f"anthropic-ratelimit-{kind}-limit")
+                remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}",
+                                           f"anthropic-ratelimit-{kind}-remaining")
+                reset = _reset_seconds(headers.get(f"x-ratelimit-reset-{kind}")
+                                       or headers.get(f"anthropic-ratelimit-{kind}-reset"))
+                if limit is not None:
+                    bucket.set_limit(limit)
+                if remaining is not None:
+                    bucket.set_remaining(remaining, now, sent[kind] if sent else None)
+                    if remaining <= 0 and reset:
+                        # Exhausted: nothing will succeed before the server's window resets
+                        self.paused_until = max(self.paused_until, now + reset)
+
+    def penalize(self, retry_after: Optional[float] = None, attempt: int = 1):
+        """Pause all callers after a 429."""
+        pause = retry_after if retry_after is not None else min(60.0, 2.0 ** attempt)
+        with self._lock:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            # We clearly overestimated what was left
+            self.requests.level = min(self.requests.level, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limiter": self.name,
+            "rpm": self.requests.capacity,
+            "tpm": self.tokens.capacity,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "rate_limited": self.rate_limited,
+            "wait_seconds": round(self.wait_seconds, 2)
+        }
+
+
+def _header_number(headers: Mapping[str, str], *names: str) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _reset_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds until reset from OpenAI's "6m0s"/"20ms" form or Anthropic's RFC 3339 timestamp."""
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * DURATION_UNITS[u] for n, u in parts)
+    try:
+        return max(0.0, (datetime.fromisoformat(value.replace("Z", "+00:00")) - datetime.now().astimezone()).total_seconds())
+    except ValueError:
+        return None
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def configured_limits(provider: str) -> Dict[str, float]:
+    """Starting {"rpm", "tpm"} budget per model for a provider, after RATE_LIMIT_* overrides."""
+    defaults = DEFAULT_LIMITS.get(provider, {"rpm": 60, "tpm": 100_000})
+    return {
+        "rpm": float(os.environ.get(f"RATE_LIMIT_{provider.upper()}_RPM", defaults["rpm"])),
+        "tpm": float(os.environ.get(f"RATE_LIMIT_{provider.upper()}_TPM", defaults["tpm"]))
+    }
+
+
+def limiter_for(provider: str, model: str) -> RateLimiter:
+    """Shared limiter per provider and model, so every caller in the process draws from one budget."""
+    key = f"{provider}:{model}"
+    with _limiters_lock:
+        if key not in _limiters:
+            limits = configured_limits(provider)
+            _limiters[key] = RateLimiter(key, limits["rpm"], limits["tpm"])
+        return _limiters[key]
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        return {key: limiter.stats() for key, limiter in _limiters.items()}
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Worst-case token cost of a request: ~4 chars per prompt token plus the full output budget."""
+    return len(prompt) // 4 + max_tokens
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """429 from any of the SDKs (Gemini's ResourceExhausted carries code 429 rather than a response)."""
+    return error_status(error) == 429 or getattr(error, "code", None) == 429
+
+
+def is_transient_error(error: Exception) -> bool:
+    """5xx, or the OpenAI/Anthropic SDKs' APIConnectionError (and its APITimeoutError subclass)."""
+    status = error_status(error) or getattr(error, "code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return any(cls.__name__ == "APIConnectionError" for cls in type(error).__mro__)
+
+
+def rate_limited_call(limiter: RateLimiter, call: Callable[[], Any], tokens: int,
+                      max_attempts: int = 5) -> Any:
+    """
+    Run call() within the limiter's budget, retrying 429s after the pause
+    the provider asks for and 5xx/connection errors with jittered backoff.
+    Give it SDK clients built with max_retries=0, or the SDK swallows the
+    429s the limiter learns from. If call() returns a raw SDK response
+    (with .headers), its rate-limit headers are fed back into the limiter.
+    """
+    policy = RetryPolicy(max_attempts=max_attempts)
+    for attempt in range(1, max_attempts + 1):
+        limiter.acquire(tokens)
+        sent = limiter.mark()
+        try:
+            response = call()
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            if is_rate_limit_error(e):
+                headers = getattr(getattr(e, "response", None), "headers", None)
+                limiter.observe_headers(headers, sent)
+                limiter.penalize(retry_after_seconds(e), attempt)
+            elif is_transient_error(e):
+                time.sleep(policy.backoff(attempt, e))
+            else:
+                raise
+            continue
+        limiter.observe_headers(getattr(response, "headers", None), sent)
+        return response
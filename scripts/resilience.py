@@ -0,0 +1,267 @@
+"""
+Retry, backoff and circuit-breaker helpers for the LM Studio clients.
+Errors are classified so only transient failures (connect errors, dropped
+connections, 5xx, 429) are retried, with jittered exponential backoff.
+"""
+
+import random
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+import requests
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+# Categories that say nothing about server health (bad request, bad reply body)
+NON_HEALTH_CATEGORIES = {"client_error", "rate_limited", "other"}
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status carried by a requests or aiohttp error, if any."""
+    response = getattr(error, "response", None)
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code
+    return getattr(error, "status", None)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Parse a numeric Retry-After header from an HTTP error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def classify_error(error: Exception) -> str:
+    """
+    Classify a request failure:
+    connect, connect_timeout, read_timeout, dropped, server_error, rate_limited, client_error, other.
+    """
+    status = error_status(error)
+    if status is not None:
+        if status == 429:
+            return "rate_limited"
+        if status >= 500:
+            return "server_error"
+        if status >= 400:
+            return "client_error"
+
+    # ConnectTimeout subclasses both ConnectionError and Timeout, so check it first
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return "connect_timeout"
+    if isinstance(error, requests.exceptions.ReadTimeout):
+        return "read_timeout"
+    if isinstance(error, requests.exceptions.ChunkedEncodingError):
+        return "dropped"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        # Connection refused/reset before a response, or the server went away mid-reply
+        return "dropped" if "Connection aborted" in str(error) else "connect"
+
+    if AIOHTTP_AVAILABLE:
+        if isinstance(error, aiohttp.ServerTimeoutError):
+            return "read_timeout"
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return "connect"
+        if isinstance(error, (aiohttp.ServerDisconnectedError, aiohttp.ClientPayloadError)):
+            return "dropped"
+        if isinstance(error, aiohttp.ClientConnectionError):
+            return "connect"
+
+    if isinstance(error, TimeoutError):
+        return "read_timeout"
+    return "other"
+
+
+class RetryPolicy:
+    """
+    Which failures to retry and how long to wait.
+
+    Delay for attempt n is base_delay * 2**(n-1), capped at max_delay, then
+    scaled by a random factor in [1 - jitter, 1 + jitter]. A Retry-After
+    header overrides the computed delay. Read timeouts are not retried by
+    default: the full timeout has already been paid.
+    """
+
+    DEFAULT_RETRYABLE = ("connect", "connect_timeout", "dropped", "server_error", "rate_limited")
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        jitter: float = 0.5,
+        retryable: Optional[tuple] = None
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retryable = set(self.DEFAULT_RETRYABLE if retryable is None else retryable)
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Seconds to wait before retrying after failed attempt number `attempt` (1-based)."""
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def should_retry(self, attempt: int, category: str) -> bool:
+        return category in self.retryable and attempt < self.max_attempts
+
+
+class CircuitBreaker:
+    """
+    Fail fast once a server is clearly down.
+
+    After failure_threshold consecutive health failures the circuit opens and
+    requests are rejected without being sent. After reset_timeout seconds one
+    trial request is let through (half-open): success closes the circuit,
+    failure re-opens it, and a trial its caller abandoned is released so the
+    next request can make one.
+    """
+
+    _registry: Dict[str, "CircuitBreaker"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._trial_owner = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_endpoint(cls, base_url: str, **kwargs) -> "CircuitBreaker":
+        """Shared breaker per endpoint, so every client talking to one server sees the same state."""
+        with cls._registry_lock:
+            if base_url not in cls._registry:
+                cls._registry[base_url] = cls(**kwargs)
+            return cls._registry[base_url]
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self, owner: Any = None) -> bool:
+        """Whether a request may be sent now (owner identifies the caller holding a half-open trial)."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_owner = owner
+                return True
+            return False
+
+    def release(self, owner: Any):
+        """Give up owner's half-open trial without an outcome (the caller stopped reading or was cancelled)."""
+        with self._lock:
+            if self._trial_in_flight and self._trial_owner is owner:
+                self._trial_in_flight = False
+                self._trial_owner = None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+            self._trial_in_flight = False
+
+    def seconds_until_retry(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.time() - self.opened_at))
+
+
+class RetryTracker:
+    """
+    Bookkeeping for one logical request across its attempts.
+    The caller owns the loop and the sleeping (time.sleep or asyncio.sleep),
+    and calls release() in a finally so an abandoned attempt cannot keep
+    holding the circuit breaker's half-open trial.
+    """
+
+    def __init__(self, policy: RetryPolicy, breaker: CircuitBreaker):
+        self.policy = policy
+        self.breaker = breaker
+        self.attempts: List[Dict[str, Any]] = []
+        self.start_time = time.time()
+        self._attempt_start = self.start_time
+
+    def circuit_error(self) -> Optional[Dict[str, Any]]:
+        """Error result to return instead of sending, if the circuit is open."""
+        if self.breaker.allow(self):
+            self._attempt_start = time.time()
+            return None
+        return {
+            "error": f"Circuit open after repeated failures; retry in {self.breaker.seconds_until_retry():.0f}s",
+            "error_category": "circuit_open",
+            "attempts": self.attempts,
+            "duration_seconds": time.time() - self.start_time
+        }
+
+    def release(self):
+        self.breaker.release(self)
+
+    def success(self):
+        self.breaker.record_success()
+        self.attempts.append({
+            "attempt": len(self.attempts) + 1,
+            "outcome": "ok",
+            "duration_seconds": time.time() - self._attempt_start
+        })
+
+    def failure(self, error: Exception) -> Optional[float]:
+        """Record a failed attempt; return the backoff delay, or None if the error is final."""
+        category = classify_error(error)
+        if category in NON_HEALTH_CATEGORIES:
+            # The server answered, so it is up even though this request failed
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+        attempt = len(self.attempts) + 1
+        delay = self.policy.backoff(attempt, error) if self.policy.should_retry(attempt, category) else None
+        self.attempts.append({
+            "attempt": attempt,
+            "outcome": "error",
+            "category": category,
+            "status": error_status(error),
+            "error": str(error),
+            "duration_seconds": time.time() - self._attempt_start,
+            "backoff_seconds": delay
+        })
+        return delay
+
+    def error_result(self, error: Exception, **extra) -> Dict[str, Any]:
+        """Final error result once retries are exhausted or the error is not retryable."""
+        return {
+            "error": str(error),
+            "error_category": self.attempts[-1]["category"] if self.attempts else classify_error(error),
+            "attempts": self.attempts,
+            "duration_seconds": time.time() - self.start_time,
+            **extra
+        }
@@ -0,0 +1,191 @@
+"""
+Sequential sampling: keep drawing samples for a cell only while its metric is still uncertain.
+Each cell gets min_samples draws, then the remaining budget goes to whichever cells
+have the widest confidence interval on the tracked metric, until every interval is
+narrower than target_width or the cell hits max_samples.
+
+Metrics take one generated text (or a judge) and return a number: word_count,
+emoji_density (emojis per word) and judge_score (mean of a judge's 1-10 category scores).
+"""
+
+import math
+import re
+import threading
+from statistics import NormalDist, mean, stdev
+from typing import Optional, Dict, Any, List, Callable, Hashable, Iterable
+
+from trace_parser import parse_trace
+
+# One emoji: a pictograph plus any variation selector, skin tone or ZWJ-joined continuation
+EMOJI = re.compile(
+    "[\U0001F000-\U0001FAFF\u2190-\u21FF\u2300-\u23FF\u2600-\u27BF\u2B00-\u2BFF]"
+    "[\uFE0F\U0001F3FB-\U0001F3FF]*"
+    "(?:\u200D[\U0001F000-\U0001FAFF\u2600-\u27BF][\uFE0F\U0001F3FB-\U0001F3FF]*)*"
+)
+
+
+def answer_of(text: str) -> str:
+    """The part of a reply that is meant for the reader (reasoning traces dropped)."""
+    return parse_trace(text).answer
+
+
+def word_count(text: str) -> float:
+    return float(len(answer_of(text).split()))
+
+
+def emoji_density(text: str) -> float:
+    """Emojis per word of the answer (0 for an empty answer)."""
+    answer = answer_of(text)
+    words = len(answer.split())
+    return len(EMOJI.findall(answer)) / words if words else 0.0
+
+
+def judge_score(judge) -> Callable[[str], float]:
+    """
+    Metric from an AIJudge-like object (evaluate(output) -> {"scores": {category: {"score"}}}):
+    the mean of its category scores for the answer.
+    """
+    def score(text: str) -> float:
+        scores = judge.evaluate(answer_of(text))["scores"]
+        return mean(float(entry["score"]) for entry in scores.values())
+    return score
+
+
+METRICS: Dict[str, Callable[[str], float]] = {
+    "word_count": word_count,
+    "emoji_density": emoji_density
+}
+
+
+def result_texts(result: Dict[str, Any]) -> List[str]:
+    """Every generated text in a result record: its samples if it has them, else the response."""
+    if result.get("samples"):
+        return [sample["response"] for sample in result["samples"]]
+    return [result["response"]]
+
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Student t quantile via the Cornish-Fisher expansion around the normal
+    quantile; within 0.1% of the exact value for df >= 3 (1% at df = 2).
+    """
+    z = NormalDist().inv_cdf(p)
+    terms = [
+        (z ** 3 + z) / 4,
+        (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96,
+        (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384,
+        (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    ]
+    return z + sum(term / df ** (k + 1) for k, term in enumerate(terms))
+
+
+def confidence_interval(values: List[float], confidence: float = 0.95) -> Optional[Dict[str, float]]:
+    """Mean and t-based confidence interval, or None with fewer than two values."""
+    if len(values) < 2:
+        return None
+    center = mean(values)
+    half = t_quantile(1 - (1 - confidence) / 2, len(values) - 1) * stdev(values) / math.sqrt(len(values))
+    return {"mean": center, "low": center - half, "high": center + half, "width": 2 * half}
+
+
+class SequentialSampler:
+    """
+    Decides which cells get another draw.
+
+    Cells are any hashable keys. add() records a draw's metric values (a draw
+    may produce several samples) or a failed draw; next_round() picks the
+    cells to draw next, most uncertain first. A cell is finished once its
+    confidence interval is narrower than target_width (after at least
+    min_samples values) or it holds max_samples values; a draw can hold
+    several, and failed draws count too, so a cell that keeps failing also
+    stops after max_samples draws. budget caps the total number of samples
+    across all cells.
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[Hashable],
+        target_width: float,
+        min_samples: int = 3,
+        max_samples: int = 20,
+        budget: Optional[int] = None,
+        confidence: float = 0.95
+    ):
+        if min_samples < 3:
+            raise ValueError("min_samples must be at least 3 for a usable t interval")
+        self.keys = list(keys)
+        self.target_width = target_width
+        self.min_samples = min_samples
+        self.max_samples = max(max_samples, min_samples)
+        self.budget = budget
+        self.confidence = confidence
+        self.values: Dict[Hashable, List[float]] = {key: [] for key in self.keys}
+        self.draws: Dict[Hashable, int] = {key: 0 for key in self.keys}
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def add(self, key: Hashable, values: Optional[List[float]]):
+        """Record one draw for key: its metric values, or None if it failed."""
+        with self._lock:
+            self.draws[key] += 1
+            if values:
+                self.values[key].extend(values)
+                self.spent += len(values)
+
+    def interval(self, key: Hashable) -> Optional[Dict[str, float]]:
+        return confidence_interval(self.values[key], self.confidence)
+
+    def converged(self, key: Hashable) -> bool:
+        interval = self.interval(key)
+        return (len(self.values[key]) >= self.min_samples and interval is not None
+                and interval["width"] <= self.target_width)
+
+    def finished(self, key: Hashable) -> bool:
+        return (self.converged(key) or len(self.values[key]) >= self.max_samples
+                or self.draws[key] >= self.max_samples)
+
+    def remaining_budget(self) -> Optional[int]:
+        return None if self.budget is None else max(0, self.budget - self.spent)
+
+    def _priority(self, key: Hashable) -> float:
+        """Cells still short of min_samples first, then by how far the interval is from the target."""
+        if len(self.values[key]) < self.min_samples:
+            return math.inf
+        interval = self.interval(key)
+        return interval["width"] / self.target_width if self.target_width else math.inf
+
+    def next_round(self, slots: int, keys: Optional[Iterable[Hashable]] = None,
+                   samples_per_draw: Callable[[Hashable], int] = lambda key: 1) -> List[Hashable]:
+        """
+        Up to slots unfinished cells (from keys, default all) to draw next, the
+        most uncertain first, within the remaining budget.
+        """
+        candidates = [key for key in (self.keys if keys is None else keys) if not self.finished(key)]
+        candidates.sort(key=self._priority, reverse=True)
+        budget = self.remaining_budget()
+        chosen = []
+        for key in candidates[:slots]:
+            cost = samples_per_draw(key)
+            if budget is not None:
+                if cost > budget:
+                    continue
+                budget -= cost
+            chosen.append(key)
+        return chosen
+
+    def done(self) -> bool:
+        budget = self.remaining_budget()
+        return all(self.finished(key) for key in self.keys) or budget == 0
+
+    def report(self) -> Dict[Hashable, Dict[str, Any]]:
+        """Per cell: samples, draws, mean and interval, and whether it converged."""
+        report = {}
+        for key in self.keys:
+            interval = self.interval(key)
+            report[key] = {
+                "samples": len(self.values[key]),
+                "draws": self.draws[key],
+                "converged": self.converged(key),
+                **({k: round(v, 4) for k, v in interval.items()} if interval else {})
+            }
+        return report
@@ -0,0 +1,140 @@
+"""
+Write-ahead manifest for resumable sweeps.
+Every cell state change is appended to a JSONL file and fsynced before the
+work it describes, so a crashed or interrupted sweep can pick up where it stopped.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable
+
+PLANNED = "planned"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+
+class SweepManifest:
+    """
+    Append-only log of a sweep's cells and their states.
+
+    The first line is a header ({"event": "sweep", ...meta}); every later line
+    is {"event": "cell", "cell": id, "state": ..., "time": ...} plus details
+    (output file, error). Opening an existing file replays it to rebuild the
+    latest state of each cell; a torn last line from a crash is ignored.
+
+    On resume, cells left in_flight were interrupted and are run again, done
+    cells are skipped, and failed cells are re-run unless retry_failed=False.
+    """
+
+    def __init__(self, path: Path, meta: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.meta: Dict[str, Any] = {}
+        self.cells: Dict[str, Dict[str, Any]] = {}
+        self._order: List[str] = []
+        self._lock = threading.Lock()
+
+        self.resumed = self.path.exists() and self._replay()
+        if self.resumed:
+            self._drop_torn_tail()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a" if self.resumed else "w")
+        if not self.resumed:
+            self.meta = {"created": time.time(), **(meta or {})}
+            self._append({"event": "sweep", **self.meta})
+
+    @classmethod
+    def resume_or_start(cls, path: Path, meta: Optional[Dict[str, Any]] = None,
+                        fresh: bool = False) -> "SweepManifest":
+        """
+        Resume the sweep logged at path if it has unfinished cells; otherwise
+        (or with fresh=True) start a new one there.
+        """
+        path = Path(path)
+        if path.exists() and not fresh:
+            manifest = cls(path)
+            if manifest.resumed and manifest.unfinished():
+                return manifest
+            manifest.close()
+        if path.exists():
+            path.unlink()
+        return cls(path, meta)
+
+    def _replay(self) -> bool:
+        """Rebuild cell states from the log; False if the file has no usable header."""
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn write at the end of a crashed run
+                if record.get("event") == "sweep":
+                    self.meta = {k: v for k, v in record.items() if k != "event"}
+                elif record.get("event") == "cell":
+                    self._apply(record)
+        return bool(self.meta)
+
+    def _drop_torn_tail(self):
+        """Cut a partial last line so new records start on a line of their own."""
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _apply(self, record: Dict[str, Any]):
+        cell = record["cell"]
+        if cell not in self.cells:
+            self._order.append(cell)
+            self.cells[cell] = {}
+        self.cells[cell].update({k: v for k, v in record.items() if k not in ("event", "cell")})
+
+    def _append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _record(self, cell: str, state: str, **details):
+        record = {"event": "cell", "cell": cell, "state": state, "time": time.time(), **details}
+        with self._lock:
+            self._append(record)
+            self._apply(record)
+
+    def plan(self, cells: Iterable[str]):
+        """Register cells; ones already in the manifest keep their state."""
+        for cell in cells:
+            if cell not in self.cells:
+                self._record(cell, PLANNED)
+
+    def start(self, cell: str, **details):
+        self._record(cell, IN_FLIGHT, **details)
+
+    def done(self, cell: str, **details):
+        self._record(cell, DONE, **details)
+
+    def failed(self, cell: str, error: str, **details):
+        self._record(cell, FAILED, error=error, **details)
+
+    def state(self, cell: str) -> Optional[str]:
+        return self.cells.get(cell, {}).get("state")
+
+    def unfinished(self) -> List[str]:
+        return [c for c in self._order if self.cells[c]["state"] != DONE]
+
+    def pending(self, cells: Iterable[str], retry_failed: bool = True) -> List[str]:
+        """The given cells that still need to run, in the given order."""
+        skip = {DONE} if retry_failed else {DONE, FAILED}
+        return [c for c in cells if self.state(c) not in skip]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {PLANNED: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        for info in self.cells.values():
+            counts[info["state"]] += 1
+        return counts
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
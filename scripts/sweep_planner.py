@@ -0,0 +1,209 @@
+"""
+Estimate a sweep's wall time, tokens and cost before running it.
+Every stored result has a duration and a completion-token count, so each cell
+of a proposed matrix is simulated by drawing earlier runs of the same model
+(same family and scenario where there are enough), capped at the cell's
+max_tokens. The draws are scheduled onto each provider's worker pool at its
+concurrency, with API providers held to their rate limits and local models
+paying one load each (LocalScheduler groups cells by model). Repeating the
+simulation gives percentile bands rather than a single guess.
+
+Used by experiments/run_matrix.py --dry-run.
+"""
+
+import heapq
+import math
+import random
+from typing import Optional, Dict, Any, List, Tuple
+
+from providers import DEFAULT_CONCURRENCY
+from rate_limiter import configured_limits
+from token_calibration import matching_records
+
+# USD per million (input, output) tokens at list price; a model's "price_per_million" overrides.
+# Batch jobs are billed at half.
+PRICES_PER_MILLION = {
+    "gpt-5.2": (1.75, 14.00),
+    "claude-opus-4-5-20251101": (5.00, 25.00),
+    "gemini-3-pro-preview": (2.00, 12.00)
+}
+BATCH_DISCOUNT = 0.5
+
+# Fallback throughput for a model with no history at all
+DEFAULT_TOKENS_PER_SECOND = {
+    "openai": 60.0,
+    "anthropic": 50.0,
+    "gemini": 60.0,
+    "lmstudio": 25.0
+}
+
+# Unload + load + warm-up of one local model; results don't record it yet
+DEFAULT_LOAD_SECONDS = 30.0
+
+# Gemini's stored "tokens" are word counts
+TOKENS_PER_WORD = 4 / 3
+
+PERCENTILES = (0.1, 0.5, 0.9)
+
+
+def _timed_runs(history: List[Dict[str, Any]], model: Dict[str, Any], family: str,
+                scenario: str) -> List[Tuple[int, float]]:
+    """(completion tokens, seconds) of this model's earlier runs, or [] if there are none."""
+    records = matching_records(history, model["id"], family, scenario,
+                               where=lambda r: r["duration_seconds"] is not None)
+    return [(round(r["tokens"] * TOKENS_PER_WORD) if r["approximate"] else r["tokens"], r["duration_seconds"])
+            for r in records]
+
+
+def _draw(rng: random.Random, runs: List[Tuple[int, float]], model: Dict[str, Any]) -> Tuple[int, float]:
+    """One simulated completion: a past run cut to this max_tokens, or the full budget at default speed."""
+    max_tokens = model["max_tokens"]
+    if not runs:
+        return max_tokens, max_tokens / DEFAULT_TOKENS_PER_SECOND.get(model["provider"], 30.0)
+    tokens, seconds = rng.choice(runs)
+    if tokens > max_tokens:
+        return max_tokens, seconds * max_tokens / tokens
+    return tokens, seconds
+
+
+def _makespan(durations: List[float], workers: int) -> float:
+    """Finish time of durations run in order on `workers` parallel slots, each job taking the first free one."""
+    if not durations:
+        return 0.0
+    slots = [0.0] * max(1, min(workers, len(durations)))
+    for duration in durations:
+        heapq.heappush(slots, heapq.heappop(slots) + duration)
+    return max(slots)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {f"p{round(p * 100)}": ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)]
+            for p in PERCENTILES}
+
+
+def price_of(model: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """(input, output) USD per million tokens; local models are free, unknown API models None."""
+    if model["provider"] == "lmstudio":
+        return 0.0, 0.0
+    price = model.get("price_per_million") or PRICES_PER_MILLION.get(model["id"])
+    return tuple(price) if price else None
+
+
+def plan_sweep(
+    config: Dict[str, Any],
+    cells: List[Dict[str, Any]],
+    history: List[Dict[str, Any]],
+    batch_providers: Tuple[str, ...] = (),
+    trials: int = 500,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Simulated wall time, tokens and cost of running cells (expand_matrix()
+    output) with the config's provider concurrency.
+
+    Returns {"providers": {provider: stats}, "total": stats, "unpriced": [...],
+    "no_history": [...]}, each stats holding "cells" and p10/p50/p90 bands for
+    "wall_seconds", "tokens" (prompt + completion) and "cost". Providers in
+    batch_providers get batch pricing and no wall time (batches finish
+    within 24 hours, on the provider's schedule).
+    """
+    rng = random.Random(seed)
+    by_provider: Dict[str, List[Dict[str, Any]]] = {}
+    for cell in cells:
+        by_provider.setdefault(cell["model"]["provider"], []).append(cell)
+
+    family = config["prefix"]
+    runs = {}
+    for cell in cells:
+        key = (cell["model"]["id"], cell["scenario"])
+        if key not in runs:
+            runs[key] = _timed_runs(history, cell["model"], family, cell["scenario"])
+    no_history = sorted({model_id for (model_id, _), found in runs.items() if not found})
+    unpriced = sorted({cell["model"]["id"] for cell in cells if price_of(cell["model"]) is None})
+
+    samples: Dict[str, Dict[str, List[float]]] = {
+        provider: {"wall_seconds": [], "tokens": [], "cost": []} for provider in list(by_provider) + ["total"]
+    }
+    for _ in range(trials):
+        total = {"wall_seconds": 0.0, "tokens": 0.0, "cost": 0.0}
+        for provider, group in by_provider.items():
+            settings = config["providers"].get(provider, {})
+            concurrency = settings.get("concurrency", DEFAULT_CONCURRENCY.get(provider, 1))
+            discount = BATCH_DISCOUNT if provider in batch_providers else 1.0
+            durations: Dict[str, List[float]] = {}
+            tokens: Dict[str, float] = {}
+            cost = 0.0
+            for cell in group:
+                model = cell["model"]
+                draws = [_draw(rng, runs[(model["id"], cell["scenario"])], model)
+                         for _ in range(cell.get("samples", 1))]
+                prompt_tokens = len(cell["prompt"]) // 4
+                completion = sum(t for t, _ in draws)
+                # A local server generates samples one after another; the APIs return them together
+                seconds = sum(s for _, s in draws) if provider == "lmstudio" else max(s for _, s in draws)
+                durations.setdefault(model["id"], []).append(seconds)
+                tokens[model["id"]] = tokens.get(model["id"], 0) + prompt_tokens * len(draws) + completion
+                price = price_of(model)
+                if price:
+                    cost += discount * (price[0] * prompt_tokens * len(draws) + price[1] * completion) / 1_000_000
+
+            if provider in batch_providers:
+                wall = 0.0
+            elif provider == "lmstudio":
+                # One model at a time, each loaded once
+                wall = sum(DEFAULT_LOAD_SECONDS + _makespan(d, concurrency) for d in durations.values())
+            else:
+                wall = _makespan([s for d in durations.values() for s in d], concurrency)
+                # Each model has its own budget; the slowest one bounds the provider
+                limits = configured_limits(provider)
+                wall = max([wall] + [60 * max(len(durations[m]) / limits["rpm"], tokens[m] / limits["tpm"])
+                                     for m in durations])
+
+            results = {"wall_seconds": wall, "tokens": sum(tokens.values()), "cost": cost}
+            for name, value in results.items():
+                samples[provider][name].append(value)
+            # Providers run side by side
+            total["wall_seconds"] = max(total["wall_seconds"], wall)
+            total["tokens"] += results["tokens"]
+            total["cost"] += cost
+        for name, value in total.items():
+            samples["total"][name].append(value)
+
+    plan = {"providers": {}, "no_history": no_history, "unpriced": unpriced,
+            "batch_providers": [p for p in batch_providers if p in by_provider]}
+    for provider, values in samples.items():
+        stats = {"cells": len(by_provider.get(provider, cells))}
+        stats.update({name: _percentiles(series) for name, series in values.items()})
+        if provider == "total":
+            plan["total"] = stats
+        else:
+            plan["providers"][provider] = stats
+    return plan
+
+
+def _duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def print_plan(plan: Dict[str, Any]):
+    """Median and p10-p90 band per provider and for the whole sweep."""
+    def band(stats: Dict[str, float], fmt) -> str:
+        return f"{fmt(stats['p50']):>7s} ({fmt(stats['p10'])}-{fmt(stats['p90'])})"
+
+    print("\n📐 Estimate from earlier runs (median, p10-p90):")
+    rows = list(plan["providers"].items()) + [("total", plan["total"])]
+    for provider, stats in rows:
+        wall = ("batch   (≤24h)" if provider in plan["batch_providers"]
+                else band(stats["wall_seconds"], _duration))
+        print(f"   {provider:10s} {stats['cells']:5d} cells | wall {wall:22s} | "
+              f"tokens {band(stats['tokens'], lambda v: f'{v / 1000:.1f}k'):22s} | "
+              f"cost {band(stats['cost'], lambda v: f'${v:.2f}')}")
+    if plan["no_history"]:
+        print(f"   ⚠️  No earlier runs (assumed full max_tokens at default speed): {', '.join(plan['no_history'])}")
+    if plan["unpriced"]:
+        print(f"   ⚠️  No price known, cost left out: {', '.join(plan['unpriced'])}")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Calibrate max_tokens per model from the completion-token counts of stored results.
+Completion tokens include any reasoning trace, so thinking models are sized for
+trace plus answer. A run that hit its cap (finish_reason "length", or tokens at
+max_tokens when no reason was stored) only says the true length was at least
+the cap, so it counts as censored: enough of them and the calibrator asks for
+more headroom instead of trusting the percentile.
+
+Usage:
+    python scripts/token_calibration.py                       # suggestions for every model and family
+    python scripts/token_calibration.py --percentile 0.99 --model qwen3-14b-instruct
+    python scripts/token_calibration.py --apply experiments/configs/05_new_prompts.json
+"""
+
+import argparse
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Callable
+
+DEFAULT_RESULTS_DIR = Path(__file__).parent.parent / "results"
+
+# Finish reasons meaning "stopped at max_tokens" (OpenAI/LM Studio, Anthropic, Gemini)
+TRUNCATION_REASONS = {"length", "max_tokens", "MAX_TOKENS"}
+
+# Below this many runs a model/family falls back to all of that model's runs
+MIN_RECORDS = 3
+
+FAMILY_PATTERN = re.compile(r"^(\d{2})")
+
+
+def is_truncated(finish_reason: Optional[str]) -> bool:
+    return finish_reason in TRUNCATION_REASONS
+
+
+def result_truncated(result: Dict[str, Any]) -> bool:
+    """Whether a provider result (or any of its samples) stopped at max_tokens."""
+    return is_truncated(result.get("finish_reason")) or any(
+        is_truncated(sample.get("finish_reason")) for sample in result.get("samples") or [])
+
+
+def retry_truncated(
+    run: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]],
+    model: Dict[str, Any],
+    cell: Dict[str, Any],
+    result: Dict[str, Any],
+    settings: Dict[str, Any],
+    on_retry: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
+    """
+    Re-run run(model, cell) while its reply is cut off at max_tokens, growing
+    the budget by settings["growth"] up to settings["retries"] times and the
+    model's max_tokens_cap (else settings["max_tokens_cap"]). A retry that
+    errors keeps the truncated reply. The budgets that fell short are listed
+    in the result's "truncation_retries"; on_retry(old, new) hears each one.
+    """
+    cap = model.get("max_tokens_cap", settings["max_tokens_cap"])
+    retries = []
+    while ("error" not in result and result_truncated(result) and len(retries) < settings["retries"]
+           and model["max_tokens"] < cap):
+        retries.append({"max_tokens": model["max_tokens"], "tokens": result["tokens"]})
+        model = {**model, "max_tokens": min(cap, int(model["max_tokens"] * settings["growth"]))}
+        if on_retry:
+            on_retry(retries[-1]["max_tokens"], model["max_tokens"])
+        retried = run(model, cell)
+        if "error" in retried:
+            break  # Keep the truncated reply rather than losing the cell
+        result = retried
+    if retries:
+        result["truncation_retries"] = retries
+    return result
+
+
+def _record_from_file(path: Path) -> Optional[Dict[str, Any]]:
+    """Token and timing record of one stored result, or None if it has no completion-token count."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    # OLMoClient.save_result() nests the result under "result"; the 04/05 scripts store it flat
+    result = data.get("result", data)
+    if not isinstance(result, dict) or "response" not in result:
+        return None
+    tokens = result.get("tokens", result.get("tokens_completion"))
+    model_id = result.get("model_id") or data.get("model")
+    if not tokens or not model_id:
+        return None
+
+    raw = result.get("raw_result") or {}
+    finish_reason = result.get("finish_reason") or ((raw.get("choices") or [{}])[0].get("finish_reason"))
+    max_tokens = result.get("max_tokens") or (data.get("metadata") or {}).get("max_tokens")
+    family = FAMILY_PATTERN.match(path.name)
+    return {
+        "model_id": model_id,
+        "family": family.group(1) if family else None,
+        "scenario": result.get("scenario") or (data.get("metadata") or {}).get("name"),
+        "tokens": int(tokens),
+        # Gemini's "tokens" are word counts
+        "approximate": "tokens_note" in result or model_id.startswith("gemini"),
+        "max_tokens": max_tokens,
+        "duration_seconds": result.get("duration_seconds"),
+        # Without a stored reason, a run that reached its cap is assumed cut off
+        "truncated": is_truncated(finish_reason) if finish_reason else bool(max_tokens and tokens >= max_tokens),
+        "file": str(path)
+    }
+
+
+def load_token_history(results_dir: Path = DEFAULT_RESULTS_DIR) -> List[Dict[str, Any]]:
+    """
+    One record per stored result under results_dir: model_id, family,
+    scenario, tokens (completion), approximate, max_tokens, duration_seconds,
+    truncated and file.
+    """
+    records = []
+    for path in sorted(Path(results_dir).rglob("*.json")):
+        record = _record_from_file(path)
+        if record:
+            records.append(record)
+    return records
+
+
+def _round_up(value: float, step: int) -> int:
+    return int(math.ceil(value / step) * step)
+
+
+def matching_records(
+    history: List[Dict[str, Any]],
+    model_id: str,
+    family: Optional[str] = None,
+    scenario: Optional[str] = None,
+    where: Callable[[Dict[str, Any]], bool] = lambda r: True
+) -> List[Dict[str, Any]]:
+    """
+    A model's records (those passing where) for family and scenario if given,
+    widening to the family and then to every run of the model while there
+    are fewer than MIN_RECORDS.
+    """
+    scopes = [
+        lambda r: (family is None or r["family"] == family) and (scenario is None or r["scenario"] == scenario),
+        lambda r: family is None or r["family"] == family,
+        lambda r: True
+    ]
+    records = []
+    for scope in scopes:
+        records = [r for r in history if r["model_id"] == model_id and where(r) and scope(r)]
+        if len(records) >= MIN_RECORDS:
+            break
+    return records
+
+
+def calibrate(
+    history: List[Dict[str, Any]],
+    model_id: str,
+    family: Optional[str] = None,
+    scenario: Optional[str] = None,
+    percentile: float = 0.95,
+    headroom: float = 1.15,
+    round_to: int = 50
+) -> Optional[Dict[str, Any]]:
+    """
+    Smallest max_tokens covering `percentile` of this model's completions
+    (see matching_records), times headroom, rounded up to round_to. None if
+    the model has no history with real token counts.
+
+    Truncated runs sort above everything at their cap. If more than
+    1 - percentile of runs were truncated, the percentile itself is unknown,
+    so the suggestion is twice the largest cap that truncated, or the longest
+    complete run plus headroom if that is more.
+    """
+    records = matching_records(history, model_id, family, scenario, where=lambda r: not r["approximate"])
+    if not records:
+        return None
+
+    truncated = [r for r in records if r["truncated"]]
+    caps = Counter(r["max_tokens"] for r in records if r["max_tokens"])
+    calibration = {
+        "model_id": model_id,
+        "family": family,
+        "scenario": scenario,
+        "records": len(records),
+        "truncated": len(truncated),
+        "current_max_tokens": caps.most_common(1)[0][0] if caps else None,
+        "max_seen": max(r["tokens"] for r in records),
+        "percentile": percentile
+    }
+
+    if len(truncated) > (1 - percentile) * len(records):
+        calibration["tokens_at_percentile"] = None
+        longest = max(2 * max(r["max_tokens"] or r["tokens"] for r in truncated), calibration["max_seen"] * headroom)
+        calibration["suggested_max_tokens"] = _round_up(longest, round_to)
+        return calibration
+
+    # Censored runs stand in at infinity: whatever they needed, it was more than every complete run
+    ordered = sorted(math.inf if r["truncated"] else r["tokens"] for r in records)
+    index = min(len(ordered) - 1, math.ceil(percentile * len(ordered)) - 1)
+    at_percentile = ordered[index]
+    calibration["tokens_at_percentile"] = at_percentile
+    calibration["suggested_max_tokens"] = _round_up(at_percentile * headroom, round_to)
+    return calibration
+
+
+def calibrate_all(history: List[Dict[str, Any]], percentile: float = 0.95,
+                  model_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One calibration per (model, family, scenario) present in the history."""
+    groups = sorted({(r["model_id"], r["family"] or "", r["scenario"] or "") for r in history
+                     if not r["approximate"] and (model_id is None or r["model_id"] == model_id)})
+    return [calibrate(history, m, f or None, s or None, percentile) for m, f, s in groups]
+
+
+def calibrate_config(config: Dict[str, Any], history: List[Dict[str, Any]], percentile: float = 0.95) -> List[str]:
+    """
+    Set max_tokens of every model in a matrix config (in place) to its
+    calibrated value for the config's family (its prefix), taking the largest
+    suggestion across the config's scenarios. Models without history keep
+    theirs. Returns one line per changed model.
+    """
+    changes = []
+    for model in config["models"]:
+        suggestions = [calibrate(history, model["id"], config["prefix"], scenario["name"], percentile)
+                       for scenario in config["scenarios"]]
+        suggestions = [s["suggested_max_tokens"] for s in suggestions if s]
+        if suggestions and max(suggestions) != model.get("max_tokens"):
+            changes.append(f"{model.get('name', model['id'])}: {model.get('max_tokens')} → {max(suggestions)}")
+            model["max_tokens"] = max(suggestions)
+    return changes
+
+
+def apply_to_config(config_path: Path, history: List[Dict[str, Any]], percentile: float = 0.95) -> List[str]:
+    """calibrate_config() on a config file, written back in place."""
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    config.setdefault("prefix", config_path.stem)
+    changes = calibrate_config(config, history, percentile)
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS_DIR, help="Directory of stored results")
+    parser.add_argument("--percentile", type=float, default=0.95, help="Share of runs max_tokens must cover")
+    parser.add_argument("--model", help="Only this model id")
+    parser.add_argument("--apply", type=Path, help="Write calibrated max_tokens into this matrix config")
+    args = parser.parse_args()
+
+    history = load_token_history(args.results)
+    print(f"📊 {len(history)} stored runs with completion-token counts\n")
+
+    if args.apply:
+        changes = apply_to_config(args.apply, history, args.percentile)
+        for change in changes:
+            print(f"✏️  {change}")
+        print(f"\n{len(changes)} model(s) updated in {args.apply}")
+        return
+
+    print(f"{'model':28s} {'fam':3s} {'scenario':26s} {'runs':>4s} {'trunc':>5s} {'max seen':>8s} "
+          f"{'p' + format(args.percentile * 100, '.0f'):>6s} {'current':>7s} {'suggest':>7s}")
+    for c in calibrate_all(history, args.percentile, args.model):
+        at = "-" if c["tokens_at_percentile"] is None else str(c["tokens_at_percentile"])
+        print(f"{c['model_id'][:28]:28s} {c['family'] or '-':3s} {(c['scenario'] or '-')[:26]:26s} "
+              f"{c['records']:4d} {c['truncated']:5d} {c['max_seen']:8d} {at:>6s} "
+              f"{str(c['current_max_tokens'] or '-'):>7s} {c['suggested_max_tokens']:7d}")
+
+
+if __name__ == "__main__":
+    main()
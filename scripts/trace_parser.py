@@ -0,0 +1,305 @@
+"""
+Incremental parser that splits model output into reasoning (<think>) and answer segments.
+Works on live streams (feed deltas as they arrive) and stored responses (parse_trace).
+"""
+
+import re
+from typing import Optional, Dict, Any, List, Tuple
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# Rough subword count: runs of word characters and single punctuation/emoji characters
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+WORD_START = re.compile(r"\s\S")
+
+THINK = "think"
+ANSWER = "answer"
+
+
+class SegmentStats:
+    """Running char/word/token counts for one kind of segment, exact across chunk boundaries."""
+
+    def __init__(self):
+        self.chars = 0
+        self.words = 0
+        self.tokens = 0
+        self._last_char = ""
+
+    def add(self, text: str):
+        if not text:
+            return
+        self.chars += len(text)
+        self.words += len(WORD_START.findall(text))
+        if not text[0].isspace() and (not self._last_char or self._last_char.isspace()):
+            self.words += 1
+        self.tokens += len(TOKEN_PATTERN.findall(text))
+        # A word-character run split between two pieces was counted twice
+        if self._last_char and _is_word_char(self._last_char) and _is_word_char(text[0]):
+            self.tokens -= 1
+        self._last_char = text[-1]
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"chars": self.chars, "words": self.words, "tokens": self.tokens}
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class TraceParser:
+    """
+    Single-pass state machine over <think>...</think> markup.
+
+    feed() takes the next chunk of text and returns the (kind, text) pieces it
+    completed, kind being "think" or "answer"; tags themselves are dropped.
+    Text that might be the start of a tag split across chunks is held back
+    until the next feed() or close().
+
+    implicit_think says how the output starts:
+    - True: inside a trace already (OLMo 3 Think's template opens <think>),
+      so everything up to the first </think> is reasoning.
+    - False: an answer, unless the first non-blank text is <think>.
+    - None: unknown (a model whose template may open the trace itself).
+      Text before the first tag is held back and becomes reasoning if a
+      </think> follows, answer otherwise. While streaming it counts as
+      neither until a tag or close() decides it (see pending).
+
+    Later <think> blocks open new reasoning segments. An unclosed trace stays
+    reasoning (the answer is empty). A </think> with no open block after the
+    answer has started is dropped and counted in stray_closes.
+
+    mark_forced_close() says the </think> just fed was the caller's (a
+    force_close prefill), not the model's. If the model carries on reasoning
+    and then closes the trace itself, that close is a late close, not a stray
+    one: the text since the forced close is moved back to reasoning (feed()
+    returns it again as a think piece) and counted in late_closes.
+    """
+
+    def __init__(self, implicit_think: Optional[bool] = False):
+        self.implicit_think = implicit_think
+        if implicit_think:
+            self.state = THINK
+        else:
+            # "start": only whitespace so far; "pending": undecided text (implicit_think=None)
+            self.state = "start" if implicit_think is False else "pending"
+        self.think_blocks = 1 if implicit_think else 0
+        self.think_closed = False
+        self.stray_closes = 0
+        self.late_closes = 0
+        self.stats = {THINK: SegmentStats(), ANSWER: SegmentStats()}
+        self._segments: List[Tuple[str, List[str]]] = []
+        self._carry = ""
+        self._held: List[str] = []
+        # Index of the first segment after a forced close, while a late close may still move it
+        self._reclaim_from: Optional[int] = None
+
+    def mark_forced_close(self):
+        """Note that the trace was just closed by the caller rather than the model."""
+        if self.state == ANSWER:
+            # From the segment after the last reasoning one, which later answer text merges into
+            self._reclaim_from = max((i + 1 for i, (kind, _) in enumerate(self._segments) if kind == THINK),
+                                     default=0)
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume the next chunk; return the completed (kind, text) pieces in order."""
+        text = self._carry + chunk
+        self._carry = ""
+        pieces: List[Tuple[str, str]] = []
+        pos = 0
+
+        while pos < len(text):
+            if self.state == THINK:
+                end = text.find(THINK_CLOSE, pos)
+                if end == -1:
+                    pos = self._emit_until_partial(text, pos, THINK, (THINK_CLOSE,), pieces)
+                    break
+                self._emit(THINK, text[pos:end], pieces)
+                pos = end + len(THINK_CLOSE)
+                self.state = ANSWER
+                self.think_closed = True
+
+            elif self.state == ANSWER:
+                start = text.find(THINK_OPEN, pos)
+                stray = text.find(THINK_CLOSE, pos)
+                if stray != -1 and (start == -1 or stray < start):
+                    self._emit(ANSWER, text[pos:stray], pieces)
+                    pos = stray + len(THINK_CLOSE)
+                    if self._reclaim_from is not None:
+                        self._reclaim(pieces)
+                    else:
+                        self.stray_closes += 1
+                    continue
+                if start == -1:
+                    pos = self._emit_until_partial(text, pos, ANSWER, (THINK_OPEN, THINK_CLOSE), pieces)
+                    break
+                self._emit(ANSWER, text[pos:start], pieces)
+                pos = start + len(THINK_OPEN)
+                self.state = THINK
+                self.think_blocks += 1
+                # The model reopened a trace, so its next </think> closes that one
+                self._reclaim_from = None
+
+            elif self.state == "start":
+                remainder = text[pos:]
+                first = pos + len(remainder) - len(remainder.lstrip())
+                if first == len(text):
+                    # Still only whitespace; keep it in case the answer starts next
+                    self._carry = remainder
+                    break
+                rest = text[first:]
+                if rest.startswith(THINK_OPEN):
+                    pos = first + len(THINK_OPEN)
+                    self.state = THINK
+                    self.think_blocks += 1
+                elif THINK_OPEN.startswith(rest):
+                    self._carry = text[pos:]
+                    break
+                else:
+                    self.state = ANSWER
+
+            else:  # pending
+                start = text.find(THINK_OPEN, pos)
+                close = text.find(THINK_CLOSE, pos)
+                if close != -1 and (start == -1 or close < start):
+                    # Implicit trace: everything so far was reasoning
+                    self._held.append(text[pos:close])
+                    self._emit(THINK, "".join(self._held), pieces)
+                    self._held = []
+                    self.think_blocks += 1
+                    pos = close + len(THINK_CLOSE)
+                    self.state = ANSWER
+                    self.think_closed = True
+                elif start != -1:
+                    self._held.append(text[pos:start])
+                    held = "".join(self._held)
+                    self._held = []
+                    if held.strip():
+                        self._emit(ANSWER, held, pieces)
+                    pos = start + len(THINK_OPEN)
+                    self.state = THINK
+                    self.think_blocks += 1
+                else:
+                    keep = _partial_tag_length(text, (THINK_OPEN, THINK_CLOSE))
+                    self._held.append(text[pos:len(text) - keep])
+                    self._carry = text[len(text) - keep:]
+                    break
+
+        return pieces
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush held-back text at the end of the output."""
+        pieces: List[Tuple[str, str]] = []
+        carry, self._carry = self._carry, ""
+        if self.state == "pending":
+            held = "".join(self._held) + carry
+            self._held = []
+            self._emit(ANSWER, held, pieces)
+            self.state = ANSWER
+        elif self.state == "start":
+            self._emit(ANSWER, carry, pieces)
+            self.state = ANSWER
+        else:
+            self._emit(self.state, carry, pieces)
+        return pieces
+
+    def _emit_until_partial(self, text: str, pos: int, kind: str, tags: Tuple[str, ...],
+                            pieces: List[Tuple[str, str]]) -> int:
+        """Emit text[pos:] except a trailing fragment that could begin one of tags."""
+        keep = _partial_tag_length(text, tags)
+        self._emit(kind, text[pos:len(text) - keep], pieces)
+        self._carry = text[len(text) - keep:]
+        return len(text)
+
+    def _reclaim(self, pieces: List[Tuple[str, str]]):
+        """Late close after a forced one: everything since the forced close was reasoning."""
+        tail = self._segments[self._reclaim_from:]
+        del self._segments[self._reclaim_from:]
+        self._reclaim_from = None
+        self.late_closes += 1
+        self.stats = {THINK: SegmentStats(), ANSWER: SegmentStats()}
+        for kind, parts in self._segments:
+            for part in parts:
+                self.stats[kind].add(part)
+        self._emit(THINK, "".join("".join(parts) for _, parts in tail), pieces)
+
+    def _emit(self, kind: str, text: str, pieces: List[Tuple[str, str]]):
+        if not text:
+            return
+        self.stats[kind].add(text)
+        if self._segments and self._segments[-1][0] == kind:
+            self._segments[-1][1].append(text)
+        else:
+            self._segments.append((kind, [text]))
+        pieces.append((kind, text))
+
+    @property
+    def in_think(self) -> bool:
+        return self.state == THINK
+
+    @property
+    def pending(self) -> bool:
+        """Still undecided whether the held-back text is reasoning or answer (implicit_think=None)."""
+        return self.state == "pending"
+
+    def segments(self) -> List[Dict[str, str]]:
+        """All segments so far, in order, as {"kind", "text"}."""
+        return [{"kind": kind, "text": "".join(parts)} for kind, parts in self._segments]
+
+    def text_of(self, kind: str) -> str:
+        return "".join("".join(parts) for k, parts in self._segments if k == kind)
+
+    @property
+    def thinking(self) -> Optional[str]:
+        """Reasoning text with blocks separated by blank lines, or None if there was none."""
+        blocks = ["".join(parts).strip() for kind, parts in self._segments if kind == THINK]
+        blocks = [b for b in blocks if b]
+        return "\n\n".join(blocks) if blocks else None
+
+    @property
+    def answer(self) -> str:
+        return self.text_of(ANSWER).strip()
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-segment counts plus trace shape, for storing alongside results."""
+        return {
+            "think": self.stats[THINK].as_dict(),
+            "answer": self.stats[ANSWER].as_dict(),
+            "think_blocks": self.think_blocks,
+            "think_closed": self.think_closed,
+            "stray_closes": self.stray_closes,
+            "late_closes": self.late_closes
+        }
+
+
+def _partial_tag_length(text: str, tags: Tuple[str, ...]) -> int:
+    """Length of the longest suffix of text that is a proper prefix of one of tags."""
+    longest = max(len(tag) for tag in tags) - 1
+    for length in range(min(longest, len(text)), 0, -1):
+        suffix = text[-length:]
+        if any(tag.startswith(suffix) for tag in tags):
+            return length
+    return 0
+
+
+def forced_close_offset(prefill: Optional[str]) -> Optional[int]:
+    """Where the reply continues after a prefill that closes the trace (a forced close), else None."""
+    if prefill and prefill.rstrip().endswith(THINK_CLOSE):
+        return len(prefill)
+    return None
+
+
+def parse_trace(text: str, implicit_think: Optional[bool] = None,
+                forced_close_at: Optional[int] = None) -> TraceParser:
+    """
+    Parse a complete response in one go; read .thinking, .answer and .summary() from the result.
+    forced_close_at is the offset just after a </think> the caller prefilled (see forced_close_offset).
+    """
+    parser = TraceParser(implicit_think)
+    if forced_close_at is not None:
+        parser.feed(text[:forced_close_at])
+        parser.mark_forced_close()
+        text = text[forced_close_at:]
+    parser.feed(text)
+    parser.close()
+    return parser